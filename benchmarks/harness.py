@@ -0,0 +1,85 @@
+# benchmarks/harness.py
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("BenchmarkHarness")
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, wall_seconds, items=None):
+    """Throughput and latency percentiles for one benchmark, in items/s and milliseconds."""
+    items = len(latencies) if items is None else items
+    return {
+        'iterations': len(latencies),
+        'throughput_per_s': items / wall_seconds if wall_seconds > 0 else None,
+        'p50_ms': percentile(latencies, 50) * 1000.0,
+        'p95_ms': percentile(latencies, 95) * 1000.0,
+        'p99_ms': percentile(latencies, 99) * 1000.0,
+    }
+
+
+def measure(fn, inputs, warmup=3):
+    """Calls `fn` once per input, one at a time."""
+    for item in inputs[:warmup]:
+        fn(item)
+    latencies = []
+    start = time.perf_counter()
+    for item in inputs:
+        call_start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def measure_async(fn, inputs, concurrency=1, warmup=3):
+    """Awaits `fn` once per input with up to `concurrency` calls in flight."""
+    for item in inputs[:warmup]:
+        await fn(item)
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def timed(item):
+        async with slots:
+            call_start = time.perf_counter()
+            await fn(item)
+            latencies.append(time.perf_counter() - call_start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed(item) for item in inputs])
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Lists benchmarks that got worse than `baseline` by more than `threshold`:
+    a higher p95 latency or a lower throughput. Baseline benchmarks that now
+    fail or are missing from `current` count as regressions too.
+    """
+    regressions = []
+    results = current.get('results', {})
+    for name, base in baseline.get('results', {}).items():
+        if 'error' in base:
+            continue
+        result = results.get(name)
+        if result is None:
+            regressions.append(f"{name}: missing from the current run")
+        elif 'error' in result:
+            regressions.append(f"{name}: failed: {result['error']}")
+        else:
+            if base['p95_ms'] and result['p95_ms'] > base['p95_ms'] * (1 + threshold):
+                regressions.append(f"{name}: p95 {base['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+            if base['throughput_per_s'] and result['throughput_per_s'] < base['throughput_per_s'] * (1 - threshold):
+                regressions.append(f"{name}: throughput {base['throughput_per_s']:.1f}/s -> "
+                                   f"{result['throughput_per_s']:.1f}/s")
+    return regressions
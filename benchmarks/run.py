@@ -0,0 +1,250 @@
+# benchmarks/run.py
+#
+# CPU-only benchmarks for buffers, function steps, Engine.process_frame and
+# full pipeline configs, with model steps replaced by a stub. Run from the
+# repository root:
+#
+#   python -m benchmarks.run --resolutions 640x360,1280x720 --output bench.json
+#   python -m benchmarks.run --output new.json --compare bench.json --threshold 0.15
+#
+# With --compare the process exits with status 1 when a benchmark regressed.
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import yaml
+from benchmarks.harness import compare, measure, measure_async
+from benchmarks.stub_steps import synthetic_frames, stub_model_steps
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger("Benchmarks")
+
+SUITES = ('functions', 'buffers', 'engine', 'pipelines')
+
+# Register their functions and models before any pipeline is built
+PLUGIN_MODULES = ('src.plugins.custom_functions', 'src.plugins.custom_models')
+
+LIVE_PIPELINE = {
+    'pipeline_name': 'benchmark_live',
+    'steps': [
+        {'name': 'resize', 'type': 'function', 'function': 'resize_image', 'params': {'size': [512, 512]}},
+        {'name': 'inference', 'type': 'model', 'model_name': 'stub',
+         'batching': {'max_batch_size': 4, 'max_wait_ms': 15}},
+        {'name': 'enhance', 'type': 'function', 'function': 'enhance_image', 'params': {'factor': 1.2}},
+    ],
+}
+
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def bench_functions(args, resolution):
+    from src.core.utils import enhance_image, resize_image
+    frames = synthetic_frames(args.iterations, *resolution)
+    return {
+        'resize_image': measure(lambda frame: resize_image(frame, size=[512, 512]), frames),
+        'enhance_image': measure(lambda frame: enhance_image(frame, factor=1.2), frames),
+    }
+
+
+async def bench_buffers(args, resolution):
+    import ray
+    from src.core.transport import put_frame, resolve_frame
+    from src.core.utils import FrameBuffer
+    if not ray.is_initialized():
+        ray.init(num_cpus=2, include_dashboard=False, log_to_driver=False)
+    buffer = FrameBuffer.remote(max_length=args.iterations * 2, drop_policy='drop_oldest')
+    frames = synthetic_frames(args.iterations, *resolution)
+
+    async def round_trip(frame):
+        await buffer.add_frame.remote(put_frame(frame))
+        await resolve_frame(await buffer.get_frame.remote(timeout=1.0))
+
+    async def batch_round_trip(frame):
+        await buffer.add_frames.remote([put_frame(frame) for _ in range(args.batch)])
+        for item in await buffer.get_frames.remote(args.batch, timeout=1.0):
+            await resolve_frame(item)
+
+    results = {
+        'frame_buffer_round_trip': await measure_async(round_trip, frames),
+        'frame_buffer_batch_round_trip': await measure_async(batch_round_trip, frames[:max(1, len(frames) // 4)]),
+    }
+    # Batch results count frames, not calls
+    results['frame_buffer_batch_round_trip']['throughput_per_s'] *= args.batch
+    ray.kill(buffer)
+    return results
+
+
+def _engine(pipeline):
+    from src.core.engine import Engine
+    from src.core.latency import LatencyBudget
+    # Only the state process_frame needs; no Serve replica or session manager
+    engine = object.__new__(Engine.func_or_class)
+    engine.pipeline = pipeline
+    engine.latency_budget = LatencyBudget()
+    return engine
+
+
+async def _processed(engine, data):
+    """
+    Runs process_frame and consumes lazy results, so encoding and fan-out are
+    timed too. A pipeline that produces nothing fails the benchmark.
+    """
+    from src.core.mapping import is_fan_out, iterate
+    result = await engine.process_frame(data)
+    if is_fan_out(result):
+        result = [item async for item in iterate(result)]
+    if result is None or (isinstance(result, list) and not result):
+        raise RuntimeError("The pipeline returned no result.")
+    return result
+
+
+async def _configured_engine(pipeline_config, args):
+    from src.core.pipeline import Pipeline
+    pipeline = Pipeline()
+    await pipeline.configure_from_dict(stub_model_steps(pipeline_config, args.model_params))
+    return _engine(pipeline)
+
+
+async def bench_engine(args, resolution):
+    engine = await _configured_engine(LIVE_PIPELINE, args)
+    frames = synthetic_frames(args.iterations, *resolution)
+    return {
+        'process_frame_sequential': await measure_async(lambda frame: _processed(engine, frame), frames),
+        f'process_frame_concurrency_{args.concurrency}': await measure_async(
+            lambda frame: _processed(engine, frame), frames, concurrency=args.concurrency
+        ),
+    }
+
+
+def _synthetic_clip(resolution, frame_count):
+    from src.plugins.custom_functions import video_frame_assembly
+    return b''.join(video_frame_assembly(synthetic_frames(frame_count, *resolution), frame_rate=30))
+
+
+async def bench_pipelines(args, resolution):
+    results = {}
+    for path in sorted(glob.glob(os.path.join(args.configs, '*.yaml'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as f:
+            pipeline_config = yaml.safe_load(f)
+        try:
+            engine = await _configured_engine(pipeline_config, args)
+            first_step = pipeline_config['steps'][0]
+            if first_step.get('function') == 'video_frame_extraction':
+                # Whole-clip pipelines: each iteration processes a short synthetic clip
+                clip = _synthetic_clip(resolution, args.clip_frames)
+                inputs = [clip] * max(1, args.iterations // args.clip_frames)
+                result = await measure_async(lambda clip: _processed(engine, clip), inputs, warmup=1)
+                result['throughput_per_s'] *= args.clip_frames
+            else:
+                inputs = synthetic_frames(args.iterations, *resolution)
+                result = await measure_async(lambda frame: _processed(engine, frame), inputs,
+                                             concurrency=args.concurrency)
+            results[f'pipeline_{name}'] = result
+        except Exception as e:
+            logger.exception(f"Pipeline benchmark '{name}' failed: {e}")
+            results[f'pipeline_{name}'] = {'error': str(e)}
+    return results
+
+
+def load_plugins():
+    from src.core.startup import load_module
+    for name in PLUGIN_MODULES:
+        try:
+            load_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not load plugin module '{name}': {e}")
+
+
+async def run(args):
+    load_plugins()
+    results = {}
+    for resolution_text in args.resolutions.split(','):
+        resolution = parse_resolution(resolution_text)
+        for suite in args.suites.split(','):
+            start = time.perf_counter()
+            if suite == 'functions':
+                suite_results = bench_functions(args, resolution)
+            elif suite == 'buffers':
+                suite_results = await bench_buffers(args, resolution)
+            elif suite == 'engine':
+                suite_results = await bench_engine(args, resolution)
+            elif suite == 'pipelines':
+                suite_results = await bench_pipelines(args, resolution)
+            else:
+                raise ValueError(f"Unknown suite '{suite}'. Expected one of {SUITES}.")
+            for name, result in suite_results.items():
+                results[f'{name}@{resolution_text}'] = result
+            print(f"{suite} at {resolution_text}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run CPU-only benchmarks.")
+    parser.add_argument('--suites', default=','.join(SUITES), help='Comma-separated suites to run')
+    parser.add_argument('--resolutions', default='640x360,1280x720', help='Comma-separated WIDTHxHEIGHT list')
+    parser.add_argument('--iterations', type=int, default=100, help='Frames per benchmark')
+    parser.add_argument('--concurrency', type=int, default=8, help='Frames in flight for concurrent benchmarks')
+    parser.add_argument('--batch', type=int, default=8, help='Frames per buffer batch')
+    parser.add_argument('--clip-frames', type=int, default=30, help='Frames per synthetic video clip')
+    parser.add_argument('--model-sleep-ms', type=float, default=20.0, help='Stub model cost per frame')
+    parser.add_argument('--model-batch-sleep-ms', type=float, default=10.0, help='Stub model cost per call')
+    parser.add_argument('--model-compute-passes', type=int, default=0, help='CPU passes per frame in the stub')
+    parser.add_argument('--configs', default='configs', help='Directory of pipeline configs to benchmark')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Allowed relative regression')
+    args = parser.parse_args()
+    args.model_params = {
+        'sleep_ms': args.model_sleep_ms,
+        'batch_sleep_ms': args.model_batch_sleep_ms,
+        'compute_passes': args.model_compute_passes,
+    }
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+        'results': asyncio.run(run(args)),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/stub_steps.py
+
+import logging
+import time
+import numpy as np
+from fractions import Fraction
+from src.core.frame import Frame, as_frame
+from src.core.steps.base_step import BaseStep, StepFactory
+
+logger = logging.getLogger("BenchmarkStubs")
+
+STUB_MODEL_NAME = 'benchmark_stub_model'
+
+
+class StubModelStep(BaseStep):
+    """
+    Stands in for a diffusion model on machines without a GPU. Each call
+    sleeps for `sleep_ms` plus `batch_sleep_ms` per batch, and runs
+    `compute_passes` blurs over the frame so the step also costs real CPU.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.sleep = params.get('sleep_ms', 20) / 1000.0
+        self.batch_sleep = params.get('batch_sleep_ms', 0) / 1000.0
+        self.compute_passes = params.get('compute_passes', 0)
+
+    @staticmethod
+    def from_config(config):
+        return StubModelStep(config.get('name'), config.get('params', {}))
+
+    def _compute(self, frame):
+        data = frame.data
+        for _ in range(self.compute_passes):
+            data = ((data[:-1, :-1].astype(np.uint16) + data[1:, 1:]) // 2).astype(np.uint8)
+        return frame.with_data(np.ascontiguousarray(data)) if self.compute_passes else frame
+
+    def process(self, data):
+        time.sleep(self.batch_sleep + self.sleep)
+        return self._compute(as_frame(data))
+
+    def process_batch(self, items):
+        # Batching amortises the fixed cost, like a real model
+        time.sleep(self.batch_sleep + self.sleep * len(items))
+        return [self._compute(as_frame(item)) for item in items]
+
+
+StepFactory.register_custom_model(STUB_MODEL_NAME, StubModelStep)
+
+
+def synthetic_frames(count, width, height, seed=0):
+    """Random BGR frames with increasing pts and sequence numbers, as ingest produces them."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        # Shift the image so consecutive frames differ like a moving camera
+        data = np.roll(base, i, axis=1)
+        frames.append(Frame(data, colorspace="bgr24", pts=i, time_base=Fraction(1, 30), sequence=i,
+                            ingest_time=time.time()))
+    return frames
+
+
+def stub_model_steps(pipeline_config, model_params):
+    """Returns a copy of `pipeline_config` with every model step replaced by a local StubModelStep."""
+    config = dict(pipeline_config)
+    steps = []
+    for step in pipeline_config.get('steps', []):
+        if step.get('type') == 'model':
+            step = {
+                'name': step.get('name'),
+                'type': 'model',
+                'model_name': STUB_MODEL_NAME,
+                'placement': 'local',
+                'params': dict(model_params),
+                **({'batching': step['batching']} if step.get('batching') else {}),
+            }
+        steps.append(step)
+    config['steps'] = steps
+    return config
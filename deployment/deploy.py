@@ -5,9 +5,11 @@ from ray import serve
 from src.services.whip_ingest_server import WHIPIngestServer
 from src.services.whep_playback_server import WHEPPlaybackServer
 from src.services.pipeline_service import PipelineService
+from src.services.metrics_service import MetricsService
 from src.services.rtmp_ingest_server import RTMPIngestServer
-from src.core.engine import Engine
-from src.core.utils import FrameBuffer
+from src.core.engine import ENGINE_VERSION, Engine
+from src.core.sessions import get_session_manager
+from src.core.autoscaling import EngineAutoscaler
 import logging
 
 logger = logging.getLogger("Deployment")
@@ -18,35 +20,49 @@ def main(args):
         ray.init()
         serve.start()
 
-        # Create frame buffers
-        input_buffer = FrameBuffer.options(name="input_buffer").remote()
-        output_buffer = FrameBuffer.options(name="output_buffer").remote()
+        # Sessions own the per-stream frame buffers
+        session_manager = get_session_manager()
 
-        # Initialize the engine
-        engine = Engine.options(name="engine").remote(config_path='configs/default_pipeline.yaml')
+        # Initialize the engine; replicas, including ones added by the autoscaler, run the
+        # pipeline the SessionManager holds, which set_pipeline replaces
+        engine = Engine.options(name="engine", version=ENGINE_VERSION).remote(
+            config_path=args.pipeline_config)
+
+        # Scale engine replicas on input queue depth and step latency
+        if args.max_engine_replicas > 1:
+            autoscaler = EngineAutoscaler.options(name="engine_autoscaler", lifetime="detached").remote(
+                session_manager, "engine", policy={
+                    'max_replicas': args.max_engine_replicas,
+                    'target_queue_depth': args.target_queue_depth,
+                    'target_p95_ms': args.target_p95_ms,
+                }
+            )
+            autoscaler.start.remote()
 
         # Set pipeline availability
         pipeline_available = args.deploy_pipeline
-        input_buffer.set_pipeline_available.remote(pipeline_available)
+        session_manager.set_pipeline_available.remote(pipeline_available)
 
         # Deploy services based on arguments
         deployments = []
 
         if args.deploy_whip:
-            whip_ingest_server = WHIPIngestServer.bind(input_buffer, output_buffer)
+            whip_ingest_server = WHIPIngestServer.bind(session_manager)
             deployments.append(whip_ingest_server)
 
         if args.deploy_whep:
-            whep_playback_server = WHEPPlaybackServer.bind(output_buffer)
+            whep_playback_server = WHEPPlaybackServer.bind(session_manager)
             deployments.append(whep_playback_server)
 
         if args.deploy_rtmp:
-            rtmp_ingest_server = RTMPIngestServer.bind(input_buffer, output_buffer)
+            rtmp_ingest_server = RTMPIngestServer.bind(session_manager)
             deployments.append(rtmp_ingest_server)
 
         if args.deploy_pipeline:
             pipeline_service = PipelineService.bind(engine)
             deployments.append(pipeline_service)
+            # Prometheus scrape target for the whole system
+            deployments.append(MetricsService.bind())
 
         if deployments:
             serve.run(deployments)
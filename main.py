@@ -19,6 +19,14 @@ if __name__ == "__main__":
         parser.add_argument('--deploy-whep', action='store_true', help='Deploy WHEP Playback Server')
         parser.add_argument('--deploy-rtmp', action='store_true', help='Deploy RTMP Ingest Server')
         parser.add_argument('--deploy-pipeline', action='store_true', help='Deploy Pipeline Service')
+        parser.add_argument('--pipeline-config', default=None,
+                            help='Pipeline YAML every engine replica starts with, unless one is set already')
+        parser.add_argument('--max-engine-replicas', type=int, default=1,
+                            help='Autoscale the engine up to this many replicas')
+        parser.add_argument('--target-queue-depth', type=int, default=8,
+                            help='Frames waiting per engine replica before scaling out')
+        parser.add_argument('--target-p95-ms', type=float, default=None,
+                            help='Scale out when the p95 step latency exceeds this')
         args = parser.parse_args()
 
         # Start deployment with provided arguments
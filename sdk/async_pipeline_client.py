@@ -0,0 +1,161 @@
+# sdk/async_pipeline_client.py
+
+import asyncio
+import json
+import logging
+import os
+from collections import namedtuple
+import aiohttp
+import yaml
+from sdk.wire import (INVALID_REQUEST_ID, MAX_STREAM_MESSAGE, STREAM_CONTENT_TYPE, encode_frame, is_array,
+                      pack_message, read_message, unpack_message)
+from sdk.pipeline_client import decode_result, request_options
+
+logger = logging.getLogger("AsyncPipelineClient")
+
+StreamResult = namedtuple('StreamResult', ['index', 'status', 'body'])
+
+
+class AsyncPipelineClient:
+    """
+    asyncio client. All requests share one keep-alive connector limited to
+    `pool_size` connections; stream() sends a sequence of frames as a
+    single chunked upload and yields results as they finish.
+    """
+
+    def __init__(self, server_url='http://localhost:8000', pool_size=8, keepalive_timeout=30):
+        self.server_url = server_url.rstrip('/')
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+
+    def _session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def set_pipeline(self, pipeline_config):
+        try:
+            if isinstance(pipeline_config, dict):
+                pipeline_yaml = yaml.dump(pipeline_config)
+            elif isinstance(pipeline_config, str):
+                if os.path.exists(pipeline_config):
+                    with open(pipeline_config, 'r') as f:
+                        pipeline_yaml = f.read()
+                else:
+                    pipeline_yaml = pipeline_config
+            else:
+                raise ValueError("pipeline_config must be a YAML string, a file path, or a dictionary.")
+
+            url = f"{self.server_url}/pipeline?action=set_pipeline"
+            headers = {'Content-Type': 'text/plain'}
+            async with self._session().post(url, data=pipeline_yaml, headers=headers) as response:
+                response.raise_for_status()
+                return await response.text()
+        except Exception as e:
+            logger.exception(f"Error in set_pipeline: {e}")
+            raise
+
+    async def get_pipeline(self):
+        try:
+            url = f"{self.server_url}/pipeline?action=get_pipeline"
+            async with self._session().get(url) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+                return data.get('pipeline', {})
+        except Exception as e:
+            logger.exception(f"Error in get_pipeline: {e}")
+            raise
+
+    async def infer(self, data, timeout_ms=None, image_format=None, compression=None, params=None):
+        try:
+            url = f"{self.server_url}/pipeline?action=inference"
+            data, query, headers = request_options(data, timeout_ms, image_format, compression, params)
+            async with self._session().post(url, data=data, params=query, headers=headers) as response:
+                response.raise_for_status()
+                return decode_result(await response.read(), image_format)
+        except Exception as e:
+            logger.exception(f"Error in infer: {e}")
+            raise
+
+    async def infer_many(self, items, timeout_ms=None, image_format=None, compression=None, concurrency=None,
+                         params=None):
+        """Runs infer() on every item with up to `concurrency` requests in flight; results keep input order."""
+        slots = asyncio.Semaphore(concurrency or self.pool_size)
+
+        async def infer(data):
+            async with slots:
+                return await self.infer(data, timeout_ms, image_format, compression, params)
+
+        return await asyncio.gather(*(infer(data) for data in items))
+
+    async def stream(self, frames, timeout_ms=None, image_format=None, compression=None, window=8, params=None):
+        """
+        Sends `frames` (an iterable or async iterable of encoded images or
+        NumPy arrays) as one chunked HTTP upload, with up to `window` of them
+        in flight on the server, and yields a StreamResult per frame in
+        completion order. `index` is the position of the frame in `frames`;
+        failed frames carry their HTTP-style status and error text. Behind a
+        proxy that buffers requests, results arrive once the upload is done.
+        `params`, e.g. {'adapter': 'watercolor'}, apply to every frame.
+        """
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}.")
+        query = {'window': window}
+        if timeout_ms is not None:
+            query['timeout_ms'] = timeout_ms
+        if image_format is not None:
+            query['format'] = image_format
+        if compression is not None:
+            query['compression'] = compression
+        if params:
+            query['params'] = json.dumps(params)
+        url = f"{self.server_url}/pipeline/stream"
+        sent = 0
+
+        async def body():
+            nonlocal sent
+            async for data in _aiter(frames):
+                if is_array(data):
+                    data = encode_frame(data, compression=compression)
+                yield pack_message(sent, bytes(data))
+                sent += 1
+
+        headers = {'Content-Type': STREAM_CONTENT_TYPE}
+        async with self._session().post(url, params=query, data=body(), headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=None)) as response:
+            response.raise_for_status()
+            received = 0
+            while True:
+                message = await read_message(response.content, MAX_STREAM_MESSAGE)
+                if message is None:
+                    break
+                index, status, result = unpack_message(message)
+                if index == INVALID_REQUEST_ID:
+                    raise ConnectionError(f"Server rejected the stream: {bytes(result).decode(errors='replace')}")
+                received += 1
+                result = bytes(result)
+                yield StreamResult(index, status, decode_result(result, image_format) if status == 200 else result)
+            if received != sent:
+                raise ConnectionError(f"Stream closed with {received} of {sent} results received.")
+
+
+async def _aiter(items):
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -1,16 +1,69 @@
 # sdk/pipeline_client.py
 
+import json
 import requests
 import yaml
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from sdk.wire import FRAME_CONTENT_TYPE, decode_frame, encode_frame, is_array
 
 logger = logging.getLogger("PipelineClient")
 
 
+def request_options(data, timeout_ms=None, image_format=None, compression=None, params=None):
+    """
+    Returns the body, query parameters and headers of an inference request.
+    NumPy arrays (BGR pixels) are sent as raw frames instead of images, and
+    image_format='raw' asks for raw results through the Accept header, so
+    neither side encodes JPEG. `params` are per-request step overrides, such
+    as {'adapter': 'watercolor'} for a LoRA model step.
+    """
+    query = {}
+    headers = {}
+    if timeout_ms is not None:
+        query['timeout_ms'] = timeout_ms
+    if params:
+        query['params'] = json.dumps(params)
+    if is_array(data):
+        data = encode_frame(data, compression=compression)
+        headers['Content-Type'] = FRAME_CONTENT_TYPE
+    if image_format == 'raw':
+        headers['Accept'] = FRAME_CONTENT_TYPE + (f'; compression={compression}' if compression else '')
+    elif image_format is not None:
+        query['format'] = image_format
+    return data, query, headers
+
+
+def decode_result(body, image_format=None):
+    """Raw results become a WireFrame whose `data` is a zero-copy array view of `body`."""
+    return decode_frame(body) if image_format == 'raw' else body
+
+
 class PipelineClient:
-    def __init__(self, server_url='http://localhost:8000'):
+    """
+    Blocking client. Requests share one keep-alive connection pool, so
+    repeated calls skip connection setup; `pool_size` bounds the connections
+    kept per host and thereby the useful concurrency of infer_many().
+    """
+
+    def __init__(self, server_url='http://localhost:8000', pool_size=8):
         self.server_url = server_url.rstrip('/')
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def set_pipeline(self, pipeline_config):
         try:
@@ -28,7 +81,7 @@ class PipelineClient:
             url = f"{self.server_url}/pipeline?action=set_pipeline"
             headers = {'Content-Type': 'text/plain'}
 
-            response = requests.post(url, data=pipeline_yaml, headers=headers)
+            response = self.session.post(url, data=pipeline_yaml, headers=headers)
             response.raise_for_status()
             return response.text
         except Exception as e:
@@ -41,7 +94,7 @@ class PipelineClient:
 
             with open(file_path, 'rb') as f:
                 files = {'file': (os.path.basename(file_path), f, 'application/octet-stream')}
-                response = requests.post(url, files=files)
+                response = self.session.post(url, files=files)
                 response.raise_for_status()
                 return response.text
         except Exception as e:
@@ -52,7 +105,7 @@ class PipelineClient:
         try:
             url = f"{self.server_url}/pipeline?action=list_functions"
 
-            response = requests.get(url)
+            response = self.session.get(url)
             response.raise_for_status()
             data = response.json()
             return data.get('custom_functions', [])
@@ -64,7 +117,7 @@ class PipelineClient:
         try:
             url = f"{self.server_url}/pipeline?action=get_pipeline"
 
-            response = requests.get(url)
+            response = self.session.get(url)
             response.raise_for_status()
             data = response.json()
             return data.get('pipeline', {})
@@ -72,12 +125,21 @@ class PipelineClient:
             logger.exception(f"Error in get_pipeline: {e}")
             raise
 
-    def infer(self, data):
+    def infer(self, data, timeout_ms=None, image_format=None, compression=None, params=None):
         try:
             url = f"{self.server_url}/pipeline?action=inference"
-            response = requests.post(url, data=data)
+            data, query, headers = request_options(data, timeout_ms, image_format, compression, params)
+            response = self.session.post(url, data=data, params=query, headers=headers)
             response.raise_for_status()
-            return response.content
+            return decode_result(response.content, image_format)
         except Exception as e:
             logger.exception(f"Error in infer: {e}")
             raise
+
+    def infer_many(self, items, timeout_ms=None, image_format=None, compression=None, concurrency=None,
+                   params=None):
+        """Runs infer() on every item with up to `concurrency` requests in flight; results keep input order."""
+        concurrency = concurrency or self.pool_size
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(lambda data: self.infer(data, timeout_ms, image_format, compression, params),
+                                 items))
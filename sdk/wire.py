@@ -0,0 +1,194 @@
+# sdk/wire.py
+#
+# Wire formats shared by the client SDK and the server: raw frames and the
+# length-prefixed messages of the streaming endpoint. The SDK owns them so it
+# works without the server's `src` tree; NumPy is only imported to encode or
+# decode raw frames.
+
+import asyncio
+import struct
+import sys
+from collections import namedtuple
+from fractions import Fraction
+
+# Stream messages: request id and status, then the payload. On the chunked HTTP
+# stream every message is preceded by its length.
+STREAM_CONTENT_TYPE = 'application/x-frame-stream'
+STREAM_HEADER = struct.Struct('!IH')
+STREAM_LENGTH = struct.Struct('!I')
+# Replies to messages whose request id could not be read
+INVALID_REQUEST_ID = 2**32 - 1
+# Largest stream message either side accepts
+MAX_STREAM_MESSAGE = 64 * 2**20
+
+
+def pack_message(request_id, payload, status=0):
+    """Frames one payload for the streaming inference connection, length prefix included."""
+    return STREAM_LENGTH.pack(STREAM_HEADER.size + len(payload)) + STREAM_HEADER.pack(request_id, status) + payload
+
+
+def unpack_message(message):
+    """
+    Returns (request_id, status, payload) of a message read by read_message();
+    the payload is a zero-copy view. Messages shorter than the header raise
+    ValueError.
+    """
+    if len(message) < STREAM_HEADER.size:
+        raise ValueError(f"Stream message of {len(message)} bytes is shorter than its header.")
+    request_id, status = STREAM_HEADER.unpack_from(message)
+    return request_id, status, memoryview(message)[STREAM_HEADER.size:]
+
+
+async def read_message(stream, max_size):
+    """
+    Reads the next length-prefixed message from an aiohttp StreamReader.
+    Returns None at the end of the stream, and raises ValueError for a
+    message over `max_size` bytes or one cut off by the end of the stream.
+    """
+    try:
+        prefix = await stream.readexactly(STREAM_LENGTH.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ValueError("Stream ended inside a message length.") from e
+    length, = STREAM_LENGTH.unpack(prefix)
+    if length > max_size:
+        raise ValueError(f"Stream message of {length} bytes exceeds {max_size} bytes.")
+    try:
+        return await stream.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ValueError(f"Stream ended after {len(e.partial)} of {length} message bytes.") from e
+
+
+# Raw frames: header, shape, then the pixel bytes (optionally compressed)
+FRAME_CONTENT_TYPE = 'application/x-raw-frame'
+FRAME_MAGIC = b'RFRM'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('!4sBBB5s8sqiiq')
+NO_VALUE = -2**63
+
+COMPRESSION_CODES = {None: 0, 'lz4': 1, 'zstd': 2}
+COMPRESSION_NAMES = {code: name for name, code in COMPRESSION_CODES.items()}
+
+WireFrame = namedtuple('WireFrame', ['data', 'colorspace', 'pts', 'time_base', 'sequence'])
+
+
+# Largest pixel payload a message may declare; guards allocations driven by client input
+MAX_FRAME_BYTES = 256 * 2**20
+
+
+def _compress(name, data):
+    # lz4 and zstandard are optional; only needed when a peer asks for them
+    if name == 'lz4':
+        import lz4.frame
+        return lz4.frame.compress(data)
+    if name == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=1).compress(data)
+    raise ValueError(f"Unsupported compression '{name}'. Expected one of {sorted(filter(None, COMPRESSION_CODES))}.")
+
+
+def _decompress(name, data, expected):
+    """Decompresses at most `expected` bytes, whatever size the payload claims."""
+    if name == 'lz4':
+        import lz4.frame
+        declared = lz4.frame.get_frame_info(data).get('content_size') or 0
+        if declared > expected:
+            raise ValueError(f"Compressed frame declares {declared} bytes, expected {expected}.")
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+        pixels = decompressor.decompress(data, max_length=expected)
+        if not decompressor.eof:
+            raise ValueError(f"Compressed frame holds more than {expected} bytes.")
+        return pixels
+    if name == 'zstd':
+        import zstandard
+        declared = zstandard.frame_content_size(data)
+        if declared > expected:
+            raise ValueError(f"Compressed frame declares {declared} bytes, expected {expected}.")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=expected)
+    raise ValueError(f"Unsupported compression '{name}'.")
+
+
+def is_array(data):
+    """True for NumPy arrays; never imports NumPy, since an array cannot exist without it."""
+    np = sys.modules.get('numpy')
+    return np is not None and isinstance(data, np.ndarray)
+
+
+def is_frame_message(data):
+    return bytes(data[:len(FRAME_MAGIC)]) == FRAME_MAGIC
+
+
+def encode_frame(data, colorspace="bgr24", pts=None, time_base=None, sequence=None, compression=None):
+    """
+    Serializes a pixel array and its stream metadata. Uncompressed frames
+    cost one copy of the pixels; `compression` is None, 'lz4' or 'zstd'.
+    """
+    import numpy as np
+    array = np.ascontiguousarray(data)
+    if compression not in COMPRESSION_CODES:
+        raise ValueError(f"Unsupported compression '{compression}'.")
+    if array.ndim > 4:
+        raise ValueError(f"Frames have at most 4 dimensions, got {array.ndim}.")
+    time_base = Fraction(time_base) if time_base is not None else None
+    header = FRAME_HEADER.pack(
+        FRAME_MAGIC, FRAME_VERSION, COMPRESSION_CODES[compression], array.ndim,
+        array.dtype.str.encode(), colorspace.encode(),
+        NO_VALUE if pts is None else int(pts),
+        time_base.numerator if time_base is not None else 0,
+        time_base.denominator if time_base is not None else 0,
+        NO_VALUE if sequence is None else int(sequence),
+    )
+    shape = struct.pack(f'!{array.ndim}I', *array.shape)
+    pixels = memoryview(array).cast('B')
+    if compression is not None:
+        pixels = _compress(compression, pixels)
+    return b''.join((header, shape, pixels))
+
+
+def decode_frame(message):
+    """
+    Parses a message produced by encode_frame(). Uncompressed pixels are
+    returned as a read-only np.frombuffer view into `message`, without a copy.
+    Any malformed message raises ValueError.
+    """
+    try:
+        return _decode_frame(message)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Malformed raw frame: {e}") from e
+
+
+def _decode_frame(message):
+    import numpy as np
+    if len(message) < FRAME_HEADER.size or not is_frame_message(message):
+        raise ValueError("Not a raw frame message.")
+    magic, version, compression, ndim, dtype, colorspace, pts, tb_num, tb_den, sequence = \
+        FRAME_HEADER.unpack_from(message)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported raw frame version {version}.")
+    if compression not in COMPRESSION_NAMES:
+        raise ValueError(f"Unknown compression code {compression}.")
+    if ndim > 4:
+        raise ValueError(f"Frames have at most 4 dimensions, got {ndim}.")
+    shape = struct.unpack_from(f'!{ndim}I', message, FRAME_HEADER.size)
+    offset = FRAME_HEADER.size + 4 * ndim
+    dtype = np.dtype(dtype.rstrip(b'\0').decode())
+    if dtype.kind not in 'biuf':
+        raise ValueError(f"Unsupported pixel type {dtype}.")
+    expected = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+    if expected > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {shape} {dtype} exceeds {MAX_FRAME_BYTES} bytes.")
+    pixels = memoryview(message)[offset:]
+    if compression:
+        pixels = _decompress(COMPRESSION_NAMES[compression], pixels, expected)
+    if len(pixels) != expected:
+        raise ValueError(f"Raw frame holds {len(pixels)} bytes, expected {expected} for {shape} {dtype}.")
+    return WireFrame(
+        data=np.frombuffer(pixels, dtype=dtype).reshape(shape),
+        colorspace=colorspace.rstrip(b'\0').decode(),
+        pts=None if pts == NO_VALUE else pts,
+        time_base=Fraction(tb_num, tb_den) if tb_den else None,
+        sequence=None if sequence == NO_VALUE else sequence,
+    )
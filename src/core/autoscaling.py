@@ -0,0 +1,110 @@
+# src/core/autoscaling.py
+
+import asyncio
+import logging
+import math
+import time
+import ray
+from ray import serve
+
+logger = logging.getLogger("Autoscaling")
+
+
+class ScalingPolicy:
+    """
+    Chooses the number of Engine replicas from the frames waiting in session
+    input buffers and the p95 latency of the slowest step, rather than from
+    HTTP request rate, which says nothing about streaming load.
+
+    Each replica should have about `target_queue_depth` frames waiting. A p95
+    above `target_p95_ms` asks for one more replica even when queues look
+    short. A change is only applied once it has been wanted continuously for
+    the up- or downscale delay, so short bursts do not make replicas flap.
+    """
+
+    def __init__(self, min_replicas=1, max_replicas=4, target_queue_depth=8, target_p95_ms=None,
+                 upscale_delay_s=10.0, downscale_delay_s=60.0):
+        self.min_replicas = min_replicas
+        self.max_replicas = max_replicas
+        self.target_queue_depth = target_queue_depth
+        self.target_p95_ms = target_p95_ms
+        self.upscale_delay_s = upscale_delay_s
+        self.downscale_delay_s = downscale_delay_s
+        self.wanted = None
+        self.wanted_since = None
+
+    @staticmethod
+    def from_config(config):
+        return ScalingPolicy(**(config or {}))
+
+    def target(self, current, queue_depth, p95_ms=None):
+        """The replica count the current load calls for, ignoring delays."""
+        desired = math.ceil(queue_depth / self.target_queue_depth) if self.target_queue_depth else current
+        if self.target_p95_ms and p95_ms is not None:
+            if p95_ms > self.target_p95_ms:
+                desired = max(desired, current + 1)
+            elif p95_ms > self.target_p95_ms / 2:
+                # Latency is fine but not comfortable; do not give capacity back yet
+                desired = max(desired, current)
+        return max(self.min_replicas, min(self.max_replicas, desired))
+
+    def decide(self, current, queue_depth, p95_ms=None, now=None):
+        """Returns the replica count to run now."""
+        now = time.time() if now is None else now
+        desired = self.target(current, queue_depth, p95_ms)
+        if desired == current:
+            self.wanted = self.wanted_since = None
+            return current
+        if desired != self.wanted:
+            self.wanted, self.wanted_since = desired, now
+        delay = self.upscale_delay_s if desired > current else self.downscale_delay_s
+        if now - self.wanted_since < delay:
+            return current
+        self.wanted = self.wanted_since = None
+        return desired
+
+
+@ray.remote
+class EngineAutoscaler:
+    """
+    Periodically reads replica load from the SessionManager and resizes the
+    Engine deployment according to a ScalingPolicy.
+    """
+
+    def __init__(self, session_manager, deployment_name="engine", policy=None, interval=5.0):
+        self.session_manager = session_manager
+        self.deployment_name = deployment_name
+        self.policy = ScalingPolicy.from_config(policy)
+        self.interval = interval
+        self.replicas = None
+        self.task = None
+
+    async def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                load = await self.session_manager.load.remote()
+                current = self.replicas or max(1, len(load['replicas']))
+                desired = self.policy.decide(current, load['queue_depth'], load['p95_ms'])
+                if desired != current:
+                    logger.info(f"Scaling '{self.deployment_name}' from {current} to {desired} replicas "
+                                f"(queue depth {load['queue_depth']}, p95 {load['p95_ms']} ms).")
+                    await loop.run_in_executor(None, self._scale, desired)
+                self.replicas = desired
+            except Exception as e:
+                logger.exception(f"Error while autoscaling '{self.deployment_name}': {e}")
+
+    def _scale(self, num_replicas):
+        deployment = serve.get_deployment(self.deployment_name)
+        if deployment.version is None:
+            logger.warning(f"Deployment '{self.deployment_name}' has no version; rescaling restarts every replica.")
+        # Keeping the version makes this a num_replicas update; existing replicas keep models and sessions
+        deployment.options(num_replicas=num_replicas, version=deployment.version).deploy()
+
+    async def stats(self):
+        return {'replicas': self.replicas, 'policy': vars(self.policy)}
@@ -0,0 +1,111 @@
+# src/core/batching.py
+
+import asyncio
+import logging
+from .metrics import SIZE_BUCKETS, registry
+
+logger = logging.getLogger("Batching")
+
+batch_size = registry.histogram('step_batch_size', 'Items per micro-batch.', SIZE_BUCKETS)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent submissions into batches for a single step.
+
+    A batch closes when it reaches `max_batch_size` items or when `max_wait_ms`
+    has passed since its first item arrived. `batch_fn` receives the list of
+    items and must return one result per item, in the same order. It may be a
+    coroutine function; plain functions run in the default executor.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=4, max_wait_ms=10, name=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.queue = None
+        self.worker = None
+        self.batches = 0
+        self.items = 0
+
+    @staticmethod
+    def from_config(batch_fn, config, name=None):
+        return MicroBatcher(
+            batch_fn,
+            max_batch_size=config.get('max_batch_size', 4),
+            max_wait_ms=config.get('max_wait_ms', 10),
+            name=name,
+        )
+
+    def _ensure_started(self):
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._execute(batch)
+
+    async def _execute(self, batch):
+        # Callers that gave up while the batch was filling (e.g. timed out) are not run
+        batch = [(item, future) for item, future in batch if not future.cancelled()]
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        try:
+            if asyncio.iscoroutinefunction(self.batch_fn):
+                results = await self.batch_fn(items)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, items)
+            if results is None or len(results) != len(items):
+                raise ValueError(f"Batch function for '{self.name}' returned a result of the wrong length.")
+        except Exception as e:
+            logger.exception(f"Error executing batch of {len(items)} for '{self.name}': {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.items += len(items)
+        batch_size.observe(len(items), step=self.name)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+
+def group_by_shape(frames):
+    """Returns lists of indices whose frames can be stacked into one batch."""
+    groups = {}
+    for index, frame in enumerate(frames):
+        groups.setdefault(frame.shape, []).append(index)
+    return list(groups.values())
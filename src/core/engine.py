@@ -2,88 +2,448 @@
 
 import asyncio
 import logging
+import time
+from collections import Counter
+from .frame import Frame, as_frame
 from .pipeline import Pipeline
-from .utils import FrameBuffer
-import ray
+from .transport import Tombstone, publish_frame, resolve_frame
+from .executor import run_steps, StagedExecutor
+from .mapping import is_fan_out, iterate
+from .latency import LatencyBudget
+from .sessions import get_session_manager
+from .metrics import registry, start_reporting
+from .startup import report as startup_report
+from .warmup import configure_compile_cache
+from sdk.wire import COMPRESSION_CODES, FRAME_CONTENT_TYPE, is_frame_message
+from .wire import parse_media_type, request_params
 from ray import serve
 
 logger = logging.getLogger("Engine")
 
+# Bump when replicas must restart on redeploy; rescaling keeps it so only num_replicas changes
+ENGINE_VERSION = "1"
+
+frame_latency = registry.histogram('frame_latency_seconds', 'Time from ingest until a processed frame is published.')
+inference_requests = registry.counter('inference_requests_total', 'Inference requests by outcome.')
+
+IMAGE_CONTENT_TYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp',
+                       'raw': FRAME_CONTENT_TYPE}
+
+
+def encode_result(result, image_format='jpg', compression=None):
+    """
+    Returns the response body and content type for an inference result.
+    The 'raw' format skips image encoding and sends the pixels with their
+    metadata in the wire format of sdk/wire.py.
+    """
+    if isinstance(result, list):
+        # Collected fan-out output, e.g. encoded video chunks
+        if result and all(isinstance(item, (bytes, bytearray)) for item in result):
+            return b''.join(result), 'application/octet-stream'
+        raise ValueError("The pipeline returned several items; end it with a collecting step.")
+    if isinstance(result, (bytes, bytearray)):
+        return bytes(result), 'application/octet-stream'
+    if image_format == 'raw':
+        return as_frame(result).to_wire(compression), FRAME_CONTENT_TYPE
+    return as_frame(result).to_bytes(f'.{image_format}'), IMAGE_CONTENT_TYPES[image_format]
+
+
+def negotiate_format(request):
+    """
+    Picks the response format and compression of an inference request: the
+    `format` and `compression` query parameters win, otherwise an Accept
+    header naming the raw frame type selects it.
+    """
+    image_format = request.query.get("format")
+    compression = request.query.get("compression")
+    if image_format is None:
+        media_type, params = parse_media_type(request.headers.get("Accept"))
+        if media_type == FRAME_CONTENT_TYPE:
+            image_format = 'raw'
+            compression = compression or params.get('compression')
+    return (image_format or 'jpg').lower(), compression or None
+
+
+class Stream:
+    """Processing state of one session on this replica."""
+
+    def __init__(self, session, helping=False):
+        self.session_id = session['session_id']
+        self.input_buffer = session['input_buffer']
+        self.output_buffer = session['output_buffer']
+        # Set when this replica only helps drain another replica's backlog
+        self.helping = helping
+        self.executor = None
+        self.generation = None
+        self.task = None
+        self.stopped = False
+
 
 @serve.deployment
 class Engine:
-    def __init__(self, config_path):
+    """
+    Processes the sessions the SessionManager assigns to this replica and
+    serves inference requests. Every replica runs the pipeline config held by
+    the SessionManager; `config_path` only seeds it when none is set yet.
+    """
+
+    def __init__(self, config_path=None):
         self.pipeline = Pipeline()
         self.config_path = config_path
+        self.pipeline_version = 0
+        self.failed_pipeline_version = None
+        self.pipeline_task = None
+        self.fetch_batch_size = 8
+        self.fetch_timeout = 1.0
+        self.heartbeat_interval = 2.0
+        self.latency_budget = LatencyBudget()
+        self.inference_slots = asyncio.Semaphore(16)
+        self.inference_timeout = 30.0
+        self.inference_stats = Counter()
+        self.started = time.time()
+        self.pipeline_ready_s = None
 
-        # Load default pipeline
-        self.load_pipeline(config_path)
+        # Streams are opened by the ingest servers; this replica processes the ones assigned to it
+        self.replica_id = serve.get_replica_context().replica_tag
+        self.session_manager = get_session_manager()
+        self.streams = {}
+        start_reporting(f"engine:{self.replica_id}")
+        # Steps placed in this replica compile here too
+        configure_compile_cache()
 
-        # Initialize frame buffers as Ray actors
-        self.input_buffer = FrameBuffer.options(name="input_buffer").remote()
-        self.output_buffer = FrameBuffer.options(name="output_buffer").remote()
+        if config_path is not None:
+            self.loading_task = asyncio.create_task(self.publish_initial_pipeline(config_path))
 
-        # Start processing task
-        self.processing_task = asyncio.create_task(self.process_frames())
+        # Start picking up sessions and the current pipeline; the replica serves immediately
+        self.session_task = asyncio.create_task(self.sync_sessions())
 
-    def load_pipeline(self, config_path):
+    async def publish_initial_pipeline(self, config_path):
         try:
-            self.pipeline.configure(config_path)
-            logger.info(f"Pipeline loaded from {config_path}")
+            with open(config_path, 'r') as f:
+                pipeline_config = f.read()
+            await self.session_manager.set_pipeline.remote(pipeline_config, replace=False)
         except Exception as e:
-            logger.exception(f"Failed to load pipeline from {config_path}: {e}")
+            logger.exception(f"Failed to publish pipeline from {config_path}: {e}")
 
-    def load_pipeline_from_string(self, pipeline_config_str):
+    async def sync_pipeline(self):
+        """Loads the pipeline config the SessionManager holds when this replica is behind it."""
         try:
-            self.pipeline.configure_from_string(pipeline_config_str)
+            version, pipeline_config = await self.session_manager.get_pipeline.remote()
+            if pipeline_config is None or version == self.pipeline_version:
+                return
+            if await self.load_pipeline_from_string(pipeline_config):
+                self.pipeline_version = version
+                if self.pipeline_ready_s is None:
+                    self.pipeline_ready_s = time.time() - self.started
+                logger.info(f"Pipeline version {version} loaded {time.time() - self.started:.2f}s "
+                            f"after replica start")
+            else:
+                # Not retried until the config changes again; sessions go to replicas that loaded it
+                self.failed_pipeline_version = version
+        except Exception as e:
+            logger.exception(f"Error syncing the pipeline: {e}")
+
+    async def load_pipeline_from_string(self, pipeline_config_str):
+        try:
+            await self.pipeline.configure_from_string(pipeline_config_str)
+            self.configure_execution()
             logger.info("Pipeline loaded from string.")
+            return True
         except Exception as e:
             logger.exception(f"Failed to load pipeline from string: {e}")
+            return False
+
+    def configure_execution(self):
+        execution = self.pipeline.get_execution_config()
+        self.latency_budget = LatencyBudget(execution.get('latency_budget_ms'))
+        # Requests already holding a slot keep the previous semaphore
+        self.inference_slots = asyncio.Semaphore(execution.get('inference_concurrency', 16))
+        self.inference_timeout = execution.get('inference_timeout_ms', 30000) / 1000.0
+        for stream in self.streams.values():
+            self.configure_stream_execution(stream)
+
+    def configure_stream_execution(self, stream):
+        execution = self.pipeline.get_execution_config()
+        previous, previous_generation = stream.executor, stream.generation
+        if execution.get('mode', 'sequential') == 'staged':
+            # The executor pins its generation until it has drained
+            stream.generation = self.pipeline.hold()
+            stream.executor = StagedExecutor(
+                self.pipeline.steps, lambda frame: self.publish_result(stream, frame),
+                queue_depth=execution.get('queue_depth', 2), budget=self.latency_budget,
+                on_drop=lambda frame: self.publish_drop(stream, frame)
+            )
+            logger.info(f"Session '{stream.session_id}' uses staged execution with queue depth "
+                        f"{stream.executor.queue_depth}.")
+        else:
+            stream.executor = None
+            stream.generation = None
+        if previous is not None:
+            # Frames already inside the old stages finish on the old steps
+            asyncio.create_task(self.retire_executor(previous, previous_generation))
 
-    async def process_frames(self):
-        logger.info("Starting frame processing loop.")
+    async def retire_executor(self, executor, generation):
+        await executor.stop()
+        self.pipeline.release(generation)
+
+    async def sync_sessions(self):
         while True:
             try:
-                frame = await self.input_buffer.get_frame.remote()
-                if frame is not None:
-                    processed_frame = await self.process_frame(frame)
-                    if processed_frame:
-                        await self.output_buffer.add_frame.remote(processed_frame)
-                else:
-                    # Sleep briefly if no frame is available
-                    await asyncio.sleep(0.01)
+                assignment = await self.session_manager.heartbeat.remote(self.replica_id, await self.get_load())
+                self.apply_assignment(assignment)
+                version = assignment.get('pipeline_version', 0)
+                if version not in (self.pipeline_version, self.failed_pipeline_version) \
+                        and (self.pipeline_task is None or self.pipeline_task.done()):
+                    # Loading can take a while, so heartbeats keep going meanwhile
+                    self.pipeline_task = asyncio.create_task(self.sync_pipeline())
             except Exception as e:
-                logger.exception(f"Error in process_frames: {e}")
-                await asyncio.sleep(0.1)
+                logger.exception(f"Error syncing sessions: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
 
-    async def process_frame(self, frame):
-        if not self.pipeline.steps:
-            logger.warning("No pipeline is currently loaded.")
-            return None
-        data = frame
-        for step in self.pipeline.steps:
+    def apply_assignment(self, assignment):
+        """Starts and stops streams to match the sessions the manager assigned to this replica."""
+        owned = {session['session_id']: session for session in assignment['owned']}
+        backlogged = {session['session_id']: session for session in assignment['backlogged']}
+        for session_id, stream in list(self.streams.items()):
+            if session_id not in owned and (not stream.helping or session_id not in backlogged):
+                self.stop_stream(session_id)
+        for session_id, session in owned.items():
+            stream = self.streams.get(session_id)
+            if stream is None:
+                self.start_stream(session)
+            else:
+                stream.helping = False
+        for session_id, session in backlogged.items():
+            if session_id not in self.streams:
+                self.start_stream(session, helping=True)
+
+    async def get_load(self):
+        """Input queue depth of the sessions this replica owns, its p95 step latency and pipeline version."""
+        owned = [stream for stream in self.streams.values() if not stream.helping]
+        depths = await asyncio.gather(*[stream.input_buffer.size.remote() for stream in owned])
+        p95 = self.latency_budget.percentile(95)
+        return {
+            'queue_depth': {stream.session_id: depth for stream, depth in zip(owned, depths)},
+            'p95_ms': p95 * 1000.0 if p95 is not None else None,
+            'pipeline_version': self.pipeline_version,
+        }
+
+    def start_stream(self, session, helping=False):
+        stream = Stream(session, helping)
+        self.streams[stream.session_id] = stream
+        self.configure_stream_execution(stream)
+        stream.task = asyncio.create_task(self.process_frames(stream))
+        logger.info(f"{'Helping with' if helping else 'Processing'} session '{stream.session_id}'.")
+
+    def stop_stream(self, session_id):
+        # The loop exits after its current fetch, so frames already taken from the buffer are not lost
+        stream = self.streams.pop(session_id)
+        stream.stopped = True
+        logger.info(f"Stopped processing session '{session_id}'.")
+
+    async def publish_result(self, stream, processed_frame):
+        ingest_time = getattr(processed_frame, 'ingest_time', None)
+        if ingest_time is not None:
+            frame_latency.observe(time.time() - ingest_time)
+        await publish_frame(stream.output_buffer, processed_frame)
+
+    async def publish_drop(self, stream, frame):
+        """Tells playback that `frame` will never arrive, so it does not wait for it."""
+        sequence = getattr(frame, 'sequence', None)
+        if sequence is not None:
+            await stream.output_buffer.add_frame.remote(Tombstone(sequence))
+
+    async def process_frames(self, stream):
+        logger.info(f"Starting frame processing loop for session '{stream.session_id}'.")
+        while not stream.stopped:
             try:
-                if asyncio.iscoroutinefunction(step.process):
-                    data = await step.process(data)
-                else:
-                    # Use Ray tasks to run synchronous steps
-                    data = await ray.remote(step.process).remote(data)
-                if data is None:
-                    logger.error(f"Step '{step.name}' returned None.")
-                    return None
+                # Blocks in the buffer until frames arrive, so there is no polling delay
+                items = await stream.input_buffer.get_frames.remote(
+                    self.fetch_batch_size, timeout=self.fetch_timeout
+                )
+                # Frames the input buffer dropped are reported straight away
+                tombstones = [item for item in items if isinstance(item, Tombstone)]
+                if tombstones:
+                    await stream.output_buffer.add_frames.remote(tombstones)
+                # Frames fetched together run concurrently so batched steps can coalesce them
+                frames = await asyncio.gather(*[resolve_frame(item) for item in items
+                                                if not isinstance(item, Tombstone)])
+                if stream.executor is not None:
+                    for frame in frames:
+                        await stream.executor.submit(frame)
+                    continue
+                results = await asyncio.gather(*[self.process_frame(frame) for frame in frames])
+                for frame, result in zip(frames, results):
+                    if result is None:
+                        # Over its latency budget or failed
+                        await self.publish_drop(stream, frame)
+                        continue
+                    if is_fan_out(result):
+                        # Fan-out pipelines without a collector return one result per item
+                        for processed_frame in result:
+                            await self.publish_result(stream, processed_frame)
+                    else:
+                        await self.publish_result(stream, result)
             except Exception as e:
-                logger.exception(f"Error during pipeline execution at step '{step.name}': {e}")
+                logger.exception(f"Error in process_frames for session '{stream.session_id}': {e}")
+                await asyncio.sleep(0.1)
+        if stream.executor is not None:
+            await self.retire_executor(stream.executor, stream.generation)
+
+    async def process_frame(self, frame):
+        # The step list is captured once, so a concurrent set_pipeline never splits a frame
+        with self.pipeline.acquire() as steps:
+            if not steps:
+                logger.warning("No pipeline is currently loaded.")
+                return None
+            max_parallelism = self.pipeline.get_execution_config().get('max_parallelism', 4)
+            result = await run_steps(steps, frame, max_parallelism, self.latency_budget, drop_failed=True)
+            if is_fan_out(result):
+                # Lazy results still run the steps, so they are consumed while those are held
+                result = [item async for item in iterate(result)]
+            return result
+
+    async def run_inference(self, data, params=None):
+        """
+        Runs one request payload through the current pipeline without the
+        stream buffers. Concurrent requests meet in the micro-batchers of
+        batched steps, so they share model calls. `params` apply to every
+        frame of the request.
+        """
+        with self.pipeline.acquire() as steps:
+            if not steps:
+                logger.warning("No pipeline is currently loaded.")
                 return None
-        return data
+            max_parallelism = self.pipeline.get_execution_config().get('max_parallelism', 4)
+            result = await run_steps(steps, data, max_parallelism, params=params)
+            if is_fan_out(result):
+                # Consumed while the steps are still held
+                result = [item async for item in iterate(result)]
+            return result
+
+    async def infer(self, data, timeout_ms=None, image_format='jpg', compression=None, params=None):
+        """
+        Runs one payload under the inference concurrency cap and deadline.
+        Returns (status, body, content_type); also called by the streaming
+        endpoint of PipelineService for every frame it receives. Payloads in
+        the raw frame format are decoded here, other bytes by the first step.
+        `params` are per-request step overrides such as {"adapter": ...};
+        encoded images are then decoded here too, so the first step already
+        sees them.
+        """
+        if image_format not in IMAGE_CONTENT_TYPES or compression not in COMPRESSION_CODES:
+            logger.error(f"Unsupported response format '{image_format}' with compression '{compression}'.")
+            return 400, b"Unsupported response format.", 'text/plain'
+        if is_frame_message(data):
+            try:
+                data = Frame.from_wire(data)
+            except ValueError as e:
+                logger.error(f"Invalid raw frame: {e}")
+                return 400, b"Invalid raw frame.", 'text/plain'
+        elif params:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(None, Frame.from_bytes, data)
+            except ValueError:
+                # Not an image, e.g. a video; the frames its first step creates get the params
+                pass
+        loop = asyncio.get_running_loop()
+        timeout = self.inference_timeout
+        if timeout_ms is not None:
+            timeout = min(float(timeout_ms) / 1000.0, timeout)
+        deadline = loop.time() + timeout
+
+        slots = self.inference_slots
+        try:
+            # Waiting for a slot counts against the request's timeout
+            await asyncio.wait_for(slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.inference_stats['rejected'] += 1
+            inference_requests.inc(result='rejected')
+            return 503, b"Too many concurrent inference requests.", 'text/plain'
+        try:
+            result = await asyncio.wait_for(self.run_inference(data, params), max(0.0, deadline - loop.time()))
+            if result is None:
+                raise ValueError("The pipeline returned no result.")
+            body, content_type = await loop.run_in_executor(None, encode_result, result, image_format, compression)
+        except asyncio.TimeoutError:
+            self.inference_stats['timeout'] += 1
+            inference_requests.inc(result='timeout')
+            return 504, b"Inference timed out.", 'text/plain'
+        except Exception as e:
+            logger.exception(f"Inference failed: {e}")
+            self.inference_stats['failed'] += 1
+            inference_requests.inc(result='failed')
+            return 500, b"Inference failed.", 'text/plain'
+        finally:
+            slots.release()
+        self.inference_stats['ok'] += 1
+        inference_requests.inc(result='ok')
+        return 200, body, content_type
+
+    async def handle_inference(self, request):
+        try:
+            timeout_ms = request.query.get("timeout_ms")
+            image_format, compression = negotiate_format(request)
+            params = request_params(request)
+            data = await request.read()
+            if parse_media_type(request.headers.get("Content-Type"))[0] == FRAME_CONTENT_TYPE \
+                    and not is_frame_message(data):
+                raise ValueError("Body is not a raw frame.")
+        except Exception as e:
+            logger.error(f"Invalid inference request: {e}")
+            return serve.Response("Invalid inference request.", status=400)
+        status, body, content_type = await self.infer(data, timeout_ms, image_format, compression, params)
+        return serve.Response(body, status=status, headers={"Content-Type": content_type})
+
+    async def get_stats(self):
+        stats = {
+            'replica': self.replica_id,
+            'pipeline_version': self.pipeline_version,
+            'batching': {step.name: step.batcher.stats() for step in self.pipeline.steps if step.batcher},
+            'result_cache': {step.name: step.result_cache.stats() for step in self.pipeline.steps
+                             if step.result_cache},
+            'gating': {step.name: step.gate.stats() for step in self.pipeline.steps if step.gate},
+            'latency_budget': self.latency_budget.stats(),
+            'inference': dict(self.inference_stats),
+            'sessions': {},
+        }
+        for session_id, stream in list(self.streams.items()):
+            session_stats = {
+                'helping': stream.helping,
+                'execution': 'staged' if stream.executor is not None else 'sequential',
+                'buffers': {
+                    'input': await stream.input_buffer.stats.remote(),
+                    'output': await stream.output_buffer.stats.remote(),
+                },
+            }
+            if stream.executor is not None:
+                session_stats['stages'] = stream.executor.stats()
+            stats['sessions'][session_id] = session_stats
+        stats['startup'] = {**startup_report(), 'pipeline_ready_s': self.pipeline_ready_s}
+        stats['worker_pool'] = self.pipeline.worker_pool.stats()
+        workers = self.pipeline.get_worker_stats()
+        stats['workers'] = {group: await ref for group, ref in workers.items()}
+        return stats
+
+    async def handle_request(self, request):
+        return await self(request)
 
     async def __call__(self, request):
         action = request.query.get("action")
         if action == "set_pipeline":
             pipeline_config = await request.text()
-            self.load_pipeline_from_string(pipeline_config)
+            if not await self.load_pipeline_from_string(pipeline_config):
+                # The previous pipeline stays active when the new one fails to build
+                return serve.Response("Failed to set pipeline.", status=400)
+            # Only this replica got the request; the others load the config on their next heartbeat
+            self.pipeline_version = await self.session_manager.set_pipeline.remote(pipeline_config)
             return serve.Response("Pipeline set successfully.", status=200)
         elif action == "get_pipeline":
             pipeline = self.pipeline.get_pipeline_config()
             return serve.json_response({"pipeline": pipeline})
+        elif action == "get_stats":
+            return serve.json_response(await self.get_stats())
+        elif action == "inference":
+            return await self.handle_inference(request)
         else:
             return serve.Response("Invalid action.", status=400)
@@ -0,0 +1,242 @@
+# src/core/executor.py
+
+import asyncio
+import logging
+import time
+from collections.abc import Iterator
+from .frame import with_params
+from .mapping import CollectedIterator, QueueIterator, collector_executor, is_fan_out, iterate, ordered_map
+from .metrics import registry
+
+logger = logging.getLogger("Executor")
+
+step_latency = registry.histogram('step_latency_seconds', 'Time spent in each pipeline step.')
+step_errors = registry.counter('step_errors_total', 'Pipeline step failures, including steps returning None.')
+
+
+async def run_step(step, data):
+    gate = getattr(step, 'gate', None)
+    if gate is None:
+        return await _run_cached(step, data)
+    # Near-identical consecutive frames of a stream reuse the last output
+    reused, current = await asyncio.get_running_loop().run_in_executor(None, gate.check, data)
+    if reused is not None:
+        return reused
+    result = await _run_cached(step, data)
+    if result is not None:
+        gate.update(data, current, result)
+    return result
+
+
+async def _run_cached(step, data):
+    cache = getattr(step, 'result_cache', None)
+    if cache is None:
+        return await _run_step(step, data)
+    # Hashing a large frame takes a moment; hashlib releases the GIL, so it runs in a thread
+    key = await asyncio.get_running_loop().run_in_executor(None, cache.key, data)
+    if key is not None:
+        result = cache.get(key, data)
+        if result is not None:
+            return result
+    result = await _run_step(step, data)
+    if key is not None and result is not None and not is_fan_out(result):
+        cache.put(key, result)
+    return result
+
+
+async def _run_step(step, data):
+    if step.batcher is not None:
+        return await step.batcher.submit(data)
+    if asyncio.iscoroutinefunction(step.process):
+        return await step.process(data)
+    # Local synchronous steps run in a thread so the event loop keeps serving frames
+    executor = collector_executor if step.collects else None
+    return await asyncio.get_running_loop().run_in_executor(executor, step.process, data)
+
+
+async def run_step_logged(step, data, budget=None):
+    try:
+        start = time.perf_counter()
+        result = await run_step(step, data)
+        elapsed = time.perf_counter() - start
+        step_latency.observe(elapsed, step=step.name)
+        if budget is not None:
+            budget.observe(step, elapsed)
+        if result is None:
+            step_errors.inc(step=step.name)
+            logger.error(f"Step '{step.name}' returned None.")
+        return result
+    except Exception as e:
+        step_errors.inc(step=step.name)
+        logger.exception(f"Error during pipeline execution at step '{step.name}': {e}")
+        return None
+
+
+async def run_collector(step, results, limit):
+    """Feeds an ordered async stream of per-item results into a collecting step."""
+    if asyncio.iscoroutinefunction(step.process) or step.batcher is not None:
+        # Remote collectors need a concrete list to cross the actor boundary
+        try:
+            items = [result async for result in results]
+        finally:
+            await results.aclose()
+        return await run_step_logged(step, items)
+    items = QueueIterator(asyncio.get_running_loop(), limit)
+    items.start(results)
+    try:
+        result = await run_step_logged(step, items)
+    except BaseException:
+        items.close()
+        raise
+    if isinstance(result, Iterator):
+        # Lazy output keeps reading the items; iterate() cancels the feeder if it stops early
+        return CollectedIterator(result, items)
+    # Whether the step finished or failed, the feeder and its source go away
+    items.close()
+    return result
+
+
+async def run_steps(steps, data, max_parallelism=4, budget=None, params=None, drop_failed=False):
+    """
+    Runs `data` through `steps`. When a step returns a list or iterator, each
+    item goes through the following steps up to the next collecting step on
+    its own, with up to `max_parallelism` items in flight, and the ordered
+    results are handed to the collector. Without a collector the list of
+    per-item results is returned. Frames that can no longer meet `budget`
+    are dropped before expensive steps. `params` are set on every Frame a
+    step receives, also on frames a fan-out step creates, so a request can
+    pick e.g. the LoRA adapter. A fanned-out item without a result fails
+    the run, unless `drop_failed` allows skipping it, as on live streams.
+    """
+    index = 0
+    while index < len(steps):
+        step = steps[index]
+        if budget is not None and not budget.admit(data, steps[index:]):
+            return None
+        data = await run_step_logged(step, with_params(data, params), budget)
+        if data is None:
+            return None
+        index += 1
+        if index == len(steps) or not is_fan_out(data):
+            continue
+
+        limit = max(1, int((step.config or {}).get('max_parallelism', max_parallelism)))
+        end = next((j for j in range(index, len(steps)) if steps[j].collects), len(steps))
+        if end == index:
+            # A collector directly after the fan-out takes the items as they are
+            data = await run_collector(steps[end], iterate(data), limit)
+        else:
+            segment = steps[index:end]
+            results = ordered_map(
+                iterate(data), lambda item: run_steps(segment, item, max_parallelism, budget, params, drop_failed),
+                limit, drop_failed)
+            if end == len(steps):
+                return [result async for result in results]
+            data = await run_collector(steps[end], results, limit)
+        if data is None:
+            return None
+        index = end + 1
+    return data
+
+
+class StagedExecutor:
+    """
+    Runs each pipeline step in its own worker task with a bounded queue in
+    front of it, so step k can work on frame n while step k+1 handles frame
+    n-1. A full queue blocks `submit`, which pushes back on the input buffer
+    instead of letting work pile up between stages. Frames that a stage
+    drops or fails on are passed to `on_drop`, if given.
+    """
+
+    def __init__(self, steps, on_result, queue_depth=2, budget=None, on_drop=None):
+        self.steps = list(steps)
+        self.on_result = on_result
+        self.on_drop = on_drop
+        self.budget = budget
+        self.queue_depth = max(1, int(queue_depth))
+        self.queues = []
+        self.workers = []
+        self.processed = [0] * len(self.steps)
+
+    def _ensure_started(self):
+        if self.workers:
+            return
+        # A batched stage needs room for a full batch in front of it
+        self.queues = [asyncio.Queue(maxsize=max(self.queue_depth, step.batcher.max_batch_size if step.batcher else 0))
+                       for step in self.steps]
+        self.workers = [asyncio.create_task(self._run_stage(i)) for i in range(len(self.steps))]
+
+    async def submit(self, frame):
+        if not self.steps:
+            logger.warning("No pipeline is currently loaded.")
+            return
+        self._ensure_started()
+        await self.queues[0].put(frame)
+
+    async def _run_stage(self, index):
+        step = self.steps[index]
+        queue = self.queues[index]
+        while True:
+            items = [await queue.get()]
+            if step.batcher is not None:
+                # Frames already waiting go to the micro-batcher together instead of as batches of one
+                while len(items) < step.batcher.max_batch_size and not queue.empty():
+                    items.append(queue.get_nowait())
+            try:
+                results = await asyncio.gather(*(self._process(index, data) for data in items))
+                for data, result in zip(items, results):
+                    if result is None:
+                        if self.on_drop is not None:
+                            await self.on_drop(data)
+                        continue
+                    if index + 1 < len(self.steps):
+                        await self.queues[index + 1].put(result)
+                    else:
+                        await self.on_result(result)
+            except Exception as e:
+                step_errors.inc(step=step.name)
+                logger.exception(f"Error during staged execution at step '{step.name}': {e}")
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    async def _process(self, index, data):
+        step = self.steps[index]
+        try:
+            if self.budget is not None and not self.budget.admit(data, self.steps[index:]):
+                return None
+            start = time.perf_counter()
+            result = await run_step(step, data)
+            elapsed = time.perf_counter() - start
+            step_latency.observe(elapsed, step=step.name)
+            if self.budget is not None:
+                self.budget.observe(step, elapsed)
+            self.processed[index] += 1
+            if result is None:
+                step_errors.inc(step=step.name)
+                logger.error(f"Step '{step.name}' returned None.")
+            return result
+        except Exception as e:
+            step_errors.inc(step=step.name)
+            logger.exception(f"Error during staged execution at step '{step.name}': {e}")
+            return None
+
+    def queue_depths(self):
+        if not self.queues:
+            return {step.name: 0 for step in self.steps}
+        return {step.name: queue.qsize() for step, queue in zip(self.steps, self.queues)}
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'queues': self.queue_depths(),
+            'processed': {step.name: count for step, count in zip(self.steps, self.processed)},
+        }
+
+    async def stop(self):
+        # Let frames already inside the stages finish before the workers go away
+        for queue in self.queues:
+            await queue.join()
+        for worker in self.workers:
+            worker.cancel()
+        self.workers = []
@@ -0,0 +1,177 @@
+# src/core/frame.py
+
+import functools
+import logging
+import cv2
+import numpy as np
+from sdk.wire import decode_frame, encode_frame
+
+logger = logging.getLogger("Frame")
+
+
+class Frame:
+    """
+    A decoded video frame passed between pipeline steps.
+
+    Frames carry the pixel data as a NumPy array together with the metadata
+    needed to put the stream back together at the playback edge. Steps should
+    return `frame.with_data(new_array)` so that metadata survives the step.
+    The array may be a read-only view into shared memory, so steps must not
+    modify `data` in place. `params` holds per-frame overrides that steps may
+    honour, such as the LoRA adapter to apply. `ingest_time` is the wall-clock
+    time the frame entered the system and drives latency budgets. `stream_id`
+    names the session the frame belongs to, for steps that keep per-stream
+    state.
+    """
+
+    def __init__(self, data, colorspace="bgr24", pts=None, time_base=None, sequence=None, params=None,
+                 ingest_time=None, stream_id=None):
+        self.data = data
+        self.colorspace = colorspace
+        self.pts = pts
+        self.time_base = time_base
+        self.sequence = sequence
+        self.params = params or {}
+        self.ingest_time = ingest_time
+        self.stream_id = stream_id
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def width(self):
+        return self.data.shape[1]
+
+    @property
+    def height(self):
+        return self.data.shape[0]
+
+    @staticmethod
+    def from_bytes(data, **metadata):
+        img_array = np.frombuffer(data, dtype=np.uint8)
+        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("Unable to decode image bytes.")
+        return Frame(img, colorspace="bgr24", **metadata)
+
+    @staticmethod
+    def from_wire(message, **metadata):
+        """Decodes a raw frame message; the pixels stay a view into `message`."""
+        wire = decode_frame(message)
+        return Frame(wire.data, colorspace=wire.colorspace, pts=wire.pts, time_base=wire.time_base,
+                     sequence=wire.sequence, **metadata)
+
+    def to_wire(self, compression=None):
+        return encode_frame(self.data, self.colorspace, self.pts, self.time_base, self.sequence, compression)
+
+    def to_bytes(self, ext='.jpg'):
+        success, buffer = cv2.imencode(ext, self.to_bgr())
+        if not success:
+            raise ValueError(f"Unable to encode frame as '{ext}'.")
+        return buffer.tobytes()
+
+    def to_bgr(self):
+        if self.colorspace == "rgb24":
+            return cv2.cvtColor(self.data, cv2.COLOR_RGB2BGR)
+        return self.data
+
+    def to_rgb(self):
+        if self.colorspace == "bgr24":
+            return cv2.cvtColor(self.data, cv2.COLOR_BGR2RGB)
+        return self.data
+
+    def with_data(self, data, colorspace=None):
+        return Frame(
+            data,
+            colorspace=colorspace or self.colorspace,
+            pts=self.pts,
+            time_base=self.time_base,
+            sequence=self.sequence,
+            params=self.params,
+            ingest_time=self.ingest_time,
+            stream_id=self.stream_id,
+        )
+
+    def __repr__(self):
+        return (f"Frame(shape={self.shape}, colorspace={self.colorspace}, "
+                f"pts={self.pts}, sequence={self.sequence})")
+
+
+def as_frame(data):
+    """
+    Coerces step input into a Frame. Encoded image bytes are decoded and bare
+    arrays are assumed to be BGR, which is what OpenCV and aiortc produce.
+    """
+    if isinstance(data, Frame):
+        return data
+    if isinstance(data, np.ndarray):
+        return Frame(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return Frame.from_bytes(bytes(data))
+    raise TypeError(f"Cannot convert {type(data).__name__} to Frame.")
+
+
+def with_params(data, params):
+    """
+    Returns `data` with request-level `params` merged over its per-frame
+    params. Only Frames carry params; other data is returned unchanged. The
+    Frame is copied, so cached or shared frames keep their own params.
+    """
+    if not params or not isinstance(data, Frame) or data.params.items() >= params.items():
+        return data
+    frame = data.with_data(data.data)
+    frame.params = {**data.params, **params}
+    return frame
+
+
+def frame_function(func):
+    """
+    Marks a function as frame-aware so FunctionStep hands it Frame objects
+    directly instead of going through the bytes adapter.
+    """
+    func.accepts_frames = True
+    return func
+
+
+def collects_frames(func):
+    """
+    Marks a frame function that consumes the whole sequence of items produced
+    by an earlier fan-out step, such as a video encoder. It receives an
+    iterable of results in their original order.
+    """
+    func.accepts_frames = True
+    func.collects = True
+    return func
+
+
+def _to_legacy(data):
+    if isinstance(data, Frame):
+        return data.to_bytes()
+    if isinstance(data, list):
+        return [_to_legacy(item) for item in data]
+    return data
+
+
+def _from_legacy(result, template):
+    if isinstance(result, (bytes, bytearray)) and template is not None:
+        return template.with_data(Frame.from_bytes(bytes(result)).data, colorspace="bgr24")
+    return result
+
+
+def bytes_adapter(func):
+    """
+    Wraps a legacy bytes-in/bytes-out function. Frames are JPEG-encoded on the
+    way in and the result is decoded back into a Frame carrying the original
+    metadata, so existing plugins keep working unchanged.
+    """
+    @functools.wraps(func)
+    def wrapper(data, **params):
+        template = data if isinstance(data, Frame) else None
+        result = func(_to_legacy(data), **params)
+        if result is None:
+            return None
+        return _from_legacy(result, template)
+
+    wrapper.accepts_frames = True
+    return wrapper
@@ -0,0 +1,116 @@
+# src/core/gating.py
+
+import logging
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from .frame import Frame
+from .metrics import registry
+
+logger = logging.getLogger("Gating")
+
+gated_frames = registry.counter('gate_frames_total', 'Frames seen by a similarity gate, by outcome.')
+
+
+def signature(frame, size):
+    """Small grayscale thumbnail used to compare consecutive frames cheaply."""
+    data = frame.data
+    gray = data if data.ndim == 2 else cv2.cvtColor(data, cv2.COLOR_RGB2GRAY if frame.colorspace == "rgb24"
+                                                    else cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def difference(a, b):
+    """Mean absolute difference of two signatures, from 0 (identical) to 1."""
+    return float(np.mean(np.abs(a - b))) / 255.0
+
+
+class _StreamState:
+    def __init__(self):
+        self.signature = None
+        self.output = None
+        self.params = None
+        self.skips = 0
+
+
+class SimilarityGate:
+    """
+    Skips an expensive step for frames that barely differ from the last frame
+    the step processed on the same stream, reusing that frame's output. The
+    comparison uses `size`x`size` grayscale thumbnails; frames whose mean
+    difference is below `threshold` (0-1) are skipped, but never more than
+    `max_skips` in a row, so the output still refreshes on a static scene.
+    Frames without a stream (one-off inference requests) always run the
+    step, and a change of per-frame params, such as the LoRA adapter, forces
+    a fresh output.
+    """
+
+    def __init__(self, name, threshold=0.02, max_skips=10, size=32, max_streams=64):
+        self.name = name
+        self.threshold = threshold
+        self.max_skips = max_skips
+        self.size = size
+        self.max_streams = max_streams
+        self.streams = OrderedDict()
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.skipped = 0
+
+    @staticmethod
+    def from_config(name, gate_config):
+        if gate_config is True:
+            gate_config = {}
+        return SimilarityGate(name, **gate_config)
+
+    def _state(self, stream_id):
+        state = self.streams.get(stream_id)
+        if state is None:
+            state = self.streams[stream_id] = _StreamState()
+            while len(self.streams) > self.max_streams:
+                self.streams.popitem(last=False)
+        self.streams.move_to_end(stream_id)
+        return state
+
+    def check(self, data):
+        """
+        Returns the previous output rebased onto `data` if the step can be
+        skipped, otherwise None together with the signature to pass to update().
+        """
+        if not isinstance(data, Frame) or data.stream_id is None:
+            return None, None
+        current = signature(data, self.size)
+        with self.lock:
+            self.frames += 1
+            state = self._state(data.stream_id)
+            if (state.signature is not None and state.output is not None and state.skips < self.max_skips
+                    and state.params == data.params and difference(current, state.signature) < self.threshold):
+                state.skips += 1
+                self.skipped += 1
+                output = state.output
+            else:
+                output = None
+        gated_frames.inc(step=self.name, result='skipped' if output is not None else 'processed')
+        if output is None:
+            return None, current
+        return data.with_data(output.data, colorspace=output.colorspace), None
+
+    def update(self, data, current, result):
+        """Makes `result` the reference output for the stream of `data`."""
+        if current is None or not isinstance(result, Frame):
+            return
+        with self.lock:
+            state = self._state(data.stream_id)
+            state.signature = current
+            state.output = result
+            state.params = data.params
+            state.skips = 0
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.frames if self.frames else 0.0,
+            'threshold': self.threshold,
+            'max_skips': self.max_skips,
+        }
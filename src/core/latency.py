@@ -0,0 +1,90 @@
+# src/core/latency.py
+
+import logging
+import time
+from collections import Counter, deque
+from .metrics import registry
+
+logger = logging.getLogger("Latency")
+
+deadline_drops = registry.counter('latency_budget_drops_total', 'Frames dropped before a step to meet their budget.')
+
+
+def is_expensive(step):
+    """Model steps, or any step marked `expensive: true`, are guarded by the budget."""
+    config = step.config or {}
+    return config.get('expensive', config.get('type') == 'model')
+
+
+class LatencyBudget:
+    """
+    End-to-end latency budget for live frames.
+
+    Step latencies are tracked as moving averages. Before an expensive step,
+    a frame is discarded if the time since ingest plus the expected latency
+    of the remaining steps already exceeds its budget, so GPU time is only
+    spent on frames that can still be shown in time. A frame may carry its
+    own budget in `frame.params['latency_budget_ms']`, which is how a stream
+    overrides the pipeline default.
+    """
+
+    def __init__(self, budget_ms=None, smoothing=0.2, window=200):
+        self.budget = budget_ms / 1000.0 if budget_ms else None
+        self.smoothing = smoothing
+        self.step_latency = {}
+        self.samples = {}
+        self.window = window
+        self.drops = Counter()
+        self.admitted = 0
+
+    def observe(self, step, seconds):
+        previous = self.step_latency.get(step.name)
+        if previous is None:
+            self.step_latency[step.name] = seconds
+        else:
+            self.step_latency[step.name] = previous + self.smoothing * (seconds - previous)
+        if step.name not in self.samples:
+            self.samples[step.name] = deque(maxlen=self.window)
+        self.samples[step.name].append(seconds)
+
+    def percentile(self, q):
+        """The q-th percentile of recent latencies of the slowest step, in seconds."""
+        worst = None
+        for samples in self.samples.values():
+            ordered = sorted(samples)
+            value = ordered[min(len(ordered) - 1, int(q / 100.0 * len(ordered)))]
+            worst = value if worst is None else max(worst, value)
+        return worst
+
+    def budget_for(self, frame):
+        params = getattr(frame, 'params', None) or {}
+        if 'latency_budget_ms' in params:
+            return params['latency_budget_ms'] / 1000.0
+        return self.budget
+
+    def admit(self, frame, remaining_steps):
+        """Returns False if `frame` can no longer finish `remaining_steps` within its budget."""
+        if not remaining_steps or not is_expensive(remaining_steps[0]):
+            return True
+        ingest_time = getattr(frame, 'ingest_time', None)
+        budget = self.budget_for(frame)
+        if ingest_time is None or budget is None:
+            return True
+        expected = sum(self.step_latency.get(step.name, 0.0) for step in remaining_steps)
+        if time.time() - ingest_time + expected > budget:
+            self.drops[f"deadline:{remaining_steps[0].name}"] += 1
+            deadline_drops.inc(step=remaining_steps[0].name)
+            logger.debug(f"Dropping frame {getattr(frame, 'sequence', None)} before "
+                         f"'{remaining_steps[0].name}': over its latency budget.")
+            return False
+        self.admitted += 1
+        return True
+
+    def stats(self):
+        return {
+            'budget_ms': self.budget * 1000.0 if self.budget else None,
+            'admitted': self.admitted,
+            'drops': dict(self.drops),
+            'step_latency_ms': {name: value * 1000.0 for name, value in self.step_latency.items()},
+            'p95_ms': self.percentile(95) * 1000.0 if self.samples else None,
+        }
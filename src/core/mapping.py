@@ -0,0 +1,200 @@
+# src/core/mapping.py
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("Mapping")
+
+_END = object()
+
+# Synchronous collecting steps, and the lazy output they return, block on their
+# input for a whole video. They get their own threads, so they never hold the
+# default executor threads that decode and process the items they wait for;
+# runs beyond the pool size queue.
+collector_executor = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4),
+                                        thread_name_prefix='collector')
+
+
+class CollectorCancelled(Exception):
+    """Raised inside a collecting step whose run was cancelled or failed."""
+
+
+class ItemFailed(Exception):
+    """Raised when an item of a fan-out produced no result and the run may not drop items."""
+
+
+def is_fan_out(data):
+    """A step output is fanned out when it is a list, tuple or lazy iterator of items."""
+    return isinstance(data, (list, tuple, Iterator))
+
+
+async def iterate(iterable):
+    """
+    Iterates a plain or lazy iterable from async code. Lazy iterators such as
+    generators are advanced in the executor, so decoding the next item never
+    blocks the event loop. An iterator that is not consumed to the end is
+    closed, which releases its source.
+    """
+    if isinstance(iterable, (list, tuple)):
+        for item in iterable:
+            yield item
+        return
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    executor = collector_executor if isinstance(iterator, CollectedIterator) else None
+    # Closing waits for a next() still running in a thread after a cancellation
+    lock = threading.Lock()
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, _advance, iterator, lock)
+            if item is _END:
+                return
+            yield item
+    finally:
+        if isinstance(iterator, CollectedIterator):
+            # Unblocks a next() waiting for collector input
+            iterator.cancel()
+        if hasattr(iterator, 'close'):
+            loop.run_in_executor(executor, _close, iterator, lock)
+
+
+def _advance(iterator, lock):
+    with lock:
+        return next(iterator, _END)
+
+
+def _close(iterator, lock):
+    # Releases the source, e.g. a decoder, of an iterator that was not consumed to the end
+    with lock:
+        try:
+            iterator.close()
+        except Exception as e:
+            logger.warning(f"Error closing iterator: {e}")
+
+
+async def ordered_map(items, fn, limit, drop_failed=False):
+    """
+    Applies coroutine `fn` to every item of async iterable `items` with at most
+    `limit` calls in flight, yielding results in input order. An item whose
+    result is None raises ItemFailed, so a request never returns a silently
+    shortened result; with `drop_failed`, as on live streams, such items are
+    skipped and counted in a warning instead.
+    """
+    pending = deque()
+    count = 0
+    dropped = 0
+    try:
+        async for item in items:
+            pending.append(asyncio.ensure_future(fn(item)))
+            while len(pending) >= limit or (pending and pending[0].done()):
+                result = await pending.popleft()
+                count += 1
+                if result is not None:
+                    yield result
+                elif not drop_failed:
+                    raise ItemFailed(f"Item {count - 1} of the fan-out produced no result.")
+                else:
+                    dropped += 1
+        # The input is exhausted; drain what is still in flight
+        while pending:
+            result = await pending.popleft()
+            count += 1
+            if result is not None:
+                yield result
+            elif not drop_failed:
+                raise ItemFailed(f"Item {count - 1} of the fan-out produced no result.")
+            else:
+                dropped += 1
+    finally:
+        for future in pending:
+            future.cancel()
+        if dropped:
+            logger.warning(f"Dropped {dropped} of {count} fanned-out items that produced no result.")
+
+
+class QueueIterator:
+    """
+    Blocking iterator fed from the event loop, so that a synchronous collecting
+    function running in a worker thread can consume results as they finish.
+    At most `limit` results are buffered ahead of the consumer. `close`
+    stops the feeder and makes the consumer's next call raise
+    CollectorCancelled, so neither side outlives the other.
+    """
+
+    def __init__(self, loop, limit):
+        self.loop = loop
+        self.queue = queue.Queue()
+        self.slots = asyncio.Semaphore(limit)
+        self.cancelled = False
+        self.error = None
+        self.feeder = None
+
+    def start(self, results):
+        self.feeder = asyncio.create_task(self.feed(results))
+
+    async def feed(self, results):
+        try:
+            async for result in results:
+                await self.slots.acquire()
+                self.queue.put(result)
+        except Exception as e:
+            # Raised again in the collecting step, so a truncated input fails the run
+            logger.exception(f"Error producing items for collecting step: {e}")
+            self.error = e
+        finally:
+            self.queue.put(_END)
+            # Stops the upstream steps and closes the source generator
+            await results.aclose()
+
+    def close(self):
+        if self.feeder is not None and not self.feeder.done():
+            self.cancelled = True
+            self.feeder.cancel()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self.queue.get()
+        if item is _END:
+            # Leave the marker for any further next() calls
+            self.queue.put(_END)
+            if self.error is not None:
+                raise self.error
+            if self.cancelled:
+                raise CollectorCancelled("The collecting step's input was cancelled.")
+            raise StopIteration
+        self.loop.call_soon_threadsafe(self.slots.release)
+        return item
+
+
+class CollectedIterator:
+    """
+    Lazy output of a collecting step, e.g. encoded chunks, which still pulls
+    from its QueueIterator as it is consumed. iterate() advances it on the
+    collector threads and cancels its input when it stops early.
+    """
+
+    def __init__(self, iterator, items):
+        self.iterator = iterator
+        self.items = items
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.iterator)
+
+    def cancel(self):
+        self.items.close()
+
+    def close(self):
+        close = getattr(self.iterator, 'close', None)
+        if close is not None:
+            close()
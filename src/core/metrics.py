@@ -0,0 +1,169 @@
+# src/core/metrics.py
+
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger("Metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+LOAD_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.series = {}
+
+    def snapshot(self):
+        return {'kind': self.kind, 'help': self.help, 'series': dict(self.series)}
+
+
+class CounterMetric(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _labels(labels)
+        # A lost increment under a thread race is acceptable; a lock per call is not
+        self.series[key] = self.series.get(key, 0) + amount
+
+
+class GaugeMetric(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        self.series[_labels(labels)] = value
+
+
+class HistogramMetric(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _labels(labels)
+        series = self.series.get(key)
+        if series is None:
+            # Per-bucket counts (cumulated when rendered), then sum and count
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot['buckets'] = self.buckets
+        snapshot['series'] = {key: list(value) for key, value in self.series.items()}
+        return snapshot
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics. Recording is a dict lookup and an addition, so it
+    stays on in production; the cost of formatting is only paid on scrape.
+    Each process pushes snapshot() to the MetricsAggregator, which merges them
+    into one Prometheus text page.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, name, factory):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.setdefault(name, factory())
+        return metric
+
+    def counter(self, name, help_text=''):
+        return self._get(name, lambda: CounterMetric(name, help_text))
+
+    def gauge(self, name, help_text=''):
+        return self._get(name, lambda: GaugeMetric(name, help_text))
+
+    def histogram(self, name, help_text='', buckets=LATENCY_BUCKETS):
+        return self._get(name, lambda: HistogramMetric(name, help_text, buckets))
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+
+
+def merge_snapshots(snapshots):
+    """Adds up the series of several snapshots, e.g. one per replica."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, series={}))
+            for key, value in metric['series'].items():
+                if key not in target['series']:
+                    target['series'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['series'][key] = [a + b for a, b in zip(target['series'][key], value)]
+                else:
+                    target['series'][key] += value
+    return merged
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def render(snapshot):
+    """Formats a snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        if metric['help']:
+            lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key, value in sorted(metric['series'].items()):
+            if metric['kind'] != 'histogram':
+                lines.append(f"{name}{_format_labels(key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + ['+Inf'], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(key)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(key)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
+
+
+def start_reporting(source, interval=5.0):
+    """Pushes this process's metrics to the MetricsAggregator every `interval` seconds."""
+    if getattr(start_reporting, 'thread', None) is not None:
+        return
+
+    def report():
+        from .metrics_aggregator import get_metrics_aggregator
+        aggregator = None
+        while True:
+            time.sleep(interval)
+            try:
+                aggregator = aggregator or get_metrics_aggregator()
+                aggregator.push.remote(source, registry.snapshot())
+            except Exception as e:
+                logger.warning(f"Failed to report metrics for {source}: {e}")
+                aggregator = None
+
+    start_reporting.thread = threading.Thread(target=report, name="metrics-reporter", daemon=True)
+    start_reporting.thread.start()
+
+
+registry = MetricsRegistry()
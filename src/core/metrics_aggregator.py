@@ -0,0 +1,65 @@
+# src/core/metrics_aggregator.py
+
+import logging
+import time
+import ray
+from .metrics import MetricsRegistry, merge_snapshots, render
+from .sessions import get_session_manager
+
+logger = logging.getLogger("MetricsAggregator")
+
+METRICS_AGGREGATOR_NAME = "metrics_aggregator"
+
+
+@ray.remote
+class MetricsAggregator:
+    """
+    Collects metric snapshots pushed by engine replicas, ingest servers and
+    step workers, and renders them as one Prometheus page. Frame buffer depth
+    and drop counters are read from the session buffers at scrape time, so
+    buffers do not report on their own.
+    """
+
+    def __init__(self, stale_after=60.0):
+        self.session_manager = None
+        self.stale_after = stale_after
+        self.snapshots = {}
+
+    async def push(self, source, snapshot):
+        self.snapshots[source] = (time.time(), snapshot)
+
+    async def _buffer_snapshot(self):
+        buffers = MetricsRegistry()
+        if self.session_manager is None:
+            self.session_manager = get_session_manager()
+        depth = buffers.gauge('frame_buffer_depth', 'Frames waiting in a session buffer.')
+        added = buffers.counter('frame_buffer_frames_total', 'Frames accepted by a session buffer.')
+        drops = buffers.counter('frame_buffer_drops_total', 'Frames dropped by a session buffer, by reason.')
+        for session in await self.session_manager.list_sessions.remote():
+            for kind in ('input', 'output'):
+                try:
+                    stats = await session[f'{kind}_buffer'].stats.remote()
+                except Exception as e:
+                    logger.debug(f"Skipping {kind} buffer of session '{session['session_id']}': {e}")
+                    continue
+                labels = {'session': session['session_id'], 'buffer': kind}
+                depth.set(stats['size'], **labels)
+                added.inc(stats['added'], **labels)
+                for reason, count in stats['drops'].items():
+                    drops.inc(count, reason=reason, **labels)
+        return buffers.snapshot()
+
+    async def render(self):
+        cutoff = time.time() - self.stale_after
+        # Sources that stopped reporting, e.g. removed replicas, are forgotten
+        self.snapshots = {source: entry for source, entry in self.snapshots.items() if entry[0] >= cutoff}
+        snapshots = [snapshot for _, snapshot in self.snapshots.values()]
+        snapshots.append(await self._buffer_snapshot())
+        return render(merge_snapshots(snapshots))
+
+
+def get_metrics_aggregator():
+    """Returns the cluster-wide MetricsAggregator, creating it on first use."""
+    return MetricsAggregator.options(
+        name=METRICS_AGGREGATOR_NAME, get_if_exists=True, lifetime="detached"
+    ).remote()
@@ -0,0 +1,171 @@
+# src/core/model_cache.py
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from .metrics import LOAD_BUCKETS, registry
+
+logger = logging.getLogger("ModelCache")
+
+model_load_seconds = registry.histogram('model_load_seconds', 'Time to load a model into memory.', LOAD_BUCKETS)
+
+
+def estimate_model_bytes(model):
+    """Sums parameter and buffer sizes of every torch module in a pipeline."""
+    modules = []
+    components = getattr(model, 'components', None)
+    if isinstance(components, dict):
+        modules = [m for m in components.values() if hasattr(m, 'parameters')]
+    elif hasattr(model, 'parameters'):
+        modules = [model]
+    total = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(getattr(module, 'buffers', lambda: [])()):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelCache:
+    """
+    Process-wide registry of loaded models keyed by (name, pipeline class,
+    dtype, device). Steps asking for the same key share one instance. When
+    the resident size exceeds `max_bytes`, least recently used entries are
+    dropped; an entry that a live step still references stays in memory
+    until that step goes away, but is no longer handed out.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        # Keys being loaded, each with a future for the model
+        self.loading = {}
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    def configure(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key, loader):
+        """
+        Returns the cached model for `key`, calling `loader` on a miss. Only
+        bookkeeping happens under the cache lock: different keys load in
+        parallel, and concurrent requests for a key being loaded wait for
+        that one load instead of starting their own.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                logger.info(f"Model cache hit for {key}.")
+                return self.entries[key][0]
+            pending = self.loading.get(key)
+            loading = pending is None
+            if loading:
+                pending = self.loading[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if not loading:
+            logger.info(f"Waiting for {key} to finish loading.")
+            return pending.result()
+
+        start = time.perf_counter()
+        try:
+            model = loader()
+            size = estimate_model_bytes(model)
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            pending.set_exception(e)
+            raise
+        elapsed = time.perf_counter() - start
+        model_load_seconds.observe(elapsed, model=key[0] if isinstance(key, tuple) else key)
+        with self.lock:
+            self.load_seconds[key] = elapsed
+            self.entries[key] = (model, size)
+            del self.loading[key]
+            self._evict()
+        logger.info(f"Model cache loaded {key} ({size / 2**20:.0f} MiB) in {elapsed:.1f}s.")
+        pending.set_result(model)
+        return model
+
+    def _evict(self):
+        if not self.max_bytes:
+            return
+        # Never evict the entry that was just requested
+        while self.resident_bytes() > self.max_bytes and len(self.entries) > 1:
+            key, (model, size) = self.entries.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Model cache evicted {key} ({size / 2**20:.0f} MiB).")
+        self._release_device_memory()
+
+    @staticmethod
+    def _release_device_memory():
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def resident_bytes(self):
+        return sum(size for _, size in self.entries.values())
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self._release_device_memory()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'resident_bytes': self.resident_bytes(),
+                'max_bytes': self.max_bytes,
+                'models': [list(map(str, key)) for key in self.entries],
+            }
+
+
+def model_key(model_name, pipeline_class, dtype, device, *extra):
+    return (model_name, pipeline_class.__name__, str(dtype), str(device)) + tuple(extra)
+
+
+def load_pretrained(pipeline_class, model_name, torch_dtype, device, **kwargs):
+    """
+    Returns a shared `pipeline_class.from_pretrained(model_name)` moved to
+    `device`. When MODEL_WEIGHTS_DIR is set, weights are read from that local
+    directory without contacting the hub, and only downloaded into it when
+    they are missing, so new replicas warm up from disk.
+    """
+    def loader():
+        if not weights_dir:
+            model = pipeline_class.from_pretrained(model_name, torch_dtype=torch_dtype, **kwargs)
+        else:
+            options = dict(kwargs, torch_dtype=torch_dtype, cache_dir=kwargs.get('cache_dir', weights_dir))
+            try:
+                model = pipeline_class.from_pretrained(model_name, local_files_only=True, **options)
+            except (OSError, ValueError):
+                logger.info(f"'{model_name}' is not in {weights_dir} yet; downloading it.")
+                model = pipeline_class.from_pretrained(model_name, **options)
+        model.to(device)
+        return model
+
+    return model_cache.get(model_key(model_name, pipeline_class, torch_dtype, device), loader)
+
+
+weights_dir = os.environ.get('MODEL_WEIGHTS_DIR')
+_max_bytes = os.environ.get('MODEL_CACHE_MAX_BYTES')
+# Used when the pipeline config sets no model_cache.max_bytes
+default_max_bytes = int(_max_bytes) if _max_bytes else None
+model_cache = ModelCache(max_bytes=default_max_bytes)
@@ -1,51 +1,190 @@
 # src/core/pipeline.py
 
+import asyncio
+import contextlib
 import logging
+from collections import Counter
 import yaml
 from .steps.base_step import StepFactory
+from .steps.step_worker import RemoteStep, WorkerPool, step_key, uses_worker, worker_group
 
 logger = logging.getLogger("Pipeline")
 
 
 class Pipeline:
+    """
+    Holds the current list of steps. Reconfiguration builds the new step list
+    off to the side, reusing steps whose config did not change, and swaps it
+    in with a single assignment. Frames that acquired the previous list keep
+    running on it; its retired steps are unloaded once those frames finish.
+    """
+
     def __init__(self):
         self.steps = []
         self.pipeline_config = {}
+        self.workers = {}
+        self.worker_pool = WorkerPool()
+        self.generation = 0
+        self.active = Counter()
+        self.reconfigure_lock = None
 
-    def configure(self, config_path):
+    async def configure(self, config_path):
         try:
             with open(config_path, 'r') as f:
                 pipeline_config = yaml.safe_load(f)
-            self.configure_from_dict(pipeline_config)
+            await self.configure_from_dict(pipeline_config)
             logger.info(f"Pipeline configured from {config_path}")
         except Exception as e:
             logger.error(f"Failed to configure pipeline from {config_path}: {e}")
             raise
 
-    def configure_from_string(self, config_str):
+    async def configure_from_string(self, config_str):
         try:
             pipeline_config = yaml.safe_load(config_str)
-            self.configure_from_dict(pipeline_config)
+            await self.configure_from_dict(pipeline_config)
             logger.info("Pipeline configured from string")
         except Exception as e:
             logger.error(f"Failed to configure pipeline from string: {e}")
             raise
 
-    def configure_from_dict(self, pipeline_config):
+    async def configure_from_dict(self, pipeline_config):
+        if self.reconfigure_lock is None:
+            self.reconfigure_lock = asyncio.Lock()
+        async with self.reconfigure_lock:
+            try:
+                await self._reconfigure(pipeline_config)
+            except Exception as e:
+                logger.error(f"Error configuring pipeline from dict: {e}")
+                raise
+
+    async def _reconfigure(self, pipeline_config):
+        steps_config = pipeline_config.get('steps', [])
+        pool_config = pipeline_config.get('worker_pool')
+        if pool_config and not any(uses_worker(step_config) for step_config in steps_config):
+            # Function steps run in the replica itself, so idle workers would only hold resources
+            logger.info("Not keeping a worker pool: no step of this pipeline runs in a StepWorker.")
+            pool_config = None
+        self.worker_pool.configure(pool_config)
+        current = {step.name: step for step in self.steps}
+        workers = {}
+        pending = []
+        for step_config in steps_config:
+            existing = current.get(step_config.get('name'))
+            if existing is not None and existing.config == step_config:
+                if isinstance(existing, RemoteStep):
+                    self._assign_worker(workers, worker_group(step_config), existing.worker, pipeline_config)
+                pending.append(self._reuse_step(existing))
+            else:
+                pending.append(self.create_step(step_config, workers, pipeline_config))
+
+        # New and changed steps are built concurrently while frames keep flowing
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        steps = []
+        for step_config, step in zip(steps_config, results):
+            if isinstance(step, Exception) or step is None:
+                logger.error(f"Failed to create step from config: {step_config}")
+                await self._unload([s for s in results if not isinstance(s, Exception) and s is not None
+                                    and s not in self.steps])
+                raise ValueError(f"Invalid step configuration: {step_config}")
+            steps.append(step)
+
+        reused = len([step for step in steps if step in self.steps])
+        retired = [step for step in self.steps if step not in steps]
+        previous_generation = self.generation
+
+        # Atomic swap: frames already running hold a reference to the old list
+        self.steps = steps
+        self.pipeline_config = pipeline_config
+        self.workers = workers
+        self.generation += 1
+        logger.info(f"Pipeline generation {self.generation}: reused {reused} steps, "
+                    f"built {len(steps) - reused}, retiring {len(retired)}.")
+        if retired:
+            asyncio.create_task(self._retire(previous_generation, retired))
+
+    async def _reuse_step(self, step):
+        return step
+
+    async def create_step(self, step_config, workers, pipeline_config):
+        if not uses_worker(step_config):
+            # Constructors may load files, so keep them off the event loop
+            loop = asyncio.get_running_loop()
+            step = await loop.run_in_executor(None, StepFactory.create_step, step_config)
+        else:
+            worker = self._worker_for(step_config, workers, pipeline_config)
+            key = step_key(step_config)
+            info = await worker.load_step.remote(step_config, key)
+            if not info:
+                return None
+            step = RemoteStep(step_config.get('name'), step_config.get('params', {}), worker, step_config, key)
+            step.collects = info.get('collects', False)
+            step.deterministic = info.get('deterministic', True)
+        if step is not None:
+            step.config = step_config
+            step.collects = step_config.get('collect', step.collects)
+            step.deterministic = step_config.get('deterministic', step.deterministic)
+            step.configure_batching(step_config.get('batching'))
+            step.configure_cache(step_config.get('cache'))
+            step.configure_gate(step_config.get('gate'))
+        return step
+
+    def _worker_for(self, step_config, workers, pipeline_config):
+        group = worker_group(step_config)
+        worker = workers.get(group)
+        if worker is None:
+            # Workers from the previous config are reused so their model caches stay warm
+            worker = self.workers.get(group)
+            if worker is None:
+                worker = self.worker_pool.acquire(step_config)
+            self._assign_worker(workers, group, worker, pipeline_config)
+        return worker
+
+    def _assign_worker(self, workers, group, worker, pipeline_config):
+        if group in workers:
+            return
+        # Reused workers get the limit of the new config too; None restores the default
+        worker.configure_model_cache.remote((pipeline_config.get('model_cache') or {}).get('max_bytes'))
+        workers[group] = worker
+
+    async def _retire(self, generation, steps):
+        # Reused steps are shared with older generations, so frames pinned on any of them may still run these
+        while any(count > 0 for g, count in self.active.items() if g <= generation):
+            await asyncio.sleep(0.05)
+        for g in [g for g, count in self.active.items() if g <= generation and count <= 0]:
+            del self.active[g]
+        await self._unload(steps)
+
+    async def _unload(self, steps):
+        for step in steps:
+            if isinstance(step, RemoteStep):
+                try:
+                    await step.worker.unload_step.remote(step.key)
+                except Exception as e:
+                    logger.warning(f"Failed to unload step '{step.name}': {e}")
+
+    def hold(self):
+        """Pins the current generation so its steps are not unloaded; see release()."""
+        self.active[self.generation] += 1
+        return self.generation
+
+    def release(self, generation):
+        self.active[generation] -= 1
+
+    @contextlib.contextmanager
+    def acquire(self):
+        """Yields a consistent step list for one frame."""
+        steps = self.steps
+        generation = self.hold()
         try:
-            self.pipeline_config = pipeline_config
-            steps_config = pipeline_config.get('steps', [])
-            self.steps = []
-            for step_config in steps_config:
-                step = StepFactory.create_step(step_config)
-                if step:
-                    self.steps.append(step)
-                else:
-                    logger.error(f"Failed to create step from config: {step_config}")
-                    raise ValueError(f"Invalid step configuration: {step_config}")
-        except Exception as e:
-            logger.error(f"Error configuring pipeline from dict: {e}")
-            raise
+            yield steps
+        finally:
+            self.release(generation)
 
     def get_pipeline_config(self):
         return self.pipeline_config
+
+    def get_execution_config(self):
+        return self.pipeline_config.get('execution') or {}
+
+    def get_worker_stats(self):
+        return {group: worker.stats.remote() for group, worker in self.workers.items()}
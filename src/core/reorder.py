@@ -0,0 +1,102 @@
+# src/core/reorder.py
+
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from .transport import Tombstone
+
+logger = logging.getLogger("Reorder")
+
+
+class ReorderBuffer:
+    """
+    Restores ingest order on the playback side. Frames (or FrameHandles) are
+    released in `sequence` order. If the next expected frame is missing, the
+    buffer waits at most `gap_timeout` seconds, or until `max_size` frames are
+    waiting, before skipping the gap. Frames older than what was already
+    released are discarded. Items without a sequence number pass straight
+    through. A Tombstone marks a sequence number that was dropped upstream;
+    it is never returned, but lets later frames go without waiting.
+    """
+
+    def __init__(self, max_size=8, gap_timeout=0.1):
+        self.max_size = max_size
+        self.gap_timeout = gap_timeout
+        self.pending = []
+        self.unsequenced = deque()
+        self.next_sequence = None
+        self.order = itertools.count()
+        self.released = 0
+        self.skipped = 0
+        self.late = 0
+        self.dropped = 0
+
+    def push(self, item, now=None):
+        """Adds an item; returns False if it arrived too late to be shown."""
+        sequence = getattr(item, 'sequence', None)
+        if sequence is None:
+            self.unsequenced.append(item)
+            return True
+        if isinstance(item, Tombstone) and self.next_sequence is not None and sequence < self.next_sequence:
+            # The gap was already skipped
+            return True
+        if self.next_sequence is not None and sequence < self.next_sequence:
+            if self.next_sequence - sequence > 4 * self.max_size:
+                # Far behind rather than late: the source restarted its numbering
+                logger.info(f"Sequence restarted at {sequence}; resynchronising.")
+                self.pending = []
+                self.next_sequence = None
+            else:
+                self.late += 1
+                return False
+        now = time.monotonic() if now is None else now
+        heapq.heappush(self.pending, (sequence, now, next(self.order), item))
+        return True
+
+    def pop(self, now=None):
+        """Returns the next item that may be shown, or None if it is still worth waiting."""
+        if self.unsequenced:
+            return self.unsequenced.popleft()
+        now = time.monotonic() if now is None else now
+        while self.pending:
+            sequence, arrived, _, item = self.pending[0]
+            if self.next_sequence is not None and sequence < self.next_sequence:
+                # A tombstone for a frame that arrived after all
+                heapq.heappop(self.pending)
+                continue
+            in_order = self.next_sequence is None or sequence == self.next_sequence
+            if not in_order and len(self.pending) <= self.max_size and now - arrived < self.gap_timeout:
+                return None
+            heapq.heappop(self.pending)
+            if not in_order:
+                self.skipped += sequence - self.next_sequence
+            self.next_sequence = sequence + 1
+            if isinstance(item, Tombstone):
+                self.dropped += 1
+                continue
+            self.released += 1
+            return item
+        return None
+
+    def wait_time(self, now=None):
+        """Seconds until a pending gap is skipped, or None when nothing is waiting."""
+        if self.unsequenced:
+            return 0.0
+        if not self.pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.gap_timeout - (now - self.pending[0][1]))
+
+    def __len__(self):
+        return len(self.pending) + len(self.unsequenced)
+
+    def stats(self):
+        return {
+            'waiting': len(self),
+            'released': self.released,
+            'skipped': self.skipped,
+            'late': self.late,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,133 @@
+# src/core/result_cache.py
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from .frame import Frame
+from .metrics import registry
+
+logger = logging.getLogger("ResultCache")
+
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+cache_requests = registry.counter('result_cache_requests_total', 'Result cache lookups by step and outcome.')
+
+
+def input_digest(data):
+    """
+    Fast content hash of a step input: pixel bytes plus everything that
+    changes how a step treats them (shape, dtype, colorspace and per-frame
+    params). Returns None for inputs that cannot be cached, such as the
+    iterators handed to collecting steps.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(data, Frame):
+        array = np.ascontiguousarray(data.data)
+        digest.update(f"{array.shape}|{array.dtype}|{data.colorspace}|".encode())
+        digest.update(json.dumps(data.params, sort_keys=True, default=str).encode())
+        digest.update(memoryview(array).cast('B'))
+    elif isinstance(data, np.ndarray):
+        array = np.ascontiguousarray(data)
+        digest.update(f"{array.shape}|{array.dtype}|".encode())
+        digest.update(memoryview(array).cast('B'))
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        digest.update(b"bytes|")
+        digest.update(data)
+    else:
+        return None
+    return digest.hexdigest()
+
+
+def config_digest(step_config):
+    return hashlib.blake2b(json.dumps(step_config, sort_keys=True, default=str).encode(),
+                           digest_size=8).hexdigest()
+
+
+def result_bytes(result):
+    if isinstance(result, Frame):
+        return result.data.nbytes
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    return None
+
+
+class ResultCache:
+    """
+    LRU cache of step results keyed by the content of the input and the step
+    config, bounded by the bytes of the cached results. A hit returns the
+    cached pixels under the metadata (pts, sequence, ingest time) of the frame
+    being processed now, so repeated content, such as a static slide, skips
+    the step entirely without confusing ordering downstream.
+    """
+
+    def __init__(self, step_config, max_bytes=DEFAULT_MAX_BYTES):
+        self.name = step_config.get('name')
+        self.config_key = config_digest(step_config)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.resident = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def from_config(step_config, cache_config):
+        if cache_config is True:
+            cache_config = {}
+        return ResultCache(step_config, max_bytes=cache_config.get('max_bytes', DEFAULT_MAX_BYTES))
+
+    def key(self, data):
+        digest = input_digest(data)
+        return None if digest is None else f"{self.config_key}:{digest}"
+
+    def get(self, key, data):
+        """Returns the cached result for `key` rebased onto `data`, or None."""
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                cache_requests.inc(step=self.name, result='miss')
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        cache_requests.inc(step=self.name, result='hit')
+        if isinstance(result, Frame) and isinstance(data, Frame):
+            return data.with_data(result.data, colorspace=result.colorspace)
+        return result
+
+    def put(self, key, result):
+        size = result_bytes(result)
+        if size is None or size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = result
+            self.resident += size
+            while self.resident > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.resident -= result_bytes(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.resident = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.resident,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,279 @@
+# src/core/sessions.py
+
+import asyncio
+import logging
+import time
+import uuid
+import ray
+from .utils import FrameBuffer
+
+logger = logging.getLogger("Sessions")
+
+SESSION_MANAGER_NAME = "session_manager"
+
+# Dropped frames leave tombstones, so playback skips their sequence numbers without waiting
+INPUT_BUFFER_OPTIONS = {'max_length': 30, 'drop_policy': 'drop_by_age', 'max_age_ms': 1000, 'tombstones': True}
+# Every viewer of a session reads all of its output
+OUTPUT_BUFFER_OPTIONS = {'max_length': 30, 'drop_policy': 'drop_oldest', 'tombstones': True, 'broadcast': True}
+
+
+class Session:
+    """One published stream: its own buffers, stream params and owning Engine replica."""
+
+    def __init__(self, session_id, input_buffer, output_buffer, params=None):
+        self.session_id = session_id
+        self.input_buffer = input_buffer
+        self.output_buffer = output_buffer
+        self.params = params or {}
+        self.replica = None
+        self.created = time.time()
+        self.last_active = self.created
+        self.frames_seen = 0
+
+    def info(self):
+        return {
+            'session_id': self.session_id,
+            'input_buffer': self.input_buffer,
+            'output_buffer': self.output_buffer,
+            'params': self.params,
+            'replica': self.replica,
+        }
+
+
+class SessionRegistry:
+    """
+    Bookkeeping behind SessionManager. Sessions stick to the replica they were
+    assigned to; a new session goes to the live replica with the fewest
+    sessions, and sessions of a replica that stopped sending heartbeats are
+    handed to the remaining ones. Replicas report the input queue depth of
+    their sessions, their p95 step latency and the pipeline version they have
+    loaded with every heartbeat. Sessions are only newly assigned to, or
+    helped by, replicas running the current `pipeline_version`.
+    """
+
+    def __init__(self, replica_timeout=10.0):
+        self.sessions = {}
+        self.replicas = {}
+        self.replica_timeout = replica_timeout
+        self.queue_depth = {}
+        self.p95_ms = {}
+        self.pipeline_version = 0
+        self.replica_versions = {}
+
+    def add(self, session):
+        self.sessions[session.session_id] = session
+        self.assign(session)
+
+    def remove(self, session_id):
+        self.queue_depth.pop(session_id, None)
+        return self.sessions.pop(session_id, None)
+
+    def live_replicas(self, now=None):
+        now = time.time() if now is None else now
+        return [replica for replica, seen in self.replicas.items() if now - seen <= self.replica_timeout]
+
+    def is_current(self, replica):
+        return self.replica_versions.get(replica, 0) == self.pipeline_version
+
+    def session_counts(self):
+        counts = {replica: 0 for replica in self.live_replicas()}
+        for session in self.sessions.values():
+            if session.replica in counts:
+                counts[session.replica] += 1
+        return counts
+
+    def assign(self, session):
+        counts = self.session_counts()
+        if session.replica in counts:
+            # A live owner keeps its sessions while it catches up with a new pipeline version
+            return session.replica
+        counts = {replica: count for replica, count in counts.items() if self.is_current(replica)}
+        session.replica = min(counts, key=counts.get) if counts else None
+        if session.replica is not None:
+            logger.info(f"Session '{session.session_id}' assigned to replica {session.replica}.")
+        return session.replica
+
+    def heartbeat(self, replica, load=None):
+        """Records a heartbeat and returns the sessions this replica should process."""
+        self.replicas[replica] = time.time()
+        if load:
+            self.queue_depth.update(load.get('queue_depth', {}))
+            self.p95_ms[replica] = load.get('p95_ms')
+            self.replica_versions[replica] = load.get('pipeline_version', 0)
+        live = set(self.live_replicas())
+        for stale in [r for r in self.replicas if r not in live]:
+            logger.warning(f"Replica {stale} stopped sending heartbeats.")
+            del self.replicas[stale]
+            self.p95_ms.pop(stale, None)
+            self.replica_versions.pop(stale, None)
+        # Sessions of live replicas keep their assignment; the rest are moved
+        for session in self.sessions.values():
+            self.assign(session)
+        return [session for session in self.sessions.values() if session.replica == replica]
+
+    def backlogged(self, replica, steal_depth):
+        """
+        Sessions of other replicas with at least `steal_depth` frames waiting,
+        which `replica` may help drain while its own sessions have no backlog.
+        """
+        def depth(session):
+            return self.queue_depth.get(session.session_id, 0)
+
+        sessions = self.sessions.values()
+        if not self.is_current(replica) or any(depth(s) >= steal_depth for s in sessions if s.replica == replica):
+            return []
+        return [s for s in sessions if s.replica not in (replica, None) and depth(s) >= steal_depth]
+
+    def load(self):
+        p95 = [value for value in self.p95_ms.values() if value is not None]
+        return {
+            'replicas': self.live_replicas(),
+            'queue_depth': sum(self.queue_depth.get(session_id, 0) for session_id in self.sessions),
+            'p95_ms': max(p95) if p95 else None,
+        }
+
+
+@ray.remote
+class SessionManager:
+    """
+    Creates isolated input/output buffers for every published stream and
+    assigns each stream to one Engine replica. Ingest servers open sessions,
+    Engine replicas poll heartbeat() for the sessions they own, and playback
+    servers look a session up by id. Sessions whose input buffer has not
+    received a frame for `idle_timeout` seconds are closed.
+
+    Input buffers are the shards of the overall input queue. A replica
+    without a backlog is also handed sessions of other replicas that have
+    `steal_depth` or more frames waiting, and pulls frames from them too.
+
+    The manager also holds the pipeline config all replicas run. set_pipeline
+    bumps its version; replicas see the version in every heartbeat and load
+    the config from get_pipeline when theirs is behind.
+    """
+
+    def __init__(self, idle_timeout=30.0, replica_timeout=10.0, steal_depth=8, input_buffer_options=None,
+                 output_buffer_options=None):
+        self.registry = SessionRegistry(replica_timeout)
+        self.idle_timeout = idle_timeout
+        self.steal_depth = steal_depth
+        self.input_buffer_options = input_buffer_options or INPUT_BUFFER_OPTIONS
+        self.output_buffer_options = output_buffer_options or OUTPUT_BUFFER_OPTIONS
+        self.pipeline_available_flag = False
+        self.pipeline_config = None
+        self.reaper_task = None
+
+    def _start_reaper(self):
+        # Started lazily so it runs on the actor's event loop
+        if self.reaper_task is None:
+            self.reaper_task = asyncio.create_task(self._reap_idle_sessions())
+
+    async def open_session(self, session_id=None, params=None):
+        """Returns the session for `session_id`, creating it (and its buffers) if needed."""
+        self._start_reaper()
+        session_id = session_id or uuid.uuid4().hex
+        session = self.registry.sessions.get(session_id)
+        if session is None:
+            input_buffer = FrameBuffer.remote(**self.input_buffer_options)
+            output_buffer = FrameBuffer.remote(**self.output_buffer_options)
+            session = Session(session_id, input_buffer, output_buffer, params)
+            # Registered before the first await, so a concurrent open of the same id reuses these buffers
+            self.registry.add(session)
+            logger.info(f"Opened session '{session_id}'.")
+            await input_buffer.set_pipeline_available.remote(self.pipeline_available_flag)
+        else:
+            session.last_active = time.time()
+        return session.info()
+
+    async def get_session(self, session_id=None):
+        """Returns the session with `session_id`, or the newest session if no id is given."""
+        if session_id is None:
+            session = max(self.registry.sessions.values(), key=lambda s: s.created, default=None)
+        else:
+            session = self.registry.sessions.get(session_id)
+        return session.info() if session is not None else None
+
+    async def close_session(self, session_id):
+        session = self.registry.remove(session_id)
+        if session is None:
+            return False
+        for buffer in (session.input_buffer, session.output_buffer):
+            ray.kill(buffer)
+        logger.info(f"Closed session '{session_id}'.")
+        return True
+
+    async def heartbeat(self, replica, load=None):
+        """
+        Returns the sessions `replica` owns, and under 'backlogged' the sessions
+        it should help drain. `load` carries {'queue_depth': {session_id: n},
+        'p95_ms': ms} for the sessions the replica owns.
+        """
+        self._start_reaper()
+        owned = self.registry.heartbeat(replica, load)
+        return {
+            'owned': [session.info() for session in owned],
+            'backlogged': [session.info() for session in self.registry.backlogged(replica, self.steal_depth)],
+            'pipeline_version': self.registry.pipeline_version,
+        }
+
+    async def load(self):
+        return self.registry.load()
+
+    async def set_pipeline(self, pipeline_config, replace=True):
+        """
+        Makes `pipeline_config` (YAML text) the pipeline of every Engine replica
+        and returns its version. With replace=False an existing config is kept.
+        """
+        if replace or self.pipeline_config is None:
+            self.pipeline_config = pipeline_config
+            self.registry.pipeline_version += 1
+            logger.info(f"Pipeline version {self.registry.pipeline_version} set.")
+        return self.registry.pipeline_version
+
+    async def get_pipeline(self):
+        """Returns (version, config) of the current pipeline; the config is None until one is set."""
+        return self.registry.pipeline_version, self.pipeline_config
+
+    async def set_pipeline_available(self, available):
+        self.pipeline_available_flag = available
+        for session in self.registry.sessions.values():
+            await session.input_buffer.set_pipeline_available.remote(available)
+
+    async def list_sessions(self):
+        return [session.info() for session in self.registry.sessions.values()]
+
+    async def stats(self):
+        return {
+            'sessions': len(self.registry.sessions),
+            'replicas': self.registry.session_counts(),
+            'unassigned': len([s for s in self.registry.sessions.values() if s.replica is None]),
+            'pipeline_version': self.registry.pipeline_version,
+            'replica_versions': dict(self.registry.replica_versions),
+        }
+
+    async def _reap_idle_sessions(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 1.0))
+            now = time.time()
+            for session in list(self.registry.sessions.values()):
+                try:
+                    stats = await session.input_buffer.stats.remote()
+                    # Frames published straight to the output buffer also count as activity
+                    output_stats = await session.output_buffer.stats.remote()
+                except Exception as e:
+                    logger.warning(f"Buffers of session '{session.session_id}' are unavailable: {e}")
+                    await self.close_session(session.session_id)
+                    continue
+                seen = stats['added'] + output_stats['added']
+                if seen != session.frames_seen:
+                    session.frames_seen = seen
+                    session.last_active = now
+                elif now - session.last_active > self.idle_timeout:
+                    logger.info(f"Session '{session.session_id}' is idle.")
+                    await self.close_session(session.session_id)
+
+
+def get_session_manager(**options):
+    """Returns the cluster-wide SessionManager, creating it on first use."""
+    return SessionManager.options(
+        name=SESSION_MANAGER_NAME, get_if_exists=True, lifetime="detached"
+    ).remote(**options)
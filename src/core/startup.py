@@ -0,0 +1,86 @@
+# src/core/startup.py
+#
+# Import-time accounting. Heavy dependencies (torch, diffusers, av) are
+# loaded on first use through load_module(), which records how long each
+# took; report() lists those times for Engine and StepWorker stats. For a
+# full per-module breakdown of a cold start, run from the repository root:
+#
+#   python -m src.core.startup src.core.engine src.core.steps.function_step
+#
+# which imports the modules in a fresh interpreter under `-X importtime`
+# and prints the slowest modules, cumulative time first.
+
+import importlib
+import logging
+import subprocess
+import sys
+import threading
+import time
+from .metrics import registry
+
+logger = logging.getLogger("Startup")
+
+import_seconds = registry.histogram('module_import_seconds', 'Time to import heavy modules on first use.')
+
+process_start = time.time()
+import_times = {}
+_lock = threading.Lock()
+
+
+def load_module(name):
+    """Imports `name` on first use, recording the import time once per process."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        elapsed = time.perf_counter() - start
+        if name not in import_times:
+            import_times[name] = elapsed
+            import_seconds.observe(elapsed, module=name)
+            logger.info(f"Imported '{name}' in {elapsed:.2f}s")
+    return module
+
+
+def report():
+    return {
+        'uptime_s': time.time() - process_start,
+        'imports': dict(sorted(import_times.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def parse_importtime(text):
+    """Parses `-X importtime` output into {module: (self_us, cumulative_us)}."""
+    times = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Report per-module import times of a cold start.")
+    parser.add_argument('modules', nargs='+', help='Modules to import')
+    parser.add_argument('--top', type=int, default=25, help='Number of modules to list')
+    args = parser.parse_args()
+
+    code = '; '.join(f'import {module}' for module in args.modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        sys.exit(result.returncode)
+    times = parse_importtime(result.stderr)
+    total = sum(self_us for self_us, _ in times.values())
+    print(f"{len(times)} modules, {total / 1e6:.2f}s total")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for module, (self_us, cumulative_us) in sorted(times.items(), key=lambda item: item[1][1],
+                                                   reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,15 +11,91 @@ class BaseStep(ABC):
         self.name = name
         self.params = params
         self.is_async = is_async
+        self.config = None
+        self.batcher = None
+        # Collecting steps receive every item of an earlier fan-out at once
+        self.collects = False
+        # Steps whose output varies for the same input must not be cached
+        self.deterministic = True
+        self.result_cache = None
+        self.gate = None
 
     @abstractmethod
     def process(self, data):
         pass
 
+    def process_batch(self, items):
+        # Steps that can run several inputs in one call override this
+        return [self.process(item) for item in items]
+
+    def configure_batching(self, batching_config):
+        if not batching_config:
+            self.batcher = None
+            return
+        from ..batching import MicroBatcher
+        self.batcher = MicroBatcher.from_config(self.process_batch, batching_config, name=self.name)
+        logger.info(f"Step '{self.name}' batches up to {self.batcher.max_batch_size} items "
+                    f"or {self.batcher.max_wait * 1000:.0f} ms")
+
+    def configure_cache(self, cache_config):
+        if not cache_config:
+            self.result_cache = None
+            return
+        if not self.deterministic:
+            logger.warning(f"Step '{self.name}' is nondeterministic; ignoring its result cache.")
+            self.result_cache = None
+            return
+        from ..result_cache import ResultCache
+        self.result_cache = ResultCache.from_config(self.config, cache_config)
+        logger.info(f"Step '{self.name}' caches up to {self.result_cache.max_bytes / 2**20:.0f} MiB of results")
+
+    def configure_gate(self, gate_config):
+        if not gate_config:
+            self.gate = None
+            return
+        from ..gating import SimilarityGate
+        self.gate = SimilarityGate.from_config(self.name, gate_config)
+        logger.info(f"Step '{self.name}' skips frames within {self.gate.threshold} of the last processed frame, "
+                    f"at most {self.gate.max_skips} in a row")
+
+    def warm_up(self, warmup_config, max_batch_size=1):
+        if not warmup_config:
+            return None
+        from ..warmup import run_warmup
+        return run_warmup(self, warmup_config, max_batch_size)
+
 
 class StepFactory:
+    custom_models = {}
+    # Imported before model steps are built, so their register_custom_model calls run in every worker
+    plugin_modules = ('src.plugins.custom_models',)
+
+    @staticmethod
+    def register_custom_model(model_name, step_class):
+        StepFactory.custom_models[model_name] = step_class
+
+    @staticmethod
+    def load_plugins():
+        from ..startup import load_module
+        for name in StepFactory.plugin_modules:
+            try:
+                load_module(name)
+            except ImportError as e:
+                logger.warning(f"Could not load plugin module '{name}': {e}")
+
     @staticmethod
     def create_step(step_config):
+        step = StepFactory._build_step(step_config)
+        if step is not None and step_config.get('warmup'):
+            # The step only reports ready once warm, so its first real frames are fast
+            try:
+                step.warm_up(step_config['warmup'], (step_config.get('batching') or {}).get('max_batch_size', 1))
+            except Exception as e:
+                logger.exception(f"Warmup of step '{step.name}' failed: {e}")
+        return step
+
+    @staticmethod
+    def _build_step(step_config):
         try:
             step_type = step_config.get('type')
             if step_type == 'function':
@@ -29,15 +105,10 @@ class StepFactory:
                 return step
             elif step_type == 'model':
                 model_name = step_config.get('model_name')
-                if model_name == 'custom_livediff_model':
-                    from src.plugins.custom_models import CustomLiveDiffModelStep
-                    step = CustomLiveDiffModelStep.from_config(step_config)
-                    logger.info(f"Created CustomLiveDiffModelStep: {step.name}")
-                    return step
-                elif model_name == 'custom_lora_model':
-                    from src.plugins.custom_models import CustomLoRAModelStep
-                    step = CustomLoRAModelStep.from_config(step_config)
-                    logger.info(f"Created CustomLoRAModelStep: {step.name}")
+                StepFactory.load_plugins()
+                if model_name in StepFactory.custom_models:
+                    step = StepFactory.custom_models[model_name].from_config(step_config)
+                    logger.info(f"Created {type(step).__name__}: {step.name}")
                     return step
                 else:
                     from .model_step import ModelStep
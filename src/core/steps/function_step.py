@@ -3,6 +3,7 @@
 import logging
 from .base_step import BaseStep
 from ..utils import default_functions, custom_functions
+from ..frame import bytes_adapter
 
 logger = logging.getLogger("FunctionStep")
 
@@ -12,6 +13,7 @@ class FunctionStep(BaseStep):
         super().__init__(name, params)
         self.function_name = function_name
         self.function = self.load_function(function_name)
+        self.collects = getattr(self.function, 'collects', False)
 
     @staticmethod
     def from_config(config):
@@ -23,13 +25,18 @@ class FunctionStep(BaseStep):
     def load_function(self, function_name):
         if function_name in custom_functions:
             logger.info(f"Using custom function '{function_name}'")
-            return custom_functions[function_name]
+            function = custom_functions[function_name]
         elif function_name in default_functions:
             logger.info(f"Using default function '{function_name}'")
-            return default_functions.get(function_name)
+            function = default_functions.get(function_name)
         else:
             logger.error(f"Function '{function_name}' not found in default or custom functions.")
             return None
+        if not getattr(function, 'accepts_frames', False):
+            # Legacy functions take and return encoded image bytes
+            logger.info(f"Wrapping bytes-based function '{function_name}' with frame adapter")
+            function = bytes_adapter(function)
+        return function
 
     def process(self, data):
         if self.function is None:
@@ -2,35 +2,65 @@
 
 import logging
 from .base_step import BaseStep
-import torch
-from diffusers import StableDiffusionImg2ImgPipeline
 import numpy as np
-import cv2
-from PIL import Image
+from ..frame import as_frame
+from ..batching import group_by_shape
+from ..model_cache import load_pretrained
+from ..startup import load_module
+from ..warmup import optimize_model
 
 logger = logging.getLogger("ModelStep")
 
 
+def run_image_batch(model, items, prompt):
+    """
+    Runs a diffusers image pipeline once per group of equally sized frames and
+    returns one output Frame per input, in input order.
+    """
+    import torch
+    from PIL import Image
+    frames = [as_frame(item) for item in items]
+    results = [None] * len(frames)
+    for indices in group_by_shape(frames):
+        images = [Image.fromarray(frames[i].to_rgb()) for i in indices]
+        with torch.no_grad():
+            outputs = model(prompt=[prompt] * len(images), image=images).images
+        for i, output in zip(indices, outputs):
+            results[i] = frames[i].with_data(np.array(output), colorspace="rgb24")
+    return results
+
+
 class ModelStep(BaseStep):
-    def __init__(self, name, model_name, params):
+    def __init__(self, name, model_name, params, optimize_config=None):
         super().__init__(name, params)
+        # Diffusion starts from fresh noise, so the same frame gives a different image
+        self.deterministic = False
         self.model_name = model_name
         self.model = self.load_model(model_name)
+        if self.model is not None and optimize_config:
+            try:
+                optimize_model(self.model, optimize_config)
+            except Exception as e:
+                logger.exception(f"Failed to optimize model '{model_name}'; running it unoptimized: {e}")
 
     @staticmethod
     def from_config(config):
         name = config.get('name')
         model_name = config.get('model_name')
         params = config.get('params', {})
-        return ModelStep(name, model_name, params)
+        return ModelStep(name, model_name, params, config.get('optimize'))
 
     def load_model(self, model_name):
         try:
             logger.info(f"Loading model '{model_name}'...")
-            model = StableDiffusionImg2ImgPipeline.from_pretrained(
-                model_name, torch_dtype=torch.float16
+            # torch and diffusers load here, so function-only processes never import them
+            torch = load_module('torch')
+            diffusers = load_module('diffusers')
+            # Shared with any other step in this process using the same checkpoint
+            model = load_pretrained(
+                diffusers.StableDiffusionImg2ImgPipeline, model_name, torch.float16,
+                "cuda" if torch.cuda.is_available() else "cpu"
             )
-            model.to("cuda" if torch.cuda.is_available() else "cpu")
             logger.info(f"Model '{model_name}' loaded successfully.")
             return model
         except Exception as e:
@@ -42,20 +72,29 @@ class ModelStep(BaseStep):
             logger.error(f"Model '{self.model_name}' is not loaded.")
             return None
         try:
+            import torch
+            from PIL import Image
             # Convert data to PIL image
-            img_array = np.frombuffer(data, dtype=np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            init_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            frame = as_frame(data)
+            init_image = Image.fromarray(frame.to_rgb())
             # Perform inference
             with torch.no_grad():
                 output = self.model(
                     prompt=self.params.get('prompt', ''),
                     image=init_image
                 ).images[0]
-            # Convert back to bytes
-            output_img = cv2.cvtColor(np.array(output), cv2.COLOR_RGB2BGR)
-            _, buffer = cv2.imencode('.jpg', output_img)
-            return buffer.tobytes()
+            # Keep the result decoded; encoding happens at the playback edge
+            return frame.with_data(np.array(output), colorspace="rgb24")
         except Exception as e:
             logger.exception(f"Error during model inference in step '{self.name}': {e}")
             return None
+
+    def process_batch(self, items):
+        if self.model is None:
+            logger.error(f"Model '{self.model_name}' is not loaded.")
+            return [None] * len(items)
+        try:
+            return run_image_batch(self.model, items, self.params.get('prompt', ''))
+        except Exception as e:
+            logger.exception(f"Error during batched model inference in step '{self.name}': {e}")
+            return [None] * len(items)
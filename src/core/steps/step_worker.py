@@ -0,0 +1,188 @@
+# src/core/steps/step_worker.py
+
+import hashlib
+import json
+import logging
+from collections import deque
+import ray
+from .base_step import BaseStep, StepFactory
+from ..metrics import start_reporting
+from ..startup import load_module, report
+from ..warmup import configure_compile_cache
+
+logger = logging.getLogger("StepWorker")
+
+# Actor options a step may set under `resources` in the pipeline YAML
+WORKER_OPTIONS = ('num_cpus', 'num_gpus', 'memory', 'resources', 'max_concurrency')
+
+# Imported by pooled workers before they are handed out
+DEFAULT_PRELOAD = ('src.core.steps.function_step',)
+
+
+@ray.remote
+class StepWorker:
+    """
+    Long-lived actor hosting one or more steps. Models are loaded once when a
+    step is added; after that only frame data crosses the actor boundary.
+    """
+
+    def __init__(self):
+        self.steps = {}
+        # Model load times are recorded in this process
+        start_reporting(f"worker:{ray.get_runtime_context().get_actor_id()}")
+        # Before any step compiles: Inductor reads its cache settings once per process
+        configure_compile_cache()
+
+    def load_step(self, step_config, key):
+        # Steps are stored by config key so a changed step can load next to
+        # the version still serving in-flight frames
+        step = StepFactory.create_step(step_config)
+        if step is None:
+            return None
+        self.steps[key] = step
+        logger.info(f"StepWorker loaded step '{step.name}' as '{key}'.")
+        return {'collects': step.collects, 'deterministic': step.deterministic}
+
+    def unload_step(self, key):
+        if self.steps.pop(key, None) is not None:
+            logger.info(f"StepWorker unloaded step '{key}'.")
+
+    def preload(self, modules):
+        for name in modules:
+            try:
+                load_module(name)
+            except ImportError as e:
+                logger.warning(f"StepWorker could not preload '{name}': {e}")
+        return report()
+
+    def step_names(self):
+        return list(self.steps)
+
+    def configure_model_cache(self, max_bytes):
+        from ..model_cache import default_max_bytes, model_cache
+        model_cache.configure(max_bytes or default_max_bytes)
+
+    def stats(self):
+        from ..model_cache import model_cache
+        return {'steps': list(self.steps), 'model_cache': model_cache.stats(), 'startup': report()}
+
+    def process(self, key, data):
+        return self.steps[key].process(data)
+
+    def process_batch(self, key, items):
+        return self.steps[key].process_batch(items)
+
+
+class RemoteStep(BaseStep):
+    """Engine-side proxy for a step hosted in a StepWorker actor."""
+
+    def __init__(self, name, params, worker, config, key):
+        super().__init__(name, params, is_async=True)
+        self.worker = worker
+        self.config = config
+        self.key = key
+
+    async def process(self, data):
+        return await self.worker.process.remote(self.key, data)
+
+    async def process_batch(self, items):
+        return await self.worker.process_batch.remote(self.key, items)
+
+
+def step_key(step_config):
+    digest = hashlib.sha1(json.dumps(step_config, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{step_config.get('name')}@{digest[:10]}"
+
+
+def uses_worker(step_config):
+    # Model steps are hosted in actors by default; function steps run in-process
+    default = 'actor' if step_config.get('type') == 'model' else 'local'
+    return step_config.get('placement', default) == 'actor'
+
+
+def worker_group(step_config):
+    """
+    Model steps naming the same model share a worker, and therefore one copy
+    of the weights in that worker's model cache, unless `worker_group` says
+    otherwise. Other steps get a worker of their own.
+    """
+    if 'worker_group' in step_config:
+        return step_config['worker_group']
+    if step_config.get('type') == 'model':
+        return f"model:{step_config.get('model_name')}"
+    return step_config.get('name')
+
+
+def worker_options(step_config):
+    resources = dict(step_config.get('resources') or {})
+    options = {key: resources[key] for key in WORKER_OPTIONS if key in resources}
+    unknown = set(resources) - set(WORKER_OPTIONS)
+    if unknown:
+        logger.warning(f"Ignoring unknown resource options for step '{step_config.get('name')}': {sorted(unknown)}")
+    if step_config.get('type') == 'model' and 'num_gpus' not in options:
+        # Actors without a GPU reservation cannot see the device at all
+        if ray.cluster_resources().get('GPU', 0) > 0:
+            options['num_gpus'] = 1
+    return options
+
+
+def create_worker(step_config, options=None):
+    options = worker_options(step_config) if options is None else options
+    logger.info(f"Starting StepWorker for step '{step_config.get('name')}' with options {options}")
+    return StepWorker.options(**options).remote()
+
+
+class WorkerPool:
+    """
+    Idle StepWorkers started ahead of need, with `preload` modules already
+    imported, so placing a step in an actor skips process start and imports.
+    Only workers without resource options are pooled: a GPU or custom
+    resource reservation would be held by an idle worker. Configured by the
+    `worker_pool` section of the pipeline YAML; `size` 0 disables the pool.
+    Steps placed locally, which function steps are by default, never use
+    it, so a function-only pipeline keeps no pool.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.preload = DEFAULT_PRELOAD
+        self.idle = deque()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, pool_config):
+        pool_config = pool_config or {}
+        preload = tuple(pool_config.get('preload', DEFAULT_PRELOAD))
+        if preload != self.preload:
+            # Idle workers imported the old list; replace them
+            self.shutdown()
+            self.preload = preload
+        self.size = pool_config.get('size', 0)
+        while len(self.idle) > self.size:
+            ray.kill(self.idle.pop())
+        self.refill()
+
+    def refill(self):
+        while len(self.idle) < self.size:
+            worker = StepWorker.remote()
+            worker.preload.remote(list(self.preload))
+            self.idle.append(worker)
+
+    def acquire(self, step_config):
+        options = worker_options(step_config)
+        if options or not self.idle:
+            if self.size:
+                self.misses += 1
+            return create_worker(step_config, options)
+        self.hits += 1
+        logger.info(f"Using a pooled StepWorker for step '{step_config.get('name')}'")
+        worker = self.idle.popleft()
+        self.refill()
+        return worker
+
+    def shutdown(self):
+        while self.idle:
+            ray.kill(self.idle.pop())
+
+    def stats(self):
+        return {'size': self.size, 'idle': len(self.idle), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,93 @@
+# src/core/streaming.py
+
+import asyncio
+import logging
+from aiohttp import web
+from sdk.wire import (INVALID_REQUEST_ID, MAX_STREAM_MESSAGE, STREAM_CONTENT_TYPE, pack_message, read_message,
+                      unpack_message)
+from .wire import request_params
+
+logger = logging.getLogger("Streaming")
+
+
+async def stream_inference(request, engine):
+    """
+    Streaming inference over one chunked HTTP request. The request body is a
+    sequence of messages, each a frame tagged with a request id; the chunked
+    response carries one message per result, tagged with the same id and
+    written as soon as it finishes, so results may arrive out of order.
+
+    At most `window` frames are in flight; the body is not read further
+    until one finishes, so TCP flow control holds back a faster sender.
+    Proxies that buffer whole requests and responses, like the Serve proxy
+    of Ray 2.3, still work, but then results only arrive once the upload
+    has finished. Frames may be encoded images or raw frame messages;
+    `format=raw` returns raw frames, optionally with `compression`, and
+    `adapter` or `params` apply to every frame of the stream. `engine`
+    is a handle to the Engine deployment; every frame goes through its
+    infer().
+    """
+    try:
+        timeout_ms = request.query.get("timeout_ms")
+        image_format = request.query.get("format", "jpg").lower()
+        compression = request.query.get("compression")
+        params = request_params(request)
+        window = int(request.query.get("window", 8))
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}.")
+        window = asyncio.Semaphore(window)
+    except ValueError as e:
+        logger.error(f"Invalid stream request: {e}")
+        return web.Response(text="Invalid stream request.", status=400)
+    response = web.StreamResponse(headers={'Content-Type': STREAM_CONTENT_TYPE})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    writing = asyncio.Lock()
+
+    async def reply(request_id, body, status):
+        try:
+            async with writing:
+                await response.write(pack_message(request_id, body, status))
+        except ConnectionError as e:
+            logger.warning(f"Stream client went away: {e}")
+
+    async def infer(request_id, payload):
+        try:
+            status, body, _ = await engine.infer.remote(payload, timeout_ms, image_format, compression, params)
+        except Exception as e:
+            logger.exception(f"Streaming inference failed: {e}")
+            status, body = 500, b"Internal server error."
+        finally:
+            window.release()
+        await reply(request_id, body, status)
+
+    pending = set()
+    try:
+        while True:
+            await window.acquire()
+            try:
+                message = await read_message(request.content, MAX_STREAM_MESSAGE)
+            except ValueError as e:
+                # The framing is lost, so nothing after this can be read
+                window.release()
+                logger.error(f"Invalid stream: {e}")
+                await reply(INVALID_REQUEST_ID, f"Invalid stream: {e}".encode(), 400)
+                break
+            if message is None:
+                window.release()
+                break
+            try:
+                request_id, _, payload = unpack_message(message)
+            except ValueError as e:
+                window.release()
+                logger.error(f"Invalid stream message: {e}")
+                await reply(INVALID_REQUEST_ID, f"Invalid stream message: {e}".encode(), 400)
+                continue
+            task = asyncio.create_task(infer(request_id, bytes(payload)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    finally:
+        # Results of frames already read are still sent, also after a dropped upload
+        await asyncio.gather(*pending, return_exceptions=True)
+    await response.write_eof()
+    return response
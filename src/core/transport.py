@@ -0,0 +1,65 @@
+# src/core/transport.py
+
+import logging
+import ray
+
+logger = logging.getLogger("Transport")
+
+
+class FrameHandle:
+    """
+    Control-path record for a frame whose pixels live in the Ray object store.
+
+    Only this small object travels through FrameBuffer actor calls. Consumers
+    resolve `ref` on their own node, where Ray maps the NumPy array straight
+    out of shared memory instead of copying it.
+    """
+
+    def __init__(self, ref, shape, colorspace, pts=None, time_base=None, sequence=None, ingest_time=None):
+        self.ref = ref
+        self.shape = shape
+        self.colorspace = colorspace
+        self.pts = pts
+        self.time_base = time_base
+        self.sequence = sequence
+        self.ingest_time = ingest_time
+
+    @staticmethod
+    def from_frame(ref, frame):
+        # Results are not always Frames; encoded chunks such as MP4 fragments carry no frame metadata
+        return FrameHandle(ref, getattr(frame, 'shape', None), getattr(frame, 'colorspace', None),
+                           getattr(frame, 'pts', None), getattr(frame, 'time_base', None),
+                           getattr(frame, 'sequence', None), getattr(frame, 'ingest_time', None))
+
+    def __repr__(self):
+        return f"FrameHandle(shape={self.shape}, sequence={self.sequence})"
+
+
+class Tombstone:
+    """
+    Stands in for a frame that was dropped on purpose, e.g. evicted from a
+    buffer or over its latency budget, so playback can skip its sequence
+    number at once instead of waiting for it.
+    """
+
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+    def __repr__(self):
+        return f"Tombstone(sequence={self.sequence})"
+
+
+def put_frame(frame):
+    """Stores a frame in the object store and returns its handle."""
+    return FrameHandle.from_frame(ray.put(frame), frame)
+
+
+async def publish_frame(buffer, frame):
+    await buffer.add_frame.remote(put_frame(frame))
+
+
+async def resolve_frame(item):
+    """Returns the frame behind a handle; anything else is passed through."""
+    if isinstance(item, FrameHandle):
+        return await item.ref
+    return item
@@ -2,34 +2,223 @@
 
 import cv2
 import numpy as np
-from PIL import Image
 import ray
+import asyncio
+import itertools
 import logging
+import time
+from collections import Counter, deque
+from .frame import as_frame, frame_function
+from .transport import Tombstone
 
 logger = logging.getLogger("Utils")
 
 
+DROP_POLICIES = ('drop_newest', 'drop_oldest', 'latest_only', 'drop_by_age')
+
+
 @ray.remote
 class FrameBuffer:
-    def __init__(self, max_length=100):
-        self.frames = []
+    """
+    Bounded frame queue shared between producers and consumers.
+
+    `drop_policy` decides what happens under pressure:
+    - drop_newest: reject incoming frames when full (the original behaviour).
+    - drop_oldest: evict the oldest queued frame to make room.
+    - latest_only: keep only the most recent frame.
+    - drop_by_age: like drop_oldest, and also discard frames whose ingest time
+      is more than `max_age_ms` in the past.
+    Drops are counted by reason and reported by stats(). With `tombstones`,
+    every dropped frame that has a sequence number leaves a Tombstone, which
+    get_frames() hands out ahead of the frames; Tombstones added by producers
+    take the same path.
+
+    With `broadcast`, every consumer sees every frame: read_frames() leaves
+    the frames in place and each reader passes its own cursor, so several
+    viewers of one session do not split its frames between them. The buffer
+    then holds the last `max_length` items, Tombstones included in the order
+    they were added, and the drop policy only decides what is trimmed.
+    """
+
+    # Holds FrameHandle records; pixel data stays in the Ray object store
+    def __init__(self, max_length=100, drop_policy='drop_oldest', max_age_ms=None, tombstones=False,
+                 broadcast=False):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}'. Expected one of {DROP_POLICIES}.")
+        if drop_policy == 'drop_by_age' and not max_age_ms:
+            raise ValueError("The drop_by_age policy requires max_age_ms.")
+        if broadcast and drop_policy == 'drop_newest':
+            raise ValueError("A broadcast buffer is never emptied by its readers, so it cannot drop newest.")
+        self.frames = deque()
+        self.broadcast = broadcast
+        # Position of frames[0] among all items ever added; read_frames() cursors count in it
+        self.first = 0
+        self.lagged = 0
         self.max_length = max_length
+        self.drop_policy = drop_policy
+        self.max_age = max_age_ms / 1000.0 if max_age_ms else None
+        self.drops = Counter()
+        # Bounded, so a consumer that never reads cannot make them pile up
+        self.tombstones = deque(maxlen=4 * max_length) if tombstones else None
+        self.added = 0
         self.pipeline_available_flag = False
+        self._frames_ready = None
 
-    async def add_frame(self, frame):
-        if len(self.frames) >= self.max_length:
-            logger.warning("FrameBuffer is full. Dropping frame.")
-            return
+    def _drop(self, frame, reason):
+        self.drops[reason] += 1
+        sequence = getattr(frame, 'sequence', None)
+        # Broadcast readers that kept up already have the frame; the others skip ahead
+        if self.tombstones is not None and not self.broadcast and sequence is not None:
+            self.tombstones.append(Tombstone(sequence))
+
+    def _evict(self, reason):
+        frame = self.frames.popleft()
+        self.first += 1
+        if not isinstance(frame, Tombstone):
+            self._drop(frame, reason)
+
+    def _admit(self, frame):
+        if isinstance(frame, Tombstone):
+            if self.tombstones is None:
+                return False
+            if self.broadcast:
+                if len(self.frames) >= self.max_length:
+                    self._evict('evicted')
+                self.frames.append(frame)
+            else:
+                self.tombstones.append(frame)
+            return True
+        if self.drop_policy == 'latest_only':
+            while self.frames:
+                self._evict('superseded')
+        elif len(self.frames) >= self.max_length:
+            if self.drop_policy == 'drop_newest':
+                self._drop(frame, 'full')
+                logger.debug("FrameBuffer is full. Dropping newest frame.")
+                return False
+            self._evict('evicted')
+            logger.debug("FrameBuffer is full. Dropping oldest frame.")
         self.frames.append(frame)
-        logger.debug("Frame added to buffer.")
+        self.added += 1
+        return True
+
+    def _expire(self):
+        if self.max_age is None:
+            return
+        cutoff = time.time() - self.max_age
+        while self.frames:
+            if not isinstance(self.frames[0], Tombstone):
+                ingest_time = getattr(self.frames[0], 'ingest_time', None)
+                if ingest_time is None or ingest_time >= cutoff:
+                    break
+            self._evict('expired')
 
-    async def get_frame(self):
+    def _condition(self):
+        # Created lazily so it binds to the actor's event loop
+        if self._frames_ready is None:
+            self._frames_ready = asyncio.Condition()
+        return self._frames_ready
+
+    async def _notify(self):
+        condition = self._condition()
+        async with condition:
+            condition.notify_all()
+
+    async def _wait_for_frames(self, timeout, predicate=None):
+        condition = self._condition()
+        predicate = predicate or (lambda: bool(self.frames or self.tombstones))
+        async with condition:
+            try:
+                await asyncio.wait_for(condition.wait_for(predicate), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def add_frame(self, frame):
+        if self._admit(frame):
+            logger.debug("Frame added to buffer.")
+            await self._notify()
+        elif self.tombstones:
+            # A rejected frame left a tombstone
+            await self._notify()
+
+    async def add_frames(self, frames):
+        accepted = 0
+        for frame in frames:
+            if self._admit(frame):
+                accepted += 1
+        if accepted or self.tombstones:
+            await self._notify()
+        return accepted
+
+    async def get_frame(self, timeout=0):
+        """
+        Returns the oldest frame, or None if none arrived in time. A timeout of
+        0 returns immediately and None waits until a frame is available.
+        Pending tombstones are left for get_frames() and do not end the wait.
+        """
+        self._expire()
+        if not self.frames and timeout != 0:
+            await self._wait_for_frames(timeout, lambda: bool(self.frames))
+            self._expire()
         if self.frames:
-            frame = self.frames.pop(0)
+            frame = self.frames.popleft()
+            self.first += 1
             logger.debug("Frame retrieved from buffer.")
             return frame
-        else:
-            return None
+        return None
+
+    async def get_frames(self, n, timeout=0):
+        """
+        Waits like get_frame, then returns up to n frames in arrival order,
+        preceded by any pending tombstones.
+        """
+        self._expire()
+        if not self.frames and not self.tombstones and timeout != 0:
+            await self._wait_for_frames(timeout)
+            self._expire()
+        count = min(n, len(self.frames))
+        frames = [self.frames.popleft() for _ in range(count)]
+        self.first += count
+        if self.tombstones:
+            frames[:0] = self.tombstones
+            self.tombstones.clear()
+        return frames
+
+    async def read_frames(self, cursor, n, timeout=0):
+        """
+        Reads a broadcast buffer without taking the frames from other readers.
+        Returns up to n items from `cursor` on, and the cursor to pass next
+        time. A cursor of None starts with the next item added; a reader that
+        fell further behind than the buffer holds skips ahead to its oldest
+        item. Waits like get_frame.
+        """
+        self._expire()
+        end = self.first + len(self.frames)
+        if cursor is None or cursor > end:
+            cursor = end
+        if cursor >= end and timeout != 0:
+            await self._wait_for_frames(timeout, lambda: self.first + len(self.frames) > cursor)
+            self._expire()
+        if cursor < self.first:
+            self.lagged += self.first - cursor
+            cursor = self.first
+        start = cursor - self.first
+        items = list(itertools.islice(self.frames, start, start + n))
+        return cursor + len(items), items
+
+    async def size(self):
+        return len(self.frames)
+
+    async def stats(self):
+        return {
+            'size': len(self.frames),
+            'max_length': self.max_length,
+            'drop_policy': self.drop_policy,
+            'added': self.added,
+            'drops': dict(self.drops),
+            # Items broadcast readers missed because they fell behind
+            'lagged': self.lagged,
+        }
 
     async def pipeline_available(self):
         return self.pipeline_available_flag
@@ -38,27 +227,25 @@ class FrameBuffer:
         self.pipeline_available_flag = available
 
 
+@frame_function
 def resize_image(data, size):
     try:
-        img_array = np.frombuffer(data, dtype=np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        pil_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        pil_image = pil_image.resize(size)
-        img = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-        _, buffer = cv2.imencode('.jpg', img)
-        return buffer.tobytes()
+        from PIL import Image
+        frame = as_frame(data)
+        pil_image = Image.fromarray(frame.to_rgb())
+        pil_image = pil_image.resize(tuple(size))
+        return frame.with_data(np.array(pil_image), colorspace="rgb24")
     except Exception as e:
         logger.exception(f"Error in resize_image: {e}")
         return None
 
 
+@frame_function
 def enhance_image(data, factor):
     try:
-        img_array = np.frombuffer(data, dtype=np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        img = cv2.convertScaleAbs(img, alpha=factor, beta=0)
-        _, buffer = cv2.imencode('.jpg', img)
-        return buffer.tobytes()
+        frame = as_frame(data)
+        img = cv2.convertScaleAbs(frame.data, alpha=factor, beta=0)
+        return frame.with_data(img)
     except Exception as e:
         logger.exception(f"Error in enhance_image: {e}")
         return None
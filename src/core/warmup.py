@@ -0,0 +1,100 @@
+# src/core/warmup.py
+
+import logging
+import os
+import time
+import numpy as np
+from .frame import Frame
+from .metrics import LOAD_BUCKETS, registry
+from .startup import load_module
+
+logger = logging.getLogger("Warmup")
+
+warmup_seconds = registry.histogram('step_warmup_seconds', 'Time to warm up a step before it serves.', LOAD_BUCKETS)
+
+DEFAULT_RESOLUTION = (512, 512)
+
+# Where compiled kernels persist across restarts
+compile_cache_root = os.environ.get('MODEL_COMPILE_CACHE_DIR')
+
+
+def dummy_frames(resolution, count):
+    width, height = resolution
+    return [Frame(np.full((height, width, 3), 127, dtype=np.uint8), sequence=i, stream_id='warmup')
+            for i in range(count)]
+
+
+def configure_compile_cache(root=None):
+    """
+    Points torch.compile's on-disk kernel cache at `root`
+    (MODEL_COMPILE_CACHE_DIR by default). Inductor reads it once per process,
+    so workers call this at start, before any step compiles; a setting already
+    in the environment wins. Inductor keys its kernels by their source, so all
+    models share the one directory. The pinned torch 2.0.1 has no FX graph
+    cache, so only the generated kernels persist: a restart still traces and
+    lowers each graph, but skips compiling the kernels.
+    """
+    root = root or compile_cache_root
+    if root is None:
+        return None
+    os.makedirs(root, exist_ok=True)
+    os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', root)
+    return os.environ['TORCHINDUCTOR_CACHE_DIR']
+
+
+def optimize_model(model, optimize_config):
+    """
+    Applies channels-last memory format and torch.compile to the denoising
+    UNet (and channels-last to the VAE) of a diffusers pipeline. Models are
+    shared through the model cache, so already compiled modules are left
+    alone. Compilation itself happens on the first call, i.e. during warmup.
+    """
+    if optimize_config is True:
+        optimize_config = {}
+    torch = load_module('torch')
+    if optimize_config.get('channels_last', True):
+        for name in ('unet', 'vae'):
+            module = getattr(model, name, None)
+            if module is not None:
+                module.to(memory_format=torch.channels_last)
+    if not optimize_config.get('compile', False):
+        return
+    unet = getattr(model, 'unet', None)
+    if unet is not None and not hasattr(unet, '_orig_mod'):
+        model.unet = torch.compile(unet, mode=optimize_config.get('mode', 'reduce-overhead'),
+                                   fullgraph=optimize_config.get('fullgraph', False))
+
+
+def run_warmup(step, warmup_config, max_batch_size=1):
+    """
+    Runs `iterations` dummy frames at `resolution` (width, height) through the
+    step at every batch size from 1 to `max_batch_size`, or only at
+    `batch_size` if the config sets one, and returns the time of each
+    iteration. Compiled models specialize on batch size, so each size a
+    batched step may see is compiled here rather than on live traffic.
+    """
+    if warmup_config is True:
+        warmup_config = {}
+    iterations = warmup_config.get('iterations', 2)
+    resolution = tuple(warmup_config.get('resolution', DEFAULT_RESOLUTION))
+    if 'batch_size' in warmup_config:
+        batch_sizes = [warmup_config['batch_size']]
+    else:
+        batch_sizes = range(1, max(1, max_batch_size) + 1)
+
+    times = []
+    start = time.perf_counter()
+    for batch_size in batch_sizes:
+        for _ in range(iterations):
+            iteration_start = time.perf_counter()
+            frames = dummy_frames(resolution, batch_size)
+            if batch_size > 1:
+                step.process_batch(frames)
+            else:
+                step.process(frames[0])
+            times.append(time.perf_counter() - iteration_start)
+    warmup_seconds.observe(time.perf_counter() - start, step=step.name)
+    logger.info(f"Warmed up step '{step.name}' at {resolution[0]}x{resolution[1]}, "
+                f"batch {', '.join(str(b) for b in batch_sizes)}: "
+                + ", ".join(f"{t * 1000:.0f} ms" for t in times))
+    return times
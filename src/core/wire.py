@@ -0,0 +1,30 @@
+# src/core/wire.py
+#
+# HTTP helpers of the inference endpoints. The raw frame and stream message
+# formats are in sdk/wire.py, which the client SDK owns.
+
+import json
+
+
+def parse_media_type(header):
+    """Splits 'type/subtype; key=value' into the media type and its parameters."""
+    media_type, _, rest = (header or '').partition(';')
+    params = {}
+    for item in rest.split(';'):
+        key, _, value = item.strip().partition('=')
+        if key:
+            params[key.lower()] = value.strip().strip('"')
+    return media_type.strip().lower(), params
+
+
+def request_params(request):
+    """
+    Per-request step overrides: a JSON object in the `params` query
+    parameter, with `adapter` as a shortcut for {"adapter": ...}.
+    """
+    params = json.loads(request.query.get("params") or "{}")
+    if not isinstance(params, dict):
+        raise ValueError("params must be a JSON object.")
+    if request.query.get("adapter"):
+        params['adapter'] = request.query["adapter"]
+    return params
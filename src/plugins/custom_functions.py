@@ -3,42 +3,36 @@
 import logging
 import cv2
 import numpy as np
-import tempfile
-import os
 import io
+from fractions import Fraction
+from src.core.frame import Frame, as_frame, collects_frames, frame_function
+from src.core.startup import load_module
 
 logger = logging.getLogger("CustomFunctions")
 
 
+@frame_function
 def custom_resize_image(data, size):
     try:
         # Custom resize implementation using BICUBIC interpolation
-        import numpy as np
-        import cv2
         from PIL import Image
-        img_array = np.frombuffer(data, dtype=np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        pil_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        pil_image = pil_image.resize(size, resample=Image.BICUBIC)
-        img = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-        _, buffer = cv2.imencode('.jpg', img)
-        return buffer.tobytes()
+        frame = as_frame(data)
+        pil_image = Image.fromarray(frame.to_rgb())
+        pil_image = pil_image.resize(tuple(size), resample=Image.BICUBIC)
+        return frame.with_data(np.array(pil_image), colorspace="rgb24")
     except Exception as e:
         logger.exception(f"Error in custom_resize_image: {e}")
         return None
 
 
+@frame_function
 def custom_enhance_image(data, factor):
     try:
         # Custom enhancement using detail enhancement
-        import numpy as np
-        import cv2
-        img_array = np.frombuffer(data, dtype=np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        img = cv2.detailEnhance(img, sigma_s=10, sigma_r=0.15)
+        frame = as_frame(data)
+        img = cv2.detailEnhance(frame.to_bgr(), sigma_s=10, sigma_r=0.15)
         img = cv2.convertScaleAbs(img, alpha=factor, beta=0)
-        _, buffer = cv2.imencode('.jpg', img)
-        return buffer.tobytes()
+        return frame.with_data(img, colorspace="bgr24")
     except Exception as e:
         logger.exception(f"Error in custom_enhance_image: {e}")
         return None
@@ -58,104 +52,173 @@ logger = logging.getLogger("CustomFunctions")
 
 
 
-def video_frame_extraction(data, frame_rate=30):
+@frame_function
+def video_frame_extraction(data, frame_rate=30, start_time=0.0, end_time=None):
     """
     Extracts frames from video data at the specified frame rate.
 
+    Decoding runs from an in-memory buffer and frames are yielded one at a
+    time, so downstream steps can start on the first frame and memory does
+    not grow with the length of the video.
+
     Parameters:
     - data: The input video data as bytes.
     - frame_rate: The desired frame rate for extraction.
+    - start_time: Seek to this position (seconds) before decoding.
+    - end_time: Stop after this position (seconds), if given.
 
     Returns:
-    - A list of frames as bytes.
+    - A generator of decoded Frame objects.
     """
+    logger.info("Starting video frame extraction.")
+    return _iter_video_frames(bytes(data), frame_rate, start_time, end_time)
+
+
+def _iter_video_frames(data, frame_rate, start_time, end_time):
+    av = load_module('av')
+    count = 0
     try:
-        logger.info("Starting video frame extraction.")
-        # Write the video data to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-            tmp_file.write(data)
-            tmp_filename = tmp_file.name
-
-        cap = cv2.VideoCapture(tmp_filename)
-
-        # Set the desired frame rate
-        original_frame_rate = cap.get(cv2.CAP_PROP_FPS)
-        frame_interval = int(max(1, original_frame_rate / frame_rate))
-
-        frames = []
-        frame_count = 0
-        success, frame = cap.read()
-        while success:
-            if frame_count % frame_interval == 0:
-                # Encode frame to bytes
-                _, buffer = cv2.imencode('.jpg', frame)
-                frame_bytes = buffer.tobytes()
-                frames.append(frame_bytes)
-            success, frame = cap.read()
-            frame_count += 1
-
-        cap.release()
-        # Remove the temporary file
-        os.remove(tmp_filename)
-
-        logger.info(f"Extracted {len(frames)} frames from video.")
-        return frames
+        with av.open(io.BytesIO(data)) as container:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            if start_time:
+                # Seeks land on the keyframe before start_time; earlier frames are skipped below
+                container.seek(int(start_time / stream.time_base), stream=stream)
+
+            interval = 1.0 / frame_rate if frame_rate else 0.0
+            next_time = start_time or 0.0
+            for frame in container.decode(stream):
+                if frame.pts is None:
+                    continue
+                timestamp = float(frame.pts * frame.time_base)
+                if timestamp < next_time - 1e-6:
+                    # Decimate by timestamp; dropped frames are never converted to arrays
+                    continue
+                if end_time is not None and timestamp > end_time:
+                    break
+                next_time += interval
+                if next_time <= timestamp:
+                    # Resynchronise after a gap in the source timestamps
+                    next_time = timestamp + interval
+                yield Frame(
+                    frame.to_ndarray(format="bgr24"),
+                    colorspace="bgr24",
+                    pts=frame.pts,
+                    time_base=frame.time_base,
+                    sequence=count,
+                )
+                count += 1
+        logger.info(f"Extracted {count} frames from video.")
     except Exception as e:
-        logger.exception(f"Error in video_frame_extraction: {e}")
-        return None
+        # A corrupt or truncated upload must fail the request, not pass as a shorter video
+        logger.exception(f"Error in video_frame_extraction after {count} frames: {e}")
+        raise
+
+
+class _ChunkSink:
+    """Write-only file object that hands muxed bytes back as chunks."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
 
-def video_frame_assembly(frames, frame_rate=30):
+
+@collects_frames
+def video_frame_assembly(frames, frame_rate=30, codec='libx264', preset='veryfast', threads=0,
+                         crf=None, pix_fmt='yuv420p'):
     """
     Assembles frames into a video at the specified frame rate.
 
+    Frames are encoded as they arrive into a fragmented MP4 held in memory,
+    and encoded chunks are yielded as soon as the muxer produces them. Joining
+    the chunks gives a playable MP4 file.
+
     Parameters:
-    - frames: A list of frames as bytes.
+    - frames: An iterable of Frame objects (encoded image bytes are also accepted).
     - frame_rate: The frame rate for the output video.
+    - codec: Encoder name, e.g. 'libx264' or 'h264_nvenc'.
+    - preset: Encoder speed/quality preset.
+    - threads: Encoder threads; 0 lets the encoder decide.
+    - crf: Constant rate factor, if the encoder supports it.
+    - pix_fmt: Output pixel format.
 
     Returns:
-    - The assembled video data as bytes.
+    - A generator of encoded MP4 chunks as bytes.
     """
+    logger.info("Starting video frame assembly.")
+    options = {'preset': str(preset)}
+    if crf is not None:
+        options['crf'] = str(crf)
+    return _iter_encoded_chunks(frames, frame_rate, codec, options, threads, pix_fmt)
+
+
+def _iter_encoded_chunks(frames, frame_rate, codec, options, threads, pix_fmt):
+    av = load_module('av')
+    # NTSC rates such as 29.97 become 30000/1001 instead of being truncated
+    rate = Fraction(frame_rate).limit_denominator(1001)
+    sink = _ChunkSink()
+    container = None
+    stream = None
+    count = 0
     try:
-        logger.info("Starting video frame assembly.")
-        if not frames:
-            logger.error("No frames provided for assembly.")
-            return None
-
-        # Decode the first frame to get frame dimensions
-        img_array = np.frombuffer(frames[0], dtype=np.uint8)
-        first_frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        height, width, layers = first_frame.shape
-
-        # Create a temporary file for the video
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-            video_filename = tmp_file.name
-
-        # Define the codec and create VideoWriter object
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        video_writer = cv2.VideoWriter(video_filename, fourcc, frame_rate, (width, height))
-
-        for frame_bytes in frames:
-            img_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            if frame is not None:
-                video_writer.write(frame)
-            else:
+        for item in frames:
+            try:
+                frame = as_frame(item)
+            except (TypeError, ValueError):
                 logger.warning("Skipping a frame during assembly due to decoding failure.")
-
-        video_writer.release()
-
-        # Read the video data from the temporary file
-        with open(video_filename, 'rb') as f:
-            video_data = f.read()
-
-        # Remove the temporary file
-        os.remove(video_filename)
-
-        logger.info("Video frame assembly completed.")
-        return video_data
+                continue
+
+            if container is None:
+                # Fragmented MP4 never seeks back, so it can be streamed out as it is written
+                container = av.open(sink, mode='w', format='mp4',
+                                    options={'movflags': 'frag_keyframe+empty_moov+default_base_moof'})
+                stream = container.add_stream(codec, rate=rate)
+                # 4:2:0 encoders need even dimensions
+                stream.width = frame.width - frame.width % 2
+                stream.height = frame.height - frame.height % 2
+                stream.pix_fmt = pix_fmt
+                stream.options = options
+                stream.thread_type = "AUTO"
+                stream.codec_context.thread_count = int(threads)
+
+            video_frame = av.VideoFrame.from_ndarray(frame.to_bgr(), format="bgr24")
+            if (video_frame.width, video_frame.height) != (stream.width, stream.height):
+                video_frame = video_frame.reformat(width=stream.width, height=stream.height)
+            video_frame.pts = count
+            video_frame.time_base = 1 / rate
+            for packet in stream.encode(video_frame):
+                container.mux(packet)
+            count += 1
+            yield from sink.drain()
+
+        if container is None:
+            logger.error("No frames provided for assembly.")
+            return
+        # Flush frames still buffered in the encoder
+        for packet in stream.encode():
+            container.mux(packet)
+        container.close()
+        container = None
+        yield from sink.drain()
+        logger.info(f"Video frame assembly completed with {count} frames.")
     except Exception as e:
-        logger.exception(f"Error in video_frame_assembly: {e}")
-        return None
+        # A truncated MP4 must not pass as a successful result
+        logger.exception(f"Error in video_frame_assembly after {count} frames: {e}")
+        raise
+    finally:
+        if container is not None:
+            container.close()
+
 
 # Update custom functions dictionary
 from src.core.utils import custom_functions
@@ -1,28 +1,43 @@
 # src/plugins/custom_models.py
 
 import logging
+import threading
+import weakref
+from collections import OrderedDict
 from src.core.steps.base_step import BaseStep
-import torch
-from diffusers import StableDiffusionPipeline
 import numpy as np
-import cv2
-from PIL import Image
+from src.core.frame import as_frame
+from src.core.steps.model_step import run_image_batch
+from src.core.model_cache import load_pretrained
+from src.core.startup import load_module
+from src.core.warmup import optimize_model
 
 logger = logging.getLogger("CustomModels")
 
+# What LoRAAdapterCache uses of the pinned diffusers (0.18): the pipeline's LoraLoaderMixin and its UNet
+LORA_PIPELINE_API = ('load_lora_weights', 'text_encoder_lora_attn_procs', '_modify_text_encoder',
+                     '_remove_text_encoder_monkey_patch')
+LORA_UNET_API = ('attn_processors', 'set_attn_processor')
+
 
 class CustomLiveDiffModelStep(BaseStep):
-    def __init__(self, name, model_name, params):
+    def __init__(self, name, model_name, params, optimize_config=None):
         super().__init__(name, params)
+        self.deterministic = False
         self.model_name = model_name
         self.model = self.load_model(model_name)
+        if self.model is not None and optimize_config:
+            try:
+                optimize_model(self.model, optimize_config)
+            except Exception as e:
+                logger.exception(f"Failed to optimize LiveDiff model '{model_name}'; running it unoptimized: {e}")
 
     @staticmethod
     def from_config(config):
         name = config.get('name')
         model_name = config.get('model_name')
         params = config.get('params', {})
-        return CustomLiveDiffModelStep(name, model_name, params)
+        return CustomLiveDiffModelStep(name, model_name, params, config.get('optimize'))
 
     def load_model(self, model_name):
         try:
@@ -32,10 +47,12 @@ class CustomLiveDiffModelStep(BaseStep):
             # Replace the following line with the actual model loading code
 
             # Placeholder: Using StableDiffusionPipeline as an example
-            model = StableDiffusionPipeline.from_pretrained(
-                model_name, torch_dtype=torch.float16
+            torch = load_module('torch')
+            diffusers = load_module('diffusers')
+            model = load_pretrained(
+                diffusers.StableDiffusionPipeline, model_name, torch.float16,
+                "cuda" if torch.cuda.is_available() else "cpu"
             )
-            model.to("cuda" if torch.cuda.is_available() else "cpu")
             logger.info(f"LiveDiff model '{model_name}' loaded successfully.")
             return model
         except Exception as e:
@@ -47,10 +64,11 @@ class CustomLiveDiffModelStep(BaseStep):
             logger.error(f"LiveDiff model '{self.model_name}' is not loaded.")
             return None
         try:
+            import torch
+            from PIL import Image
             # Convert data to PIL image
-            img_array = np.frombuffer(data, dtype=np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            input_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            frame = as_frame(data)
+            input_image = Image.fromarray(frame.to_rgb())
 
             # Perform inference with LiveDiff
             # Implement the specific inference logic for LiveDiff
@@ -61,19 +79,119 @@ class CustomLiveDiffModelStep(BaseStep):
                     image=input_image
                 ).images[0]
 
-            # Convert back to bytes
-            output_img = cv2.cvtColor(np.array(output), cv2.COLOR_RGB2BGR)
-            _, buffer = cv2.imencode('.jpg', output_img)
-            return buffer.tobytes()
+            # Keep the result decoded; encoding happens at the playback edge
+            return frame.with_data(np.array(output), colorspace="rgb24")
         except Exception as e:
             logger.exception(f"Error during LiveDiff model inference in step '{self.name}': {e}")
             return None
 
+    def process_batch(self, items):
+        if self.model is None:
+            logger.error(f"LiveDiff model '{self.model_name}' is not loaded.")
+            return [None] * len(items)
+        try:
+            return run_image_batch(self.model, items, self.params.get('prompt', ''))
+        except Exception as e:
+            logger.exception(f"Error during batched LiveDiff model inference in step '{self.name}': {e}")
+            return [None] * len(items)
+
+
+class LoRAAdapterCache:
+    """
+    Tracks the adapter applied to one shared base pipeline and keeps recently
+    used adapters resident, so switching styles only swaps the LoRA attention
+    processors instead of reloading anything from disk. Each adapter is
+    loaded once with `load_lora_weights`; its UNet processors and text
+    encoder LoRA layers are kept and put back on later switches, and the
+    base processors are restored to deactivate it. Callers hold `lock` from
+    activate() until their inference on the base finishes, since the active
+    adapter is global state of the shared pipeline.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        self.processors = OrderedDict()
+        self.base_processors = None
+        self.active = None
+        self.hits = 0
+        self.misses = 0
+        self.switches = 0
+
+    def _processors(self, model, path):
+        if path in self.processors:
+            self.processors.move_to_end(path)
+            self.hits += 1
+            return self.processors[path]
+        self.misses += 1
+        # Loaded onto the base, so the new adapter's processors never mix with the active one's
+        model.unet.set_attn_processor(dict(self.base_processors))
+        previous = model.text_encoder_lora_attn_procs
+        model.load_lora_weights(path)
+        # The processors are already on the model's device, so a switch is a pure GPU operation
+        text_encoder = model.text_encoder_lora_attn_procs
+        # Adapters without text encoder layers leave the previous adapter's in place
+        if text_encoder is previous:
+            text_encoder = None
+        self.processors[path] = (dict(model.unet.attn_processors), text_encoder)
+        while len(self.processors) > self.max_entries:
+            evicted, _ = self.processors.popitem(last=False)
+            logger.info(f"Evicted LoRA adapter '{evicted}' from cache.")
+        return self.processors[path]
+
+    def activate(self, model, path):
+        if path == self.active:
+            return
+        if self.base_processors is None:
+            self.base_processors = dict(model.unet.attn_processors)
+        if path is None:
+            # set_attn_processor consumes the dict it is given, so every call gets a copy
+            model.unet.set_attn_processor(dict(self.base_processors))
+            model._remove_text_encoder_monkey_patch()
+            self.active = None
+            return
+        unet, text_encoder = self._processors(model, path)
+        model.unet.set_attn_processor(dict(unet))
+        if text_encoder is not None:
+            model._modify_text_encoder(text_encoder)
+        else:
+            model._remove_text_encoder_monkey_patch()
+        self.active = path
+        self.switches += 1
+        logger.info(f"Activated LoRA adapter '{path}'.")
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'cached': list(self.processors),
+            'hits': self.hits,
+            'misses': self.misses,
+            'switches': self.switches,
+        }
+
+
+# One adapter cache per resident base pipeline object. Weak keys let a pipeline evicted from the
+# model cache take its adapter state and weights with it; a reloaded pipeline starts a fresh cache.
+adapter_caches = weakref.WeakKeyDictionary()
+adapter_caches_lock = threading.Lock()
+
+
+def adapter_cache_for(model, max_entries=8):
+    with adapter_caches_lock:
+        cache = adapter_caches.get(model)
+        if cache is None:
+            cache = adapter_caches[model] = LoRAAdapterCache(max_entries)
+        return cache
+
 
 class CustomLoRAModelStep(BaseStep):
     def __init__(self, name, model_name, params):
         super().__init__(name, params)
+        self.deterministic = False
         self.model_name = model_name
+        self.adapters = dict(params.get('adapters') or {})
+        self.default_adapter = params.get('adapter') or params.get('lora_weights_path')
+        self.adapter_cache = None
         self.model = self.load_model()
 
     @staticmethod
@@ -87,56 +205,85 @@ class CustomLoRAModelStep(BaseStep):
         try:
             logger.info(f"Loading LoRA model '{self.model_name}'...")
             base_model_name = self.params.get('base_model', 'stabilityai/stable-diffusion-2-1-base')
-            lora_weights_path = self.params.get('lora_weights_path')
 
-            if not lora_weights_path:
+            if not self.default_adapter and not self.adapters:
                 logger.error("LoRA weights path not provided in parameters.")
                 return None
 
-            # Load the base model
-            model = StableDiffusionPipeline.from_pretrained(
-                base_model_name, torch_dtype=torch.float16
-            )
-            model.to("cuda" if torch.cuda.is_available() else "cpu")
-            logger.info(f"Base model '{base_model_name}' loaded successfully.")
-
-            # Load LoRA weights
-            # Implement LoRA weights loading
-            # Placeholder: Assuming use of `diffusers.load_lora_weights`
-            from diffusers.utils import load_lora_weights
-            model = load_lora_weights(model, lora_weights_path)
-            logger.info(f"LoRA weights from '{lora_weights_path}' loaded successfully.")
-
+            # The base pipeline is resident once per base_model; adapters are swapped onto it
+            torch = load_module('torch')
+            StableDiffusionPipeline = load_module('diffusers').StableDiffusionPipeline
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model = load_pretrained(StableDiffusionPipeline, base_model_name, torch.float16, device)
+            self.adapter_cache = adapter_cache_for(model, self.params.get('adapter_cache_size', 8))
+            logger.info(f"Base model '{base_model_name}' ready for LoRA adapters.")
             return model
         except Exception as e:
             logger.exception(f"Failed to load LoRA model '{self.model_name}': {e}")
             return None
 
+    def resolve_adapter(self, frame):
+        """
+        Picks the adapter for a frame. Frames may name one of the configured
+        `adapters` in `frame.params['adapter']`; anything else falls back to
+        the step's default.
+        """
+        requested = frame.params.get('adapter')
+        if requested is None:
+            return self.adapters.get(self.default_adapter, self.default_adapter)
+        if requested in self.adapters:
+            return self.adapters[requested]
+        logger.warning(f"Unknown LoRA adapter '{requested}' requested in step '{self.name}'; using default.")
+        return self.adapters.get(self.default_adapter, self.default_adapter)
+
     def process(self, data):
         if self.model is None:
             logger.error(f"LoRA model '{self.model_name}' is not loaded.")
             return None
         try:
+            import torch
+            from PIL import Image
             # Convert data to PIL image
-            img_array = np.frombuffer(data, dtype=np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-            input_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            frame = as_frame(data)
+            input_image = Image.fromarray(frame.to_rgb())
 
-            # Perform inference with the LoRA model
-            with torch.no_grad():
+            # Perform inference with the requested adapter applied to the shared base
+            with self.adapter_cache.lock, torch.no_grad():
+                self.adapter_cache.activate(self.model, self.resolve_adapter(frame))
                 output = self.model(
                     prompt=self.params.get('prompt', ''),
                     image=input_image
                 ).images[0]
 
-            # Convert back to bytes
-            output_img = cv2.cvtColor(np.array(output), cv2.COLOR_RGB2BGR)
-            _, buffer = cv2.imencode('.jpg', output_img)
-            return buffer.tobytes()
+            # Keep the result decoded; encoding happens at the playback edge
+            return frame.with_data(np.array(output), colorspace="rgb24")
         except Exception as e:
             logger.exception(f"Error during LoRA model inference in step '{self.name}': {e}")
             return None
 
+    def process_batch(self, items):
+        if self.model is None:
+            logger.error(f"LoRA model '{self.model_name}' is not loaded.")
+            return [None] * len(items)
+        try:
+            frames = [as_frame(item) for item in items]
+            # Adapters are global state on the base, so each batch runs under one adapter
+            groups = OrderedDict()
+            for index, frame in enumerate(frames):
+                groups.setdefault(self.resolve_adapter(frame), []).append(index)
+            results = [None] * len(frames)
+            for adapter, indices in groups.items():
+                with self.adapter_cache.lock:
+                    self.adapter_cache.activate(self.model, adapter)
+                    outputs = run_image_batch(self.model, [frames[i] for i in indices],
+                                              self.params.get('prompt', ''))
+                for i, output in zip(indices, outputs):
+                    results[i] = output
+            return results
+        except Exception as e:
+            logger.exception(f"Error during batched LoRA model inference in step '{self.name}': {e}")
+            return [None] * len(items)
+
 # Update StepFactory to recognize custom models
 from src.core.steps.base_step import StepFactory
 
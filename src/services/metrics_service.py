@@ -0,0 +1,27 @@
+# src/services/metrics_service.py
+
+import logging
+from aiohttp import web
+from ray import serve
+from src.core.metrics_aggregator import get_metrics_aggregator
+
+logger = logging.getLogger("MetricsService")
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@serve.deployment(route_prefix="/metrics")
+@serve.ingress(web.Application)
+class MetricsService:
+    def __init__(self):
+        self.aggregator = get_metrics_aggregator()
+
+    @web.get("/")
+    async def get_handler(self, request):
+        try:
+            text = await self.aggregator.render.remote()
+            return web.Response(body=text.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+        except Exception as e:
+            logger.exception(f"Error rendering metrics: {e}")
+            return web.Response(text="Internal server error.", status=500)
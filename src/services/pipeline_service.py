@@ -3,6 +3,7 @@
 import logging
 from aiohttp import web
 from ray import serve
+from src.core.streaming import stream_inference
 
 logger = logging.getLogger("PipelineService")
 
@@ -29,3 +30,16 @@ class PipelineService:
         except Exception as e:
             logger.exception(f"Error in pipeline service: {e}")
             return web.Response(text="Internal server error.", status=500)
+
+    @web.get("/")
+    async def get_handler(self, request):
+        try:
+            return await self.engine.handle_request.remote(request)
+        except Exception as e:
+            logger.exception(f"Error in pipeline service: {e}")
+            return web.Response(text="Internal server error.", status=500)
+
+    @web.post("/stream")
+    async def stream_handler(self, request):
+        """Streaming inference over one chunked HTTP request; see stream_inference for the protocol."""
+        return await stream_inference(request, self.engine)
@@ -2,28 +2,36 @@
 
 import asyncio
 import logging
+import time
 import av
 import ray
 from ray import serve
 from aiohttp import web
-from src.core.utils import FrameBuffer
-import io
+from src.core.frame import Frame
+from src.core.transport import publish_frame
+from src.core.metrics import registry, start_reporting
 
 logger = logging.getLogger("RTMPIngestServer")
 
+# Labelled by source only: session ids are unbounded, per-session counts are in the buffer stats
+ingest_frames = registry.counter('ingest_frames_total', 'Frames received from publishers, per ingest source.')
+
 
 @serve.deployment(route_prefix="/rtmp_ingest")
 @serve.ingress(web.Application)
 class RTMPIngestServer:
-    def __init__(self, input_buffer, output_buffer):
-        self.input_buffer = input_buffer
-        self.output_buffer = output_buffer
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+        start_reporting(f"rtmp:{serve.get_replica_context().replica_tag}")
 
     @web.post("/")
     async def ingest(self, request):
         try:
             params = await request.json()
             stream_url = params.get("stream_url")
+            # Per-stream step overrides, e.g. {"adapter": "watercolor"}
+            frame_params = params.get("params") or {}
+            session_id = params.get("session_id")
             if not stream_url:
                 logger.error("No stream URL provided.")
                 return web.Response(text="No stream URL provided.", status=400)
@@ -31,22 +39,28 @@ class RTMPIngestServer:
             logger.error(f"Invalid request data: {e}")
             return web.Response(text="Invalid request data.", status=400)
 
-        asyncio.create_task(self._process_stream(stream_url))
-        return web.Response(text="RTMP stream ingestion started.")
+        session = await self.session_manager.open_session.remote(session_id, frame_params)
+        asyncio.create_task(self._process_stream(stream_url, session, frame_params))
+        return web.json_response({"message": "RTMP stream ingestion started.", "session_id": session["session_id"]})
 
-    async def _process_stream(self, stream_url):
+    async def _process_stream(self, stream_url, session, frame_params=None):
+        input_buffer, output_buffer = session["input_buffer"], session["output_buffer"]
         try:
             container = av.open(stream_url)
-            for frame in container.decode(video=0):
-                img = frame.to_image()
-                img_byte_arr = io.BytesIO()
-                img.save(img_byte_arr, format='JPEG')
-                frame_bytes = img_byte_arr.getvalue()
+            for sequence, frame in enumerate(container.decode(video=0)):
+                img = frame.to_ndarray(format="bgr24")
+                pipeline_frame = Frame(
+                    img, colorspace="bgr24", pts=frame.pts, time_base=frame.time_base, params=frame_params,
+                    sequence=sequence, ingest_time=time.time(), stream_id=session["session_id"]
+                )
+                ingest_frames.inc(source="rtmp")
 
-                pipeline_available = await self.input_buffer.pipeline_available.remote()
+                pipeline_available = await input_buffer.pipeline_available.remote()
                 if pipeline_available:
-                    await self.input_buffer.add_frame.remote(frame_bytes)
+                    await publish_frame(input_buffer, pipeline_frame)
                 else:
-                    await self.output_buffer.add_frame.remote(frame_bytes)
+                    await publish_frame(output_buffer, pipeline_frame)
         except Exception as e:
             logger.exception(f"Error processing RTMP stream '{stream_url}': {e}")
+        finally:
+            await self.session_manager.close_session.remote(session["session_id"])
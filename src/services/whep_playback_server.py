@@ -6,8 +6,10 @@ from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
 from aiortc.mediastreams import VideoFrame
 from ray import serve
-import cv2
-import numpy as np
+from ray.exceptions import RayActorError
+from src.core.frame import as_frame
+from src.core.transport import resolve_frame
+from src.core.reorder import ReorderBuffer
 
 logger = logging.getLogger("WHEPPlaybackServer")
 
@@ -15,15 +17,17 @@ logger = logging.getLogger("WHEPPlaybackServer")
 @serve.deployment(route_prefix="/whep_playback")
 @serve.ingress(web.Application)
 class WHEPPlaybackServer:
-    def __init__(self, output_buffer):
+    def __init__(self, session_manager):
         self.pcs = set()
-        self.output_buffer = output_buffer
+        self.session_manager = session_manager
 
     @web.post("/")
     async def playback(self, request):
         try:
             params = await request.json()
             offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
+            # Without a session id the viewer follows the newest session
+            session_id = params.get("session_id")
         except Exception as e:
             logger.error(f"Invalid request data: {e}")
             return web.Response(text="Invalid request data.", status=400)
@@ -43,7 +47,7 @@ class WHEPPlaybackServer:
                 logger.exception(f"Error in ICE connection state change handler: {e}")
 
         # Add the output video track
-        local_video = ProcessedVideoTrack(self.output_buffer)
+        local_video = ProcessedVideoTrack(self.session_manager, session_id)
         pc.addTrack(local_video)
 
         try:
@@ -64,27 +68,58 @@ class WHEPPlaybackServer:
 
 
 class ProcessedVideoTrack(VideoStreamTrack):
-    def __init__(self, output_buffer):
+    def __init__(self, session_manager, session_id=None, reorder_window=8, gap_timeout=0.1):
         super().__init__()
-        self.output_buffer = output_buffer
+        self.session_manager = session_manager
+        self.session_id = session_id
+        self.output_buffer = None
+        # Position in the session's broadcast output buffer; other viewers keep their own
+        self.cursor = None
+        # Parallel processing can finish frames out of order
+        self.reorder = ReorderBuffer(max_size=reorder_window, gap_timeout=gap_timeout)
+
+    async def _resolve_output_buffer(self):
+        # The viewer may connect before the publisher, so the session is looked up lazily
+        while self.output_buffer is None:
+            session = await self.session_manager.get_session.remote(self.session_id)
+            if session is not None:
+                self.output_buffer = session["output_buffer"]
+                self.cursor = None
+                self.reorder = ReorderBuffer(self.reorder.max_size, self.reorder.gap_timeout)
+                logger.info(f"Playing back session '{session['session_id']}'.")
+            else:
+                await asyncio.sleep(0.5)
+        return self.output_buffer
 
     async def recv(self):
         while True:
             try:
-                # Get processed frame from output buffer
-                frame_bytes = await self.output_buffer.get_frame.remote()
-                if frame_bytes is not None:
-                    # Convert bytes to image
-                    img_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-                    img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-                    # Create VideoFrame
-                    new_frame = VideoFrame.from_ndarray(img, format="bgr24")
-                    new_frame.pts = None
-                    new_frame.time_base = None
-                    return new_frame
-                else:
-                    # If no frame is available, wait briefly
-                    await asyncio.sleep(0.01)
+                output_buffer = await self._resolve_output_buffer()
+                item = self.reorder.pop()
+                if item is not None:
+                    # Frames arrive decoded; bytes are still accepted
+                    frame = as_frame(await resolve_frame(item))
+                    return await self._to_video_frame(frame)
+                # Wait in the buffer for more frames, but no longer than the pending gap may stay open
+                wait = self.reorder.wait_time()
+                self.cursor, items = await output_buffer.read_frames.remote(
+                    self.cursor, self.reorder.max_size, timeout=1.0 if wait is None else wait
+                )
+                for item in items:
+                    self.reorder.push(item)
+            except RayActorError:
+                # The session was closed; wait for it (or a newer one) to reappear
+                self.output_buffer = None
             except Exception as e:
                 logger.exception(f"Error in ProcessedVideoTrack recv: {e}")
                 await asyncio.sleep(0.01)
+
+    async def _to_video_frame(self, frame):
+        new_frame = VideoFrame.from_ndarray(frame.to_bgr(), format="bgr24")
+        if frame.pts is not None and frame.time_base is not None:
+            # Source timing is kept, so playback follows the publisher's clock
+            new_frame.pts = frame.pts
+            new_frame.time_base = frame.time_base
+        else:
+            new_frame.pts, new_frame.time_base = await self.next_timestamp()
+        return new_frame
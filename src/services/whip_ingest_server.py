@@ -2,34 +2,45 @@
 
 import asyncio
 import logging
+import time
 from aiohttp import web
 from aiortc import RTCPeerConnection, RTCSessionDescription
 from aiortc.contrib.media import MediaRelay
 from ray import serve
-from src.core.utils import FrameBuffer
-import cv2
+from src.core.frame import Frame
+from src.core.transport import publish_frame
+from src.core.metrics import registry, start_reporting
 
 relay = MediaRelay()
 logger = logging.getLogger("WHIPIngestServer")
 
+# Labelled by source only: session ids are unbounded, per-session counts are in the buffer stats
+ingest_frames = registry.counter('ingest_frames_total', 'Frames received from publishers, per ingest source.')
+
 
 @serve.deployment(route_prefix="/whip_ingest")
 @serve.ingress(web.Application)
 class WHIPIngestServer:
-    def __init__(self, input_buffer, output_buffer):
+    def __init__(self, session_manager):
         self.pcs = set()
-        self.input_buffer = input_buffer
-        self.output_buffer = output_buffer
+        self.session_manager = session_manager
+        start_reporting(f"whip:{serve.get_replica_context().replica_tag}")
 
     @web.post("/")
     async def ingest(self, request):
         try:
             params = await request.json()
             offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
+            # Per-stream step overrides, e.g. {"adapter": "watercolor"}
+            frame_params = params.get("params") or {}
+            # Each publisher gets its own buffers; reusing an id resumes that session
+            session_id = params.get("session_id")
         except Exception as e:
             logger.error(f"Invalid request data: {e}")
             return web.Response(text="Invalid request data.", status=400)
 
+        session = await self.session_manager.open_session.remote(session_id, frame_params)
+        session_id = session["session_id"]
         pc = RTCPeerConnection()
         self.pcs.add(pc)
 
@@ -38,9 +49,10 @@ class WHIPIngestServer:
             try:
                 state = pc.iceConnectionState
                 logger.info(f"ICE connection state is {state}")
-                if state == "failed":
+                if state in ("failed", "closed"):
                     await pc.close()
                     self.pcs.discard(pc)
+                    await self.session_manager.close_session.remote(session_id)
             except Exception as e:
                 logger.exception(f"Error in ICE connection state change handler: {e}")
 
@@ -48,7 +60,10 @@ class WHIPIngestServer:
         def on_track(track):
             logger.info(f"Track {track.kind} received")
             if track.kind == "video":
-                local_video = VideoFrameHandlerTrack(relay.subscribe(track), self.input_buffer, self.output_buffer)
+                local_video = VideoFrameHandlerTrack(
+                    relay.subscribe(track), session["input_buffer"], session["output_buffer"], frame_params,
+                    session_id
+                )
                 pc.addTrack(local_video)
 
         try:
@@ -59,7 +74,7 @@ class WHIPIngestServer:
             return web.Response(text="Error during WebRTC handshake.", status=500)
 
         return web.json_response(
-            {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}
+            {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type, "session_id": session_id}
         )
 
     async def on_shutdown(self):
@@ -69,26 +84,33 @@ class WHIPIngestServer:
 
 
 class VideoFrameHandlerTrack:
-    def __init__(self, track, input_buffer, output_buffer):
+    def __init__(self, track, input_buffer, output_buffer, frame_params=None, session_id=None):
         self.track = track
+        self.session_id = session_id
         self.input_buffer = input_buffer
         self.output_buffer = output_buffer
+        self.frame_params = frame_params or {}
+        self.sequence = 0
 
     async def recv(self):
         try:
             frame = await self.track.recv()
-            # Encode frame to bytes
+            # Keep the frame decoded for the pipeline
             img = frame.to_ndarray(format="bgr24")
-            _, buffer = cv2.imencode('.jpg', img)
-            frame_bytes = buffer.tobytes()
+            pipeline_frame = Frame(
+                img, colorspace="bgr24", pts=frame.pts, time_base=frame.time_base, params=self.frame_params,
+                sequence=self.sequence, ingest_time=time.time(), stream_id=self.session_id
+            )
+            self.sequence += 1
+            ingest_frames.inc(source="whip")
 
             # If pipeline is available, add frame to input buffer
             pipeline_available = await self.input_buffer.pipeline_available.remote()
             if pipeline_available:
-                await self.input_buffer.add_frame.remote(frame_bytes)
+                await publish_frame(self.input_buffer, pipeline_frame)
             else:
                 # Pass-through: directly add to output buffer
-                await self.output_buffer.add_frame.remote(frame_bytes)
+                await publish_frame(self.output_buffer, pipeline_frame)
 
             return frame
         except Exception as e:
@@ -0,0 +1,50 @@
+# tests/test_autoscaling.py
+
+import unittest
+from unittest import mock
+from src.core import autoscaling
+from src.core.autoscaling import EngineAutoscaler, ScalingPolicy
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestAutoscaling")
+
+
+class TestScalingPolicy(unittest.TestCase):
+    def test_scales_with_queue_depth_after_delay(self):
+        policy = ScalingPolicy(max_replicas=4, target_queue_depth=8, upscale_delay_s=10)
+        self.assertEqual(policy.decide(1, queue_depth=30, now=0), 1)
+        self.assertEqual(policy.decide(1, queue_depth=30, now=5), 1)
+        self.assertEqual(policy.decide(1, queue_depth=30, now=10), 4)
+
+    def test_bursts_do_not_scale(self):
+        policy = ScalingPolicy(target_queue_depth=8, upscale_delay_s=10)
+        policy.decide(1, queue_depth=30, now=0)
+        self.assertEqual(policy.decide(1, queue_depth=2, now=5), 1)
+        self.assertEqual(policy.decide(1, queue_depth=30, now=12), 1)
+
+    def test_slow_steps_add_a_replica(self):
+        policy = ScalingPolicy(target_queue_depth=8, target_p95_ms=200)
+        self.assertEqual(policy.target(2, queue_depth=0, p95_ms=350), 3)
+        # Comfortable latency with empty queues allows scaling in
+        self.assertEqual(policy.target(2, queue_depth=0, p95_ms=50), 1)
+        self.assertEqual(policy.target(2, queue_depth=0, p95_ms=150), 2)
+
+    def test_bounds(self):
+        policy = ScalingPolicy(min_replicas=2, max_replicas=3, target_queue_depth=1)
+        self.assertEqual(policy.target(2, queue_depth=100), 3)
+        self.assertEqual(policy.target(3, queue_depth=0), 2)
+
+
+class TestRescaling(unittest.TestCase):
+    def test_rescaling_keeps_the_deployment_version(self):
+        deployment = mock.Mock(version="3")
+        autoscaler = mock.Mock(deployment_name="engine")
+        with mock.patch.object(autoscaling.serve, 'get_deployment', return_value=deployment, create=True):
+            EngineAutoscaler.__ray_metadata__.modified_class._scale(autoscaler, 4)
+        deployment.options.assert_called_once_with(num_replicas=4, version="3")
+        deployment.options.return_value.deploy.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# tests/test_batching.py
+
+import asyncio
+import unittest
+from src.core.batching import MicroBatcher
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestBatching")
+
+
+class TestMicroBatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesces_concurrent_submissions(self):
+        seen_batches = []
+
+        def double(items):
+            seen_batches.append(list(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*[batcher.submit(i) for i in range(8)])
+
+        self.assertEqual(results, [i * 2 for i in range(8)])
+        self.assertEqual(seen_batches, [[0, 1, 2, 3], [4, 5, 6, 7]])
+        self.assertEqual(batcher.stats()['mean_batch_size'], 4.0)
+
+    async def test_deadline_flushes_partial_batch(self):
+        async def identity(items):
+            return items
+
+        batcher = MicroBatcher(identity, max_batch_size=16, max_wait_ms=5)
+        result = await asyncio.wait_for(batcher.submit('frame'), timeout=1.0)
+        self.assertEqual(result, 'frame')
+        self.assertEqual(batcher.stats()['batches'], 1)
+
+    async def test_errors_reach_every_caller(self):
+        def broken(items):
+            return items[:-1]
+
+        batcher = MicroBatcher(broken, max_batch_size=2, max_wait_ms=20)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    async def test_cancelled_submissions_are_dropped(self):
+        seen_batches = []
+
+        def identity(items):
+            seen_batches.append(list(items))
+            return items
+
+        batcher = MicroBatcher(identity, max_batch_size=4, max_wait_ms=50)
+        tasks = [asyncio.create_task(batcher.submit(i)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        tasks[1].cancel()
+        self.assertEqual(await tasks[0], 0)
+        self.assertEqual(await tasks[2], 2)
+        self.assertEqual(seen_batches, [[0, 2]])
+        self.assertEqual(batcher.stats()['items'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
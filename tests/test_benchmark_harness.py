@@ -0,0 +1,68 @@
+# tests/test_benchmark_harness.py
+
+import argparse
+import asyncio
+import os
+import tempfile
+import unittest
+import yaml
+from benchmarks.harness import compare, measure, percentile
+from benchmarks.run import bench_pipelines, load_plugins
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestBenchmarkHarness")
+
+
+def result(p95_ms, throughput):
+    return {'p50_ms': p95_ms, 'p95_ms': p95_ms, 'p99_ms': p95_ms, 'throughput_per_s': throughput, 'iterations': 10}
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_percentile_interpolates(self):
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 50), 3)
+        self.assertAlmostEqual(percentile([0, 10], 95), 9.5)
+
+    def test_measure_reports_percentiles(self):
+        summary = measure(lambda item: item * 2, list(range(20)))
+        self.assertEqual(summary['iterations'], 20)
+        self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+
+    def test_compare_flags_regressions_beyond_threshold(self):
+        baseline = {'results': {'a': result(10.0, 100.0), 'b': result(10.0, 100.0), 'c': {'error': 'x'}}}
+        current = {'results': {'a': result(10.5, 95.0), 'b': result(12.0, 80.0), 'c': result(1.0, 1.0)}}
+        regressions = compare(baseline, current, threshold=0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(line.startswith('b:') for line in regressions))
+
+    def test_compare_reports_failed_and_missing_benchmarks(self):
+        baseline = {'results': {'a': result(10.0, 100.0), 'b': result(10.0, 100.0), 'c': {'error': 'x'}}}
+        current = {'results': {'a': {'error': 'CUDA out of memory'}, 'c': {'error': 'x'}, 'd': result(1.0, 1.0)}}
+        self.assertEqual(compare(baseline, current), ['a: failed: CUDA out of memory',
+                                                      'b: missing from the current run'])
+
+
+
+class TestPipelineBenchmarks(unittest.TestCase):
+    def test_pipelines_without_output_are_reported_as_failed(self):
+        configs = {
+            'broken': {'steps': [{'name': 'missing', 'type': 'function', 'function': 'no_such_function'}]},
+            'video': {'steps': [
+                {'name': 'extract', 'type': 'function', 'function': 'video_frame_extraction'},
+                {'name': 'assemble', 'type': 'function', 'function': 'video_frame_assembly'},
+            ]},
+        }
+        args = argparse.Namespace(iterations=4, clip_frames=2, concurrency=2, model_params={})
+        with tempfile.TemporaryDirectory() as directory:
+            for name, config in configs.items():
+                with open(os.path.join(directory, f'{name}.yaml'), 'w') as f:
+                    yaml.safe_dump(config, f)
+            args.configs = directory
+            load_plugins()
+            results = asyncio.run(bench_pipelines(args, (64, 48)))
+        self.assertEqual(results['pipeline_broken'], {'error': 'The pipeline returned no result.'})
+        self.assertNotIn('error', results['pipeline_video'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+# tests/test_executor.py
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from src.core.batching import MicroBatcher
+from src.core.executor import StagedExecutor, run_steps
+from src.core.mapping import ItemFailed, is_fan_out, iterate
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestExecutor")
+
+
+class SleepStep:
+    def __init__(self, name, tracker, delay=0.02):
+        self.name = name
+        self.batcher = None
+        self.config = None
+        self.collects = False
+        self.tracker = tracker
+        self.delay = delay
+
+    async def process(self, data):
+        self.tracker['active'] += 1
+        self.tracker['peak'] = max(self.tracker['peak'], self.tracker['active'])
+        await asyncio.sleep(self.delay)
+        self.tracker['active'] -= 1
+        return f"{data}>{self.name}"
+
+
+class TestStagedExecutor(unittest.IsolatedAsyncioTestCase):
+    async def test_stages_overlap_and_keep_order(self):
+        tracker = {'active': 0, 'peak': 0}
+        steps = [SleepStep(name, tracker) for name in ('resize', 'model', 'enhance')]
+        results = []
+
+        async def on_result(result):
+            results.append(result)
+
+        executor = StagedExecutor(steps, on_result, queue_depth=2)
+        for i in range(6):
+            await executor.submit(str(i))
+        await executor.stop()
+
+        self.assertEqual([r.split('>')[0] for r in results], [str(i) for i in range(6)])
+        self.assertEqual(results[0], '0>resize>model>enhance')
+        # More than one step was busy at the same time
+        self.assertGreater(tracker['peak'], 1)
+        self.assertEqual(executor.stats()['processed'], {'resize': 6, 'model': 6, 'enhance': 6})
+
+    async def test_batched_stage_submits_full_batches(self):
+        tracker = {'active': 0, 'peak': 0}
+
+        async def model_batch(items):
+            await asyncio.sleep(0.03)
+            return [f"{item}>model" for item in items]
+
+        model = SleepStep('model', tracker)
+        model.batcher = MicroBatcher(model_batch, max_batch_size=4, max_wait_ms=5)
+        steps = [SleepStep('resize', tracker, delay=0.002), model]
+        results = []
+
+        async def on_result(result):
+            results.append(result)
+
+        executor = StagedExecutor(steps, on_result, queue_depth=2)
+        for i in range(16):
+            await executor.submit(str(i))
+        await executor.stop()
+
+        self.assertEqual(results, [f"{i}>resize>model" for i in range(16)])
+        self.assertGreater(model.batcher.stats()['mean_batch_size'], 1)
+
+    async def test_dropped_frames_reach_on_drop(self):
+        class DropOdd:
+            name, batcher, config, collects = 'drop_odd', None, None, False
+
+            async def process(self, data):
+                return None if data % 2 else data
+
+        results, dropped = [], []
+
+        async def on_result(result):
+            results.append(result)
+
+        async def on_drop(data):
+            dropped.append(data)
+
+        executor = StagedExecutor([DropOdd()], on_result, on_drop=on_drop)
+        for i in range(5):
+            await executor.submit(i)
+        await executor.stop()
+        self.assertEqual((results, dropped), ([0, 2, 4], [1, 3]))
+
+    async def test_run_steps_sequential(self):
+        tracker = {'active': 0, 'peak': 0}
+        steps = [SleepStep(name, tracker, delay=0) for name in ('a', 'b')]
+        self.assertEqual(await run_steps(steps, 'in'), 'in>a>b')
+
+
+class FunctionLikeStep:
+    def __init__(self, name, fn, collects=False, config=None):
+        self.name = name
+        self.fn = fn
+        self.batcher = None
+        self.collects = collects
+        self.config = config
+
+    def process(self, data):
+        return self.fn(data)
+
+
+class TestFanOut(unittest.IsolatedAsyncioTestCase):
+    async def test_map_then_collect_in_order(self):
+        tracker = {'active': 0, 'peak': 0}
+        source = FunctionLikeStep('extract', lambda n: (i for i in range(n)), config={'max_parallelism': 3})
+
+        class Square(SleepStep):
+            async def process(self, data):
+                await asyncio.sleep(0.01 * (5 - data % 5))
+                return data * data
+
+        collector = FunctionLikeStep('assemble', lambda items: list(items), collects=True)
+        result = await run_steps([source, Square('square', tracker), collector], 10)
+        self.assertEqual(result, [i * i for i in range(10)])
+
+    async def test_fan_out_without_collector_returns_list(self):
+        tracker = {'active': 0, 'peak': 0}
+        source = FunctionLikeStep('split', lambda data: [data, data])
+        result = await run_steps([source, SleepStep('tag', tracker, delay=0)], 'x')
+        self.assertEqual(result, ['x>tag', 'x>tag'])
+
+    async def test_collector_directly_after_fan_out(self):
+        source = FunctionLikeStep('extract', lambda n: (i for i in range(n)))
+        collector = FunctionLikeStep('total', sum, collects=True)
+        self.assertEqual(await run_steps([source, collector], 5), 10)
+
+    async def test_item_without_result_fails_the_run(self):
+        source = FunctionLikeStep('extract', lambda n: (i for i in range(n)))
+        flaky = FunctionLikeStep('enhance', lambda data: None if data == 3 else data)
+        with self.assertRaises(ItemFailed):
+            await run_steps([source, flaky], 6)
+
+        def encode(items):
+            for item in items:
+                yield item
+
+        # The collector sees the failure instead of a shortened input, eagerly or lazily
+        eager = FunctionLikeStep('assemble', lambda items: list(items), collects=True)
+        self.assertIsNone(await run_steps([source, flaky, eager], 6))
+        with self.assertRaises(ItemFailed):
+            await consume(run_steps([source, flaky, FunctionLikeStep('assemble', encode, collects=True)], 6))
+
+    async def test_live_streams_drop_items_without_result(self):
+        source = FunctionLikeStep('extract', lambda n: (i for i in range(n)))
+        flaky = FunctionLikeStep('enhance', lambda data: None if data == 3 else data)
+        self.assertEqual(await run_steps([source, flaky], 6, drop_failed=True), [0, 1, 2, 4, 5])
+
+    async def test_failing_source_fails_the_collector(self):
+        def frames(n):
+            yield 0
+            raise ValueError("Truncated input.")
+
+        def encode(items):
+            for item in items:
+                yield item
+
+        steps = [FunctionLikeStep('extract', frames),
+                 FunctionLikeStep('enhance', lambda data: data),
+                 FunctionLikeStep('assemble', encode, collects=True)]
+        with self.assertRaises(ValueError):
+            await consume(run_steps(steps, 2))
+
+    async def test_concurrent_collecting_runs_do_not_exhaust_the_executor(self):
+        # More concurrent videos than default executor threads once deadlocked the replica
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=4))
+
+        def enhance(data):
+            time.sleep(0.001)
+            return data + 1
+
+        def encode(items):
+            # Lazy like video_frame_assembly: reads its input while the output is consumed
+            for item in items:
+                yield item
+
+        for collect in (lambda items: list(items), encode):
+            steps = [FunctionLikeStep('extract', lambda n: (i for i in range(n))),
+                     FunctionLikeStep('enhance', enhance),
+                     FunctionLikeStep('assemble', collect, collects=True)]
+            runs = [consume(run_steps(steps, 20)) for _ in range(12)]
+            results = await asyncio.wait_for(asyncio.gather(*runs), 10)
+            self.assertEqual(results, [list(range(1, 21))] * 12)
+
+    async def test_cancelled_collector_stops_feeder_and_source(self):
+        source_closed = threading.Event()
+        collector_done = threading.Event()
+
+        def frames(n):
+            try:
+                for i in range(n):
+                    yield i
+            finally:
+                source_closed.set()
+
+        def encode(items):
+            try:
+                for item in items:
+                    time.sleep(0.01)
+                    yield item
+            finally:
+                collector_done.set()
+
+        for collect in (lambda items: list(encode(items)), encode):
+            source_closed.clear()
+            collector_done.clear()
+            steps = [FunctionLikeStep('extract', frames),
+                     FunctionLikeStep('enhance', lambda data: data),
+                     FunctionLikeStep('assemble', collect, collects=True)]
+            tasks_before = asyncio.all_tasks()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(consume(run_steps(steps, 10 ** 6)), 0.1)
+            for _ in range(100):
+                if source_closed.is_set() and collector_done.is_set():
+                    break
+                await asyncio.sleep(0.01)
+            self.assertTrue(source_closed.is_set())
+            self.assertTrue(collector_done.is_set())
+            self.assertEqual(asyncio.all_tasks() - tasks_before, set())
+
+
+async def consume(run):
+    """Awaits a run and reads lazy output to the end, as the Engine does."""
+    result = await run
+    if is_fan_out(result):
+        result = [item async for item in iterate(result)]
+    return result
+
+
+if __name__ == '__main__':
+    unittest.main()
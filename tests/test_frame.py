@@ -0,0 +1,54 @@
+# tests/test_frame.py
+
+import unittest
+import numpy as np
+from src.core.frame import Frame, as_frame, bytes_adapter, frame_function
+from src.core.utils import resize_image, enhance_image
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestFrame")
+
+
+class TestFrame(unittest.TestCase):
+    def setUp(self):
+        img = np.zeros((48, 64, 3), dtype=np.uint8)
+        img[:, :, 2] = 200
+        self.frame = Frame(img, pts=3000, time_base=None, sequence=7)
+
+    def test_bytes_round_trip(self):
+        data = self.frame.to_bytes()
+        frame = as_frame(data)
+        self.assertEqual(frame.shape, (48, 64, 3))
+        self.assertEqual(frame.colorspace, "bgr24")
+
+    def test_functions_keep_metadata(self):
+        resized = resize_image(self.frame, size=[32, 16])
+        enhanced = enhance_image(resized, factor=1.1)
+        self.assertEqual(enhanced.shape, (16, 32, 3))
+        self.assertEqual(enhanced.pts, 3000)
+        self.assertEqual(enhanced.sequence, 7)
+        # Red channel survives the RGB/BGR handling
+        self.assertGreater(enhanced.to_bgr()[0, 0, 2], 150)
+
+    def test_bytes_adapter(self):
+        def legacy_identity(data):
+            self.assertIsInstance(data, bytes)
+            return data
+
+        adapted = bytes_adapter(legacy_identity)
+        result = adapted(self.frame)
+        self.assertIsInstance(result, Frame)
+        self.assertEqual(result.sequence, 7)
+        self.assertTrue(getattr(adapted, 'accepts_frames', False))
+
+    def test_frame_function_marker(self):
+        @frame_function
+        def passthrough(data):
+            return data
+
+        self.assertTrue(passthrough.accepts_frames)
+
+
+if __name__ == '__main__':
+    unittest.main()
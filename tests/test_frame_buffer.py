@@ -0,0 +1,174 @@
+# tests/test_frame_buffer.py
+
+import asyncio
+import time
+import unittest
+from src.core.transport import Tombstone
+from src.core.utils import FrameBuffer
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestFrameBuffer")
+
+# The actor's class, so its logic runs without Ray
+Buffer = FrameBuffer.__ray_metadata__.modified_class
+
+
+class Item:
+    def __init__(self, sequence, age=0.0):
+        self.sequence = sequence
+        self.ingest_time = time.time() - age
+
+
+def sequences(items):
+    return [item.sequence for item in items]
+
+
+class TestDropPolicies(unittest.IsolatedAsyncioTestCase):
+    async def test_drop_newest(self):
+        buffer = Buffer(max_length=2, drop_policy='drop_newest')
+        self.assertEqual(await buffer.add_frames([Item(i) for i in range(4)]), 2)
+        self.assertEqual(sequences(await buffer.get_frames(4)), [0, 1])
+        self.assertEqual((await buffer.stats())['drops'], {'full': 2})
+
+    async def test_drop_oldest(self):
+        buffer = Buffer(max_length=2, drop_policy='drop_oldest')
+        for i in range(4):
+            await buffer.add_frame(Item(i))
+        self.assertEqual(sequences(await buffer.get_frames(4)), [2, 3])
+        stats = await buffer.stats()
+        self.assertEqual((stats['added'], stats['drops']), (4, {'evicted': 2}))
+
+    async def test_latest_only(self):
+        buffer = Buffer(max_length=10, drop_policy='latest_only')
+        await buffer.add_frames([Item(i) for i in range(3)])
+        self.assertEqual(sequences(await buffer.get_frames(3)), [2])
+        self.assertEqual((await buffer.stats())['drops'], {'superseded': 2})
+
+    async def test_drop_by_age(self):
+        buffer = Buffer(max_length=2, drop_policy='drop_by_age', max_age_ms=100)
+        await buffer.add_frames([Item(0, age=1.0), Item(1, age=0.5), Item(2)])
+        # Full buffers evict like drop_oldest; stale frames expire on the way out
+        self.assertEqual(sequences(await buffer.get_frames(3)), [2])
+        self.assertEqual((await buffer.stats())['drops'], {'evicted': 1, 'expired': 1})
+
+    async def test_frames_without_ingest_time_do_not_expire(self):
+        buffer = Buffer(max_length=2, drop_policy='drop_by_age', max_age_ms=100)
+        await buffer.add_frame(b'chunk')
+        self.assertEqual(await buffer.get_frame(), b'chunk')
+
+    async def test_dropped_frames_leave_tombstones(self):
+        buffer = Buffer(max_length=2, drop_policy='drop_by_age', max_age_ms=100, tombstones=True)
+        await buffer.add_frames([Item(0, age=1.0), Item(1, age=0.5), Item(2), Item(3)])
+        await buffer.add_frame(Tombstone(7))
+        items = await buffer.get_frames(1)
+        self.assertEqual([(type(item).__name__, item.sequence) for item in items],
+                         [('Tombstone', 0), ('Tombstone', 1), ('Tombstone', 7), ('Item', 2)])
+        self.assertEqual(sequences(await buffer.get_frames(2)), [3])
+        # A pending tombstone alone wakes a blocked reader
+        await buffer.add_frame(Tombstone(8))
+        self.assertEqual(sequences(await buffer.get_frames(2, timeout=1.0)), [8])
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            Buffer(drop_policy='drop_random')
+        with self.assertRaises(ValueError):
+            Buffer(drop_policy='drop_by_age')
+
+
+class TestBlockingReads(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.buffer = Buffer(max_length=10)
+
+    async def add_later(self, items, delay=0.02):
+        await asyncio.sleep(delay)
+        await self.buffer.add_frames(items)
+
+    async def test_get_frame_wakes_on_add(self):
+        start = time.monotonic()
+        producer = asyncio.create_task(self.add_later([Item(0)]))
+        frame = await self.buffer.get_frame(timeout=1.0)
+        self.assertEqual(frame.sequence, 0)
+        self.assertLess(time.monotonic() - start, 0.5)
+        await producer
+
+    async def test_get_frame_without_timeout_waits(self):
+        producer = asyncio.create_task(self.add_later([Item(1)]))
+        frame = await asyncio.wait_for(self.buffer.get_frame(timeout=None), 1.0)
+        self.assertEqual(frame.sequence, 1)
+        await producer
+
+    async def test_get_frame_times_out(self):
+        start = time.monotonic()
+        self.assertIsNone(await self.buffer.get_frame(timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertIsNone(await self.buffer.get_frame())
+
+    async def test_get_frame_waits_past_tombstones(self):
+        self.buffer = Buffer(max_length=10, tombstones=True)
+        await self.buffer.add_frame(Tombstone(0))
+        start = time.monotonic()
+        self.assertIsNone(await self.buffer.get_frame(timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        producer = asyncio.create_task(self.add_later([Item(1)]))
+        frame = await asyncio.wait_for(self.buffer.get_frame(timeout=None), 1.0)
+        self.assertEqual(frame.sequence, 1)
+        await producer
+        # The tombstone still reaches get_frames()
+        self.assertEqual(sequences(await self.buffer.get_frames(8)), [0])
+
+    async def test_get_frames_returns_partial_batches(self):
+        producer = asyncio.create_task(self.add_later([Item(0), Item(1)]))
+        self.assertEqual(sequences(await self.buffer.get_frames(8, timeout=1.0)), [0, 1])
+        await producer
+        self.assertEqual(await self.buffer.get_frames(8, timeout=0.02), [])
+
+    async def test_concurrent_readers_share_frames(self):
+        readers = [asyncio.create_task(self.buffer.get_frame(timeout=1.0)) for _ in range(2)]
+        await self.add_later([Item(0), Item(1)])
+        self.assertEqual(sorted(sequences(await asyncio.gather(*readers))), [0, 1])
+
+
+class TestBroadcast(unittest.IsolatedAsyncioTestCase):
+    async def test_every_reader_sees_every_frame(self):
+        buffer = Buffer(max_length=10, broadcast=True)
+        first, second = 0, 0
+        await buffer.add_frames([Item(0), Item(1)])
+        first, items = await buffer.read_frames(first, 8)
+        self.assertEqual(sequences(items), [0, 1])
+        await buffer.add_frame(Item(2))
+        second, items = await buffer.read_frames(second, 2)
+        self.assertEqual(sequences(items), [0, 1])
+        second, items = await buffer.read_frames(second, 8)
+        self.assertEqual(sequences(items), [2])
+        first, items = await buffer.read_frames(first, 8)
+        self.assertEqual(sequences(items), [2])
+        self.assertEqual((await buffer.read_frames(first, 8)), (3, []))
+
+    async def test_new_readers_start_with_the_next_frame_and_wait_for_it(self):
+        buffer = Buffer(max_length=10, broadcast=True)
+        await buffer.add_frame(Item(0))
+        readers = [asyncio.create_task(buffer.read_frames(None, 8, timeout=1.0)) for _ in range(2)]
+        await asyncio.sleep(0.02)
+        await buffer.add_frame(Item(1))
+        for cursor, items in await asyncio.gather(*readers):
+            self.assertEqual((cursor, sequences(items)), (2, [1]))
+
+    async def test_readers_that_fall_behind_skip_ahead(self):
+        buffer = Buffer(max_length=3, drop_policy='drop_oldest', tombstones=True, broadcast=True)
+        await buffer.add_frames([Item(0), Item(1), Tombstone(2), Item(3), Item(4)])
+        cursor, items = await buffer.read_frames(0, 8)
+        # Tombstones keep their place; evicted frames leave none, as fast readers already had them
+        self.assertEqual([(type(item).__name__, item.sequence) for item in items],
+                         [('Tombstone', 2), ('Item', 3), ('Item', 4)])
+        self.assertEqual(cursor, 5)
+        stats = await buffer.stats()
+        self.assertEqual((stats['drops'], stats['lagged']), ({'evicted': 2}, 2))
+
+    def test_broadcast_cannot_drop_newest(self):
+        with self.assertRaises(ValueError):
+            Buffer(drop_policy='drop_newest', broadcast=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
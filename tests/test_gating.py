@@ -0,0 +1,69 @@
+# tests/test_gating.py
+
+import unittest
+import numpy as np
+from src.core.frame import Frame
+from src.core.gating import SimilarityGate
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestGating")
+
+
+def frame(value, stream_id='a', sequence=0, params=None):
+    return Frame(np.full((64, 64, 3), value, dtype=np.uint8), sequence=sequence, stream_id=stream_id,
+                 params=params)
+
+
+def run(gate, data):
+    """Stands in for the model: inverts the frame unless the gate skips it."""
+    reused, current = gate.check(data)
+    if reused is not None:
+        return reused, True
+    result = data.with_data(255 - data.data)
+    gate.update(data, current, result)
+    return result, False
+
+
+class TestSimilarityGate(unittest.TestCase):
+    def test_skips_near_identical_frames_and_keeps_metadata(self):
+        gate = SimilarityGate('model', threshold=0.02)
+        run(gate, frame(100, sequence=0))
+        result, skipped = run(gate, frame(101, sequence=1))
+        self.assertTrue(skipped)
+        self.assertEqual(result.sequence, 1)
+        self.assertEqual(int(result.data[0, 0, 0]), 155)
+        _, skipped = run(gate, frame(180, sequence=2))
+        self.assertFalse(skipped)
+
+    def test_max_skips_forces_refresh(self):
+        gate = SimilarityGate('model', threshold=0.02, max_skips=2)
+        outcomes = [run(gate, frame(100))[1] for _ in range(6)]
+        self.assertEqual(outcomes, [False, True, True, False, True, True])
+        self.assertAlmostEqual(gate.stats()['skip_ratio'], 4 / 6)
+
+    def test_streams_are_gated_separately(self):
+        gate = SimilarityGate('model')
+        run(gate, frame(100, stream_id='a'))
+        _, skipped = run(gate, frame(100, stream_id='b'))
+        self.assertFalse(skipped)
+
+    def test_frames_without_a_stream_are_never_skipped(self):
+        gate = SimilarityGate('model')
+        outcomes = [run(gate, frame(100, stream_id=None))[1] for _ in range(3)]
+        self.assertEqual(outcomes, [False, False, False])
+        self.assertEqual(len(gate.streams), 0)
+
+    def test_param_change_forces_refresh(self):
+        gate = SimilarityGate('model')
+        run(gate, frame(100, params={'adapter': 'anime'}))
+        _, skipped = run(gate, frame(100, params={'adapter': 'anime'}))
+        self.assertTrue(skipped)
+        _, skipped = run(gate, frame(100, params={'adapter': 'sketch'}))
+        self.assertFalse(skipped)
+        _, skipped = run(gate, frame(100, params={'adapter': 'sketch'}))
+        self.assertTrue(skipped)
+
+
+if __name__ == '__main__':
+    unittest.main()
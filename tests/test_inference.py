@@ -0,0 +1,202 @@
+# tests/test_inference.py
+
+import asyncio
+import unittest
+from collections import Counter
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from src.core.engine import Engine, encode_result
+from src.core.frame import Frame
+from sdk.wire import FRAME_MAGIC
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestInference")
+
+
+class TestEncodeResult(unittest.TestCase):
+    def test_frame_is_encoded_as_image(self):
+        frame = Frame(np.zeros((8, 8, 3), dtype=np.uint8))
+        body, content_type = encode_result(frame, 'png')
+        self.assertEqual(content_type, 'image/png')
+        self.assertTrue(body.startswith(b'\x89PNG'))
+        decoded = Frame.from_bytes(body)
+        self.assertEqual(decoded.shape, (8, 8, 3))
+
+    def test_collected_chunks_are_joined(self):
+        body, content_type = encode_result([b'ab', b'cd'])
+        self.assertEqual(body, b'abcd')
+        self.assertEqual(content_type, 'application/octet-stream')
+
+    def test_uncollected_frames_are_rejected(self):
+        frame = Frame(np.zeros((8, 8, 3), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            encode_result([frame, frame])
+
+
+class TestEngineInfer(unittest.IsolatedAsyncioTestCase):
+    def engine(self, concurrency=16, timeout=30.0, delay=0.0):
+        # Only the state infer() touches; run_inference stands in for the pipeline
+        engine = object.__new__(Engine.func_or_class)
+        engine.inference_slots = asyncio.Semaphore(concurrency)
+        engine.inference_timeout = timeout
+        engine.inference_stats = Counter()
+        engine.running = 0
+        engine.peak = 0
+
+        async def run_inference(data, params=None):
+            engine.running += 1
+            engine.peak = max(engine.peak, engine.running)
+            try:
+                await asyncio.sleep(delay)
+                return data
+            finally:
+                engine.running -= 1
+        engine.run_inference = run_inference
+        return engine
+
+    async def test_raw_result(self):
+        engine = self.engine()
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        status, body, content_type = await engine.infer(Frame(frame).to_wire(), image_format='raw')
+        self.assertEqual((status, content_type), (200, 'application/x-raw-frame'))
+        np.testing.assert_array_equal(Frame.from_wire(body).data, frame)
+        self.assertEqual(engine.inference_stats, Counter(ok=1))
+
+    async def test_bad_format_is_rejected(self):
+        engine = self.engine()
+        status, _, _ = await engine.infer(b'image', image_format='bmp')
+        self.assertEqual(status, 400)
+        status, _, _ = await engine.infer(b'image', image_format='png', compression='gzip')
+        self.assertEqual(status, 400)
+        status, _, _ = await engine.infer(FRAME_MAGIC + b'truncated', image_format='png')
+        self.assertEqual(status, 400)
+        self.assertEqual(engine.peak, 0)
+
+    async def test_waiting_for_a_slot_times_out(self):
+        engine = self.engine(concurrency=1)
+        await engine.inference_slots.acquire()
+        status, _, _ = await engine.infer(b'image', timeout_ms=20)
+        self.assertEqual(status, 503)
+        self.assertEqual(engine.inference_stats, Counter(rejected=1))
+
+    async def test_deadline(self):
+        engine = self.engine(delay=1.0)
+        status, _, _ = await engine.infer(b'image', timeout_ms=20)
+        self.assertEqual(status, 504)
+        self.assertEqual(engine.inference_stats, Counter(timeout=1))
+        # The slot is released again
+        self.assertFalse(engine.inference_slots.locked())
+
+    async def test_concurrency_cap(self):
+        engine = self.engine(concurrency=2, delay=0.02)
+        frame = Frame(np.zeros((4, 4, 3), dtype=np.uint8)).to_wire()
+        results = await asyncio.gather(*(engine.infer(frame, image_format='raw') for _ in range(6)))
+        self.assertEqual([status for status, _, _ in results], [200] * 6)
+        self.assertEqual(engine.peak, 2)
+
+
+class RecordingStep:
+    def __init__(self, name, process):
+        self.name = name
+        self.process = process
+        self.batcher = None
+        self.config = None
+        self.collects = False
+
+
+class FakePipeline:
+    def __init__(self, steps):
+        self.steps = steps
+        self.held = 0
+
+    @contextmanager
+    def acquire(self):
+        self.held += 1
+        try:
+            yield self.steps
+        finally:
+            self.held -= 1
+
+    def get_execution_config(self):
+        return {}
+
+
+class TestRequestParams(unittest.IsolatedAsyncioTestCase):
+    def engine(self, steps):
+        engine = object.__new__(Engine.func_or_class)
+        engine.inference_slots = asyncio.Semaphore(4)
+        engine.inference_timeout = 30.0
+        engine.inference_stats = Counter()
+        engine.pipeline = FakePipeline(steps)
+        return engine
+
+    async def test_adapter_reaches_every_step(self):
+        seen = []
+
+        def record(frame):
+            seen.append(frame.params)
+            return frame
+
+        engine = self.engine([RecordingStep('first', record), RecordingStep('second', record)])
+        _, png = cv2.imencode('.png', np.zeros((4, 4, 3), dtype=np.uint8))
+        status, _, _ = await engine.infer(png.tobytes(), image_format='raw', params={'adapter': 'watercolor'})
+        self.assertEqual(status, 200)
+        self.assertEqual(seen, [{'adapter': 'watercolor'}] * 2)
+
+    async def test_request_params_override_frame_params(self):
+        seen = []
+
+        def tag(frame):
+            frame = frame.with_data(frame.data)
+            frame.params = {'adapter': 'sketch', 'strength': 0.5}
+            return frame
+
+        engine = self.engine([RecordingStep('tag', tag),
+                              RecordingStep('model', lambda frame: seen.append(frame.params) or frame)])
+        frame = Frame(np.zeros((4, 4, 3), dtype=np.uint8))
+        await engine.infer(frame.to_wire(), image_format='raw', params={'adapter': 'watercolor'})
+        self.assertEqual(seen, [{'adapter': 'watercolor', 'strength': 0.5}])
+
+    async def test_frames_of_a_fan_out_get_the_params(self):
+        seen = []
+
+        def extract(video):
+            # Not an image, so infer() leaves the decoding to this step
+            return [Frame(np.full((4, 4, 3), i, dtype=np.uint8)) for i in range(3)]
+
+        def record(frame):
+            seen.append(frame.params.get('adapter'))
+            return frame
+
+        engine = self.engine([RecordingStep('extract', extract), RecordingStep('model', record)])
+        status, _, _ = await engine.infer(b'video', image_format='raw', params={'adapter': 'watercolor'})
+        # Uncollected frames cannot be encoded, but every one of them saw the adapter
+        self.assertEqual(status, 500)
+        self.assertEqual(seen, ['watercolor'] * 3)
+
+    async def test_without_params_frames_are_untouched(self):
+        frames = []
+        engine = self.engine([RecordingStep('first', lambda frame: frames.append(frame) or frame)])
+        frame = Frame(np.zeros((4, 4, 3), dtype=np.uint8))
+        await engine.infer(frame.to_wire(), image_format='raw')
+        self.assertEqual(frames[0].params, {})
+
+
+class TestProcessFrame(unittest.IsolatedAsyncioTestCase):
+    async def test_lazy_results_are_consumed_while_the_steps_are_held(self):
+        engine = object.__new__(Engine.func_or_class)
+        engine.latency_budget = None
+
+        def chunks(frame):
+            # A lazy output, like the chunks of a collecting step, runs the steps as it is consumed
+            return (engine.pipeline.held for _ in range(3))
+
+        engine.pipeline = FakePipeline([RecordingStep('encode', chunks)])
+        self.assertEqual(await engine.process_frame(Frame(np.zeros((4, 4, 3), dtype=np.uint8))), [1, 1, 1])
+        self.assertEqual(engine.pipeline.held, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# tests/test_latency.py
+
+import time
+import unittest
+from src.core.executor import run_steps
+from src.core.latency import LatencyBudget
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestLatency")
+
+
+class FakeStep:
+    def __init__(self, name, step_type):
+        self.name = name
+        self.config = {'type': step_type}
+
+
+class CountingStep(FakeStep):
+    def __init__(self, name, step_type):
+        super().__init__(name, step_type)
+        self.batcher = None
+        self.calls = 0
+
+    async def process(self, data):
+        self.calls += 1
+        return data
+
+
+class FakeFrame:
+    def __init__(self, age, params=None):
+        self.ingest_time = time.time() - age
+        self.params = params or {}
+        self.sequence = 0
+
+
+class TestLatencyBudget(unittest.TestCase):
+    def setUp(self):
+        self.resize = FakeStep('resize', 'function')
+        self.model = FakeStep('model', 'model')
+
+    def test_drops_frames_that_cannot_finish(self):
+        budget = LatencyBudget(budget_ms=200)
+        budget.observe(self.model, 0.150)
+        self.assertTrue(budget.admit(FakeFrame(age=0.01), [self.model]))
+        self.assertFalse(budget.admit(FakeFrame(age=0.10), [self.model]))
+        self.assertEqual(budget.stats()['drops'], {'deadline:model': 1})
+
+    def test_cheap_steps_are_not_guarded(self):
+        budget = LatencyBudget(budget_ms=10)
+        self.assertTrue(budget.admit(FakeFrame(age=5.0), [self.resize, self.model]))
+
+    def test_per_stream_budget_overrides_default(self):
+        budget = LatencyBudget(budget_ms=100)
+        frame = FakeFrame(age=0.5, params={'latency_budget_ms': 1000})
+        self.assertTrue(budget.admit(frame, [self.model]))
+
+    def test_moving_average(self):
+        budget = LatencyBudget(smoothing=0.5)
+        budget.observe(self.model, 0.1)
+        budget.observe(self.model, 0.3)
+        self.assertAlmostEqual(budget.step_latency['model'], 0.2)
+
+    def test_p95_of_slowest_step(self):
+        budget = LatencyBudget()
+        for i in range(100):
+            budget.observe(self.resize, 0.001)
+            budget.observe(self.model, i / 1000.0)
+        self.assertAlmostEqual(budget.percentile(95), 0.095)
+
+
+class TestBudgetedExecution(unittest.IsolatedAsyncioTestCase):
+    async def test_late_frames_are_dropped_before_the_model(self):
+        resize, model = CountingStep('resize', 'function'), CountingStep('model', 'model')
+        budget = LatencyBudget(budget_ms=200)
+        budget.observe(model, 0.150)
+
+        fresh = FakeFrame(age=0.01)
+        self.assertIs(await run_steps([resize, model], fresh, budget=budget), fresh)
+        self.assertIsNone(await run_steps([resize, model], FakeFrame(age=0.10), budget=budget))
+        # The cheap step still ran for the late frame; the model did not
+        self.assertEqual((resize.calls, model.calls), (2, 1))
+        self.assertEqual(budget.stats()['drops'], {'deadline:model': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
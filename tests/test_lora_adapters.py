@@ -0,0 +1,184 @@
+# tests/test_lora_adapters.py
+
+import ast
+import gc
+import importlib.util
+import os
+import threading
+import time
+import unittest
+import numpy as np
+from src.core.frame import Frame
+from src.plugins.custom_models import (LORA_PIPELINE_API, LORA_UNET_API, CustomLoRAModelStep, LoRAAdapterCache,
+                                      adapter_cache_for, adapter_caches)
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestLoRAAdapters")
+
+
+class FakeUnet:
+    def __init__(self):
+        self.processors = {'attn1.processor': 'base', 'attn2.processor': 'base'}
+
+    @property
+    def attn_processors(self):
+        return dict(self.processors)
+
+    def set_attn_processor(self, processors):
+        # Like diffusers, the dict is consumed
+        self.processors = {name: processors.pop(name) for name in list(self.processors)}
+
+
+class FakeModel:
+    """
+    The parts of a diffusers 0.18 LoRA pipeline LoRAAdapterCache uses.
+    Adapters named 'unet:...' have no text encoder layers.
+    """
+
+    def __init__(self):
+        self.unet = FakeUnet()
+        self.text_patch = None
+        self.loads = []
+
+    @property
+    def text_encoder_lora_attn_procs(self):
+        return getattr(self, '_text_encoder_lora_attn_procs', None)
+
+    def load_lora_weights(self, path):
+        self.loads.append(path)
+        self.unet.set_attn_processor({name: path for name in self.unet.processors})
+        if not path.startswith('unet:'):
+            self._text_encoder_lora_attn_procs = {'text_model': path}
+            self._modify_text_encoder(self._text_encoder_lora_attn_procs)
+
+    def _modify_text_encoder(self, processors):
+        self.text_patch = processors['text_model']
+
+    def _remove_text_encoder_monkey_patch(self):
+        self.text_patch = None
+
+    @property
+    def loaded(self):
+        (adapter,) = set(self.unet.processors.values())
+        return None if adapter == 'base' else adapter
+
+
+class TestLoRAAdapterCache(unittest.TestCase):
+    def test_switching_loads_each_adapter_once(self):
+        model, cache = FakeModel(), LoRAAdapterCache()
+        for path in ('a', 'a', 'b', 'a', 'b'):
+            cache.activate(model, path)
+            self.assertEqual((model.loaded, model.text_patch), (path, path))
+        self.assertEqual(model.loads, ['a', 'b'])
+        self.assertEqual(cache.stats()['switches'], 4)
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_adapters_without_text_encoder_layers(self):
+        model, cache = FakeModel(), LoRAAdapterCache()
+        cache.activate(model, 'a')
+        cache.activate(model, 'unet:b')
+        self.assertEqual((model.loaded, model.text_patch), ('unet:b', None))
+        cache.activate(model, 'a')
+        cache.activate(model, 'unet:b')
+        self.assertEqual((model.loaded, model.text_patch), ('unet:b', None))
+
+    def test_deactivate_restores_the_base(self):
+        model, cache = FakeModel(), LoRAAdapterCache()
+        cache.activate(model, 'a')
+        cache.activate(model, None)
+        self.assertEqual((model.loaded, model.text_patch), (None, None))
+        self.assertIsNone(cache.active)
+
+    def test_adapters_are_bounded(self):
+        model, cache = FakeModel(), LoRAAdapterCache(max_entries=2)
+        for path in ('a', 'b', 'c'):
+            cache.activate(model, path)
+        self.assertEqual(cache.stats()['cached'], ['b', 'c'])
+
+    def test_reloaded_model_gets_a_fresh_cache(self):
+        model = FakeModel()
+        cache = adapter_cache_for(model)
+        cache.activate(model, 'a')
+        self.assertIs(adapter_cache_for(model), cache)
+        del model, cache
+        gc.collect()
+        self.assertEqual(len(adapter_caches), 0)
+        reloaded = FakeModel()
+        adapter_cache_for(reloaded).activate(reloaded, 'a')
+        self.assertEqual(reloaded.loaded, 'a')
+
+
+def class_members(path, class_name):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            return {item.name for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    raise AssertionError(f"{class_name} not found in {path}")
+
+
+@unittest.skipUnless(importlib.util.find_spec('diffusers'), "diffusers is not installed")
+class TestDiffusersAPI(unittest.TestCase):
+    """Read from the installed sources, so this runs without torch."""
+
+    def setUp(self):
+        self.root = os.path.dirname(importlib.util.find_spec('diffusers').origin)
+
+    def test_lora_cache_uses_the_installed_api(self):
+        pipeline = class_members(os.path.join(self.root, 'loaders.py'), 'LoraLoaderMixin')
+        unet = class_members(os.path.join(self.root, 'models', 'unet_2d_condition.py'), 'UNet2DConditionModel')
+        self.assertLessEqual(set(LORA_PIPELINE_API), pipeline)
+        self.assertLessEqual(set(LORA_UNET_API), unet)
+
+    def test_fake_pipeline_only_has_real_methods(self):
+        pipeline = class_members(os.path.join(self.root, 'loaders.py'), 'LoraLoaderMixin')
+        unet = class_members(os.path.join(self.root, 'models', 'unet_2d_condition.py'), 'UNet2DConditionModel')
+        fake = {name for name in vars(FakeModel) if not name.startswith('__')} - {'loaded'}
+        self.assertLessEqual(fake, pipeline)
+        self.assertLessEqual({name for name in vars(FakeUnet) if not name.startswith('__')}, unet)
+
+
+class RenderingModel(FakeModel):
+    def __call__(self, prompt, image):
+        adapter = self.loaded
+        time.sleep(0.005)
+        # Another thread switching adapters mid-call would show up here
+        rendered = adapter if self.loaded == adapter else '?'
+        return Output([np.full((2, 2, 3), ord(rendered), dtype=np.uint8)])
+
+
+class Output:
+    def __init__(self, images):
+        self.images = images
+
+
+@unittest.skipUnless(importlib.util.find_spec('torch'), "torch is not installed")
+class TestLoRAStepConcurrency(unittest.TestCase):
+    def test_frames_render_with_their_own_adapter(self):
+        step = object.__new__(CustomLoRAModelStep)
+        step.name = 'lora'
+        step.params = {}
+        step.model_name = 'custom_lora_model'
+        step.adapters = {'a': 'a', 'b': 'b'}
+        step.default_adapter = 'a'
+        step.model = RenderingModel()
+        step.adapter_cache = LoRAAdapterCache()
+
+        results = {}
+
+        def run(index, adapter):
+            frame = Frame(np.zeros((2, 2, 3), dtype=np.uint8), params={'adapter': adapter})
+            results[index] = (adapter, step.process(frame))
+
+        threads = [threading.Thread(target=run, args=(i, 'ab'[i % 2])) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for adapter, output in results.values():
+            self.assertEqual(chr(output.data[0, 0, 0]), adapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+# tests/test_metrics.py
+
+import unittest
+from src.core.metrics import MetricsRegistry, merge_snapshots, render
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestMetrics")
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram('step_latency_seconds', 'Step latency.', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            latency.observe(value, step='model')
+        text = render(registry.snapshot())
+        self.assertIn('# TYPE step_latency_seconds histogram', text)
+        self.assertIn('step_latency_seconds_bucket{step="model",le="0.1"} 1', text)
+        self.assertIn('step_latency_seconds_bucket{step="model",le="1.0"} 3', text)
+        self.assertIn('step_latency_seconds_bucket{step="model",le="+Inf"} 4', text)
+        self.assertIn('step_latency_seconds_count{step="model"} 4', text)
+
+    def test_snapshots_from_processes_are_added(self):
+        replicas = [MetricsRegistry(), MetricsRegistry()]
+        for i, registry in enumerate(replicas):
+            registry.counter('ingest_frames_total').inc(10 * (i + 1), source='whip')
+            registry.histogram('step_batch_size', buckets=(1, 4)).observe(4, step='model')
+        merged = merge_snapshots([registry.snapshot() for registry in replicas])
+        text = render(merged)
+        self.assertIn('ingest_frames_total{source="whip"} 30', text)
+        self.assertIn('step_batch_size_count{step="model"} 2', text)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.gauge('frame_buffer_depth').set(3, session='a"b')
+        self.assertIn('frame_buffer_depth{session="a\\"b"} 3', render(registry.snapshot()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# tests/test_model_cache.py
+
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from src.core.model_cache import ModelCache
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestModelCache")
+
+
+class FakeTensor:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def numel(self):
+        return self.nbytes
+
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    def __init__(self, nbytes):
+        self.tensors = [FakeTensor(nbytes)]
+
+    def parameters(self):
+        return self.tensors
+
+
+class TestModelCache(unittest.TestCase):
+    def test_shared_instance_and_stats(self):
+        cache = ModelCache()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return FakeModel(100)
+
+        first = cache.get(('sd', 'Img2Img', 'float16', 'cpu'), loader)
+        second = cache.get(('sd', 'Img2Img', 'float16', 'cpu'), loader)
+        self.assertIs(first, second)
+        self.assertEqual(len(loads), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['resident_bytes'], 100)
+
+    def test_lru_eviction_under_budget(self):
+        cache = ModelCache(max_bytes=250)
+        cache.get('a', lambda: FakeModel(100))
+        cache.get('b', lambda: FakeModel(100))
+        cache.get('a', lambda: FakeModel(100))
+        cache.get('c', lambda: FakeModel(100))
+        # 'b' was least recently used
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+
+class TestConcurrentLoads(unittest.TestCase):
+    def test_concurrent_requests_share_one_load(self):
+        cache = ModelCache()
+        started, release = threading.Event(), threading.Event()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            started.set()
+            release.wait(5)
+            return FakeModel(100)
+
+        with ThreadPoolExecutor(4) as pool:
+            first = pool.submit(cache.get, 'sd', loader)
+            started.wait(5)
+            waiting = [pool.submit(cache.get, 'sd', loader) for _ in range(3)]
+            release.set()
+            models = [future.result(5) for future in [first] + waiting]
+        self.assertEqual(len(loads), 1)
+        self.assertTrue(all(model is models[0] for model in models))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (3, 1))
+
+    def test_different_keys_load_in_parallel(self):
+        cache = ModelCache()
+        b_loaded = threading.Event()
+
+        def load_a():
+            # Finishes only once 'b' loaded next to it
+            self.assertTrue(b_loaded.wait(5))
+            return FakeModel(100)
+
+        def load_b():
+            b_loaded.set()
+            return FakeModel(100)
+
+        with ThreadPoolExecutor(2) as pool:
+            a = pool.submit(cache.get, 'a', load_a)
+            b = pool.submit(cache.get, 'b', load_b)
+            self.assertIsNotNone(b.result(5))
+            self.assertIsNotNone(a.result(5))
+        self.assertEqual(sorted(cache.entries), ['a', 'b'])
+
+    def test_failed_loads_reach_waiters_and_are_retried(self):
+        cache = ModelCache()
+        started, release = threading.Event(), threading.Event()
+
+        def broken():
+            started.set()
+            release.wait(5)
+            raise OSError("weights not found")
+
+        with ThreadPoolExecutor(2) as pool:
+            first = pool.submit(cache.get, 'sd', broken)
+            started.wait(5)
+            waiter = pool.submit(cache.get, 'sd', broken)
+            release.set()
+            for future in (first, waiter):
+                with self.assertRaises(OSError):
+                    future.result(5)
+        self.assertEqual(cache.loading, {})
+        self.assertEqual(cache.get('sd', lambda: FakeModel(10)).tensors[0].nbytes, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# tests/test_pipeline_reconfigure.py
+
+import asyncio
+import unittest
+from src.core.pipeline import Pipeline
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestPipelineReconfigure")
+
+
+def function_step(name, function, **params):
+    return {'name': name, 'type': 'function', 'function': function, 'params': params}
+
+
+class FakeMethod:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def remote(self, *args):
+        return self.fn(*args)
+
+
+class FakeWorker:
+    def __init__(self):
+        self.cache_limits = []
+        self.configure_model_cache = FakeMethod(self.cache_limits.append)
+        self.load_step = FakeMethod(self.load)
+        self.unload_step = FakeMethod(self.unload)
+
+    async def load(self, step_config, key):
+        return {'collects': False, 'deterministic': True}
+
+    async def unload(self, key):
+        pass
+
+
+class FakePool:
+    def __init__(self):
+        self.workers = []
+
+    def configure(self, pool_config):
+        pass
+
+    def acquire(self, step_config):
+        self.workers.append(FakeWorker())
+        return self.workers[-1]
+
+
+class TestPipelineReconfigure(unittest.IsolatedAsyncioTestCase):
+    async def test_unchanged_steps_are_reused(self):
+        pipeline = Pipeline()
+        await pipeline.configure_from_dict({'steps': [
+            function_step('resize', 'resize_image', size=[512, 512]),
+            function_step('enhance', 'enhance_image', factor=1.1),
+        ]})
+        resize, enhance = pipeline.steps
+
+        await pipeline.configure_from_dict({'steps': [
+            function_step('resize', 'resize_image', size=[512, 512]),
+            function_step('enhance', 'enhance_image', factor=1.5),
+        ]})
+        self.assertIs(pipeline.steps[0], resize)
+        self.assertIsNot(pipeline.steps[1], enhance)
+        self.assertEqual(pipeline.steps[1].params, {'factor': 1.5})
+        self.assertEqual(pipeline.generation, 2)
+
+    async def test_in_flight_frames_keep_old_steps(self):
+        pipeline = Pipeline()
+        await pipeline.configure_from_dict({'steps': [function_step('enhance', 'enhance_image', factor=1.1)]})
+        with pipeline.acquire() as steps:
+            await pipeline.configure_from_dict({'steps': [function_step('enhance', 'enhance_image', factor=2.0)]})
+            self.assertEqual(steps[0].params, {'factor': 1.1})
+            self.assertEqual(pipeline.active[1], 1)
+        self.assertEqual(pipeline.steps[0].params, {'factor': 2.0})
+
+    async def test_retired_steps_wait_for_older_generations(self):
+        pipeline = Pipeline()
+        unloaded = []
+
+        async def unload(steps):
+            unloaded.extend(steps)
+        pipeline._unload = unload
+
+        await pipeline.configure_from_dict({'steps': [function_step('x', 'enhance_image', factor=1.1),
+                                                      function_step('y', 'enhance_image', factor=1.2)]})
+        generation = pipeline.hold()
+        x, y = pipeline.steps
+        # Generation 2 reuses x and y; generation 3 retires them while a generation 1 frame still runs
+        await pipeline.configure_from_dict({'steps': [function_step('x', 'enhance_image', factor=1.1),
+                                                      function_step('y', 'enhance_image', factor=1.2)]})
+        await pipeline.configure_from_dict({'steps': [function_step('x', 'enhance_image', factor=2.0),
+                                                      function_step('y', 'enhance_image', factor=2.0)]})
+        await asyncio.sleep(0.15)
+        self.assertEqual(unloaded, [])
+        self.assertEqual(pipeline.active[1], 1)
+
+        pipeline.release(generation)
+        await asyncio.sleep(0.15)
+        self.assertEqual(unloaded, [x, y])
+        self.assertNotIn(1, pipeline.active)
+        self.assertNotIn(2, pipeline.active)
+
+    async def test_model_cache_limit_reaches_reused_workers(self):
+        pipeline = Pipeline()
+        pipeline.worker_pool = FakePool()
+        steps = [dict(function_step(name, 'enhance_image', factor=1.1), placement='actor', worker_group='shared')
+                 for name in ('x', 'y')]
+        await pipeline.configure_from_dict({'steps': steps, 'model_cache': {'max_bytes': 100}})
+        await pipeline.configure_from_dict({'steps': steps, 'model_cache': {'max_bytes': 200}})
+        await pipeline.configure_from_dict({'steps': steps})
+        # Changed steps load into the worker of the previous config
+        changed = [dict(step, params={'factor': 2.0}) for step in steps]
+        await pipeline.configure_from_dict({'steps': changed, 'model_cache': {'max_bytes': 300}})
+        worker, = pipeline.worker_pool.workers
+        # Once per configuration, however many of its steps share the worker
+        self.assertEqual(worker.cache_limits, [100, 200, None, 300])
+
+    async def test_failed_config_keeps_previous_pipeline(self):
+        pipeline = Pipeline()
+        await pipeline.configure_from_dict({'steps': [function_step('enhance', 'enhance_image', factor=1.1)]})
+        with self.assertRaises(ValueError):
+            await pipeline.configure_from_dict({'steps': [{'name': 'broken', 'type': 'unknown'}]})
+        self.assertEqual(pipeline.steps[0].name, 'enhance')
+        self.assertEqual(pipeline.generation, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+# tests/test_reorder.py
+
+import asyncio
+import time
+import unittest
+import numpy as np
+from src.core.engine import Engine, Stream
+from src.core.frame import Frame
+from src.core.latency import LatencyBudget
+from src.core.pipeline import Pipeline
+from src.core.reorder import ReorderBuffer
+from src.core.transport import Tombstone
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestReorder")
+
+
+class Item:
+    def __init__(self, sequence):
+        self.sequence = sequence
+
+
+def drain(buffer, now):
+    released = []
+    item = buffer.pop(now=now)
+    while item is not None:
+        released.append(item.sequence)
+        item = buffer.pop(now=now)
+    return released
+
+
+class TestReorderBuffer(unittest.TestCase):
+    def test_releases_in_sequence_order(self):
+        buffer = ReorderBuffer(max_size=8, gap_timeout=0.1)
+        for sequence in (0, 2, 3, 1, 4):
+            buffer.push(Item(sequence), now=0.0)
+        self.assertEqual(drain(buffer, now=0.0), [0, 1, 2, 3, 4])
+
+    def test_waits_for_gap_then_skips(self):
+        buffer = ReorderBuffer(max_size=8, gap_timeout=0.1)
+        buffer.push(Item(0), now=0.0)
+        buffer.push(Item(2), now=0.0)
+        self.assertEqual(drain(buffer, now=0.05), [0])
+        self.assertAlmostEqual(buffer.wait_time(now=0.05), 0.05)
+        self.assertEqual(drain(buffer, now=0.1), [2])
+        self.assertEqual(buffer.stats()['skipped'], 1)
+        # The missing frame is too late once its successor was shown
+        self.assertFalse(buffer.push(Item(1), now=0.2))
+        self.assertEqual(buffer.stats()['late'], 1)
+
+    def test_full_buffer_skips_without_waiting(self):
+        buffer = ReorderBuffer(max_size=2, gap_timeout=10.0)
+        buffer.push(Item(0), now=0.0)
+        self.assertEqual(drain(buffer, now=0.0), [0])
+        for sequence in (2, 3, 4):
+            buffer.push(Item(sequence), now=0.0)
+        self.assertEqual(drain(buffer, now=0.0), [2, 3, 4])
+
+    def test_unsequenced_items_pass_through(self):
+        buffer = ReorderBuffer()
+        buffer.push(object())
+        self.assertIsNotNone(buffer.pop())
+        self.assertIsNone(buffer.pop())
+
+    def test_restarted_sequence_resynchronises(self):
+        buffer = ReorderBuffer(max_size=2)
+        for sequence in range(100, 103):
+            buffer.push(Item(sequence), now=0.0)
+        drain(buffer, now=0.0)
+        self.assertTrue(buffer.push(Item(0), now=1.0))
+        self.assertEqual(drain(buffer, now=1.0), [0])
+
+    def test_tombstones_close_gaps_without_waiting(self):
+        buffer = ReorderBuffer(max_size=8, gap_timeout=10.0)
+        buffer.push(Item(0), now=0.0)
+        buffer.push(Item(2), now=0.0)
+        self.assertEqual(drain(buffer, now=0.0), [0])
+        buffer.push(Tombstone(1), now=0.0)
+        self.assertEqual(drain(buffer, now=0.0), [2])
+        self.assertEqual(buffer.stats()['dropped'], 1)
+        # Tombstones for gaps already skipped are ignored, not counted as late
+        self.assertTrue(buffer.push(Tombstone(1), now=0.0))
+        self.assertEqual(buffer.stats()['late'], 0)
+
+
+class ModelStep:
+    name = 'model'
+    config = {'type': 'model'}
+    batcher = None
+    collects = False
+
+    async def process(self, frame):
+        return frame
+
+
+class FakeMethod:
+    def __init__(self, fn):
+        self.remote = fn
+
+
+class FakeBuffer:
+    def __init__(self, batches=()):
+        self.batches = list(batches)
+        self.items = []
+        self.add_frame = FakeMethod(self._add_frame)
+        self.add_frames = FakeMethod(self._add_frames)
+        self.get_frames = FakeMethod(self._get_frames)
+
+    async def _add_frame(self, item):
+        self.items.append(item)
+
+    async def _add_frames(self, items):
+        self.items.extend(items)
+
+    async def _get_frames(self, n, timeout=0):
+        await asyncio.sleep(0.01)
+        return self.batches.pop(0) if self.batches else []
+
+
+class TestBudgetDropsDuringPlayback(unittest.IsolatedAsyncioTestCase):
+    async def test_playback_skips_frames_dropped_by_the_budget(self):
+        engine = object.__new__(Engine.func_or_class)
+        engine.pipeline = Pipeline()
+        engine.pipeline.steps = [ModelStep()]
+        engine.latency_budget = LatencyBudget(budget_ms=200)
+        engine.latency_budget.observe(ModelStep, 0.150)
+        engine.fetch_batch_size, engine.fetch_timeout = 8, 0
+
+        def frame(sequence, age):
+            return Frame(np.zeros((2, 2, 3), np.uint8), sequence=sequence, ingest_time=time.time() - age)
+
+        # Frame 1 is over its budget, frame 3 was evicted from the input buffer
+        input_buffer = FakeBuffer([[Tombstone(3), frame(2, 0), frame(1, 1.0), frame(0, 0), frame(4, 0)]])
+        output_buffer = FakeBuffer()
+        stream = Stream({'session_id': 's', 'input_buffer': input_buffer, 'output_buffer': output_buffer})
+
+        async def publish_result(stream, processed_frame):
+            # Stands in for the object store hop of publish_frame
+            await stream.output_buffer.add_frame.remote(processed_frame)
+        engine.publish_result = publish_result
+
+        task = asyncio.create_task(engine.process_frames(stream))
+        while len(output_buffer.items) < 5:
+            await asyncio.sleep(0.01)
+        stream.stopped = True
+        await task
+
+        playback = ReorderBuffer(max_size=8, gap_timeout=10.0)
+        for item in output_buffer.items:
+            playback.push(item, now=0.0)
+        # Nothing is held back waiting for the dropped frames
+        self.assertEqual(drain(playback, now=0.0), [0, 2, 4])
+        self.assertEqual(playback.stats()['dropped'], 2)
+        self.assertEqual(playback.stats()['skipped'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# tests/test_result_cache.py
+
+import unittest
+import numpy as np
+from src.core.frame import Frame
+from src.core.result_cache import ResultCache, input_digest
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestResultCache")
+
+
+def frame(value, sequence=0, params=None):
+    return Frame(np.full((4, 4, 3), value, dtype=np.uint8), sequence=sequence, params=params)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_hit_keeps_current_frame_metadata(self):
+        cache = ResultCache({'name': 'enhance', 'params': {'factor': 1.2}})
+        first = frame(10, sequence=1)
+        key = cache.key(first)
+        cache.put(key, first.with_data(first.data * 2))
+        repeated = frame(10, sequence=7)
+        result = cache.get(cache.key(repeated), repeated)
+        self.assertEqual(result.sequence, 7)
+        self.assertEqual(int(result.data[0, 0, 0]), 20)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_key_depends_on_content_config_and_params(self):
+        cache = ResultCache({'name': 'enhance', 'params': {'factor': 1.2}})
+        other = ResultCache({'name': 'enhance', 'params': {'factor': 1.5}})
+        self.assertEqual(cache.key(frame(1)), cache.key(frame(1, sequence=5)))
+        self.assertNotEqual(cache.key(frame(1)), cache.key(frame(2)))
+        self.assertNotEqual(cache.key(frame(1)), other.key(frame(1)))
+        self.assertNotEqual(cache.key(frame(1)), cache.key(frame(1, params={'adapter': 'watercolor'})))
+        self.assertIsNone(input_digest(iter([])))
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        item_bytes = frame(0).data.nbytes
+        cache = ResultCache({'name': 'step'}, max_bytes=2 * item_bytes)
+        keys = [cache.key(frame(i)) for i in range(3)]
+        cache.put(keys[0], frame(0))
+        cache.put(keys[1], frame(1))
+        cache.get(keys[0], frame(0))
+        cache.put(keys[2], frame(2))
+        self.assertIsNotNone(cache.get(keys[0], frame(0)))
+        self.assertIsNone(cache.get(keys[1], frame(1)))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['bytes'], 2 * item_bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
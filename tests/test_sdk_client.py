@@ -0,0 +1,218 @@
+# tests/test_sdk_client.py
+
+import asyncio
+import subprocess
+import sys
+import unittest
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+from sdk.async_pipeline_client import AsyncPipelineClient
+from sdk.pipeline_client import PipelineClient
+from sdk.wire import (FRAME_CONTENT_TYPE, INVALID_REQUEST_ID, STREAM_CONTENT_TYPE, STREAM_LENGTH, decode_frame,
+                      encode_frame, pack_message, read_message, unpack_message)
+from src.core.streaming import stream_inference
+from src.core.wire import request_params
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestSdkClient")
+
+
+class FakeEngine:
+    """Reverses payloads; payloads starting with a digit take that many 10 ms ticks."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def infer(self, data, timeout_ms=None, image_format='jpg'):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(int(data[:1]) * 0.01 if data[:1].isdigit() else 0)
+            if data == b'fail':
+                return 500, b"Inference failed.", 'text/plain'
+            return 200, data[::-1], 'image/jpeg'
+        finally:
+            self.in_flight -= 1
+
+    async def handle(self, request):
+        self.query = dict(request.query)
+        if request.content_type == FRAME_CONTENT_TYPE:
+            wire = decode_frame(await request.read())
+            self.accept = request.headers.get('Accept')
+            body = encode_frame(255 - wire.data, wire.colorspace, sequence=wire.sequence)
+            return web.Response(body=body, content_type=FRAME_CONTENT_TYPE)
+        status, body, content_type = await self.infer(await request.read())
+        return web.Response(body=body, status=status, content_type=content_type)
+
+
+class FakeEngineHandle:
+    """Stands in for the Serve handle PipelineService holds: `infer.remote` runs the fake engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.calls = []
+        self.params = []
+        self.infer = self
+
+    async def remote(self, data, timeout_ms=None, image_format='jpg', compression=None, params=None):
+        self.calls.append((timeout_ms, image_format, compression))
+        self.params.append(params)
+        if data == b'crash':
+            raise RuntimeError("Replica died.")
+        return await self.engine.infer(data, timeout_ms, image_format)
+
+
+class TestWire(unittest.TestCase):
+    def test_message_round_trip(self):
+        request_id, status, payload = unpack_message(pack_message(7, b'payload', 504)[STREAM_LENGTH.size:])
+        self.assertEqual((request_id, status, bytes(payload)), (7, 504, b'payload'))
+
+    def test_short_messages_are_rejected(self):
+        with self.assertRaises(ValueError):
+            unpack_message(b'\x00\x01')
+
+    def test_request_params(self):
+        request = make_mocked_request('POST', '/?params={"strength": 0.5, "adapter": "sketch"}&adapter=watercolor')
+        self.assertEqual(request_params(request), {'strength': 0.5, 'adapter': 'watercolor'})
+        self.assertEqual(request_params(make_mocked_request('POST', '/')), {})
+        with self.assertRaises(ValueError):
+            request_params(make_mocked_request('POST', '/?params=[1]'))
+
+
+class TestStandaloneSdk(unittest.TestCase):
+    def test_sdk_needs_neither_the_server_tree_nor_numpy(self):
+        code = ("import sys, sdk.pipeline_client, sdk.async_pipeline_client; "
+                "print(sorted(name for name in sys.modules if name.split('.')[0] in ('src', 'numpy')))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+
+class TestAsyncPipelineClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = FakeEngine()
+        self.handle = FakeEngineHandle(self.engine)
+        app = web.Application()
+        app.router.add_post('/pipeline/stream', self.stream)
+        app.router.add_post('/pipeline', self.engine.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+        self.client = AsyncPipelineClient(self.url, pool_size=4)
+
+    async def stream(self, request):
+        # What PipelineService.stream_handler runs, without Serve in front
+        return await stream_inference(request, self.handle)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.runner.cleanup()
+
+    async def test_stream_yields_results_as_they_finish(self):
+        frames = [b'5slow', b'0fast', b'fail', b'1next']
+        results = [result async for result in self.client.stream(frames, window=4)]
+        self.assertEqual(sorted(result.index for result in results), [0, 1, 2, 3])
+        self.assertEqual(results[-1].index, 0)
+        by_index = {result.index: result for result in results}
+        self.assertEqual(by_index[1].body, b'tsaf0')
+        self.assertEqual(by_index[2].status, 500)
+
+    async def test_stream_bounds_frames_in_flight(self):
+        frames = [b'2frame'] * 12
+        results = [result async for result in self.client.stream(frames, window=3)]
+        self.assertEqual(len(results), 12)
+        self.assertLessEqual(self.engine.peak, 3)
+
+    async def test_stream_accepts_async_iterables(self):
+        async def frames():
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                yield b'frame%d' % i
+        results = [result async for result in self.client.stream(frames())]
+        self.assertEqual(sorted(result.body for result in results), [b'0emarf', b'1emarf', b'2emarf'])
+
+    async def test_stream_passes_options_and_reports_failures(self):
+        results = [result async for result in self.client.stream([b'crash', b'ok'], timeout_ms=250,
+                                                                 image_format='png', compression='lz4')]
+        by_index = {result.index: result for result in results}
+        self.assertEqual((by_index[0].status, by_index[0].body), (500, b"Internal server error."))
+        self.assertEqual((by_index[1].status, by_index[1].body), (200, b'ko'))
+        self.assertEqual(self.handle.calls, [('250', 'png', 'lz4')] * 2)
+
+    async def test_params_apply_to_the_whole_stream(self):
+        results = [result async for result in self.client.stream([b'a', b'b'], params={'adapter': 'watercolor'})]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.handle.params, [{'adapter': 'watercolor'}] * 2)
+
+    async def test_invalid_stream_params_are_rejected(self):
+        session = self.client._session()
+        async with session.post(f'{self.url}/pipeline/stream', params={'params': '["watercolor"]'}, data=b'',
+                                headers={'Content-Type': STREAM_CONTENT_TYPE}) as response:
+            self.assertEqual(response.status, 400)
+
+    async def test_empty_window_is_rejected(self):
+        session = self.client._session()
+        for window in ('0', '-1'):
+            async with session.post(f'{self.url}/pipeline/stream', params={'window': window}, data=b'',
+                                    headers={'Content-Type': STREAM_CONTENT_TYPE}) as response:
+                self.assertEqual(response.status, 400)
+        with self.assertRaises(ValueError):
+            [result async for result in self.client.stream([b'frame'], window=0)]
+
+    async def test_stream_of_nothing(self):
+        self.assertEqual([result async for result in self.client.stream([])], [])
+
+    async def test_results_arrive_while_frames_are_still_uploading(self):
+        first_result = asyncio.Event()
+
+        async def frames():
+            yield b'0first'
+            # The upload only continues once the first result came back on the same request
+            await asyncio.wait_for(first_result.wait(), 5)
+            yield b'0second'
+
+        results = []
+        async for result in self.client.stream(frames()):
+            results.append(result.body)
+            first_result.set()
+        self.assertEqual(results, [b'tsrif0', b'dnoces0'])
+
+    async def test_malformed_messages_get_an_error_reply(self):
+        body = STREAM_LENGTH.pack(2) + b'\x00\x01' + pack_message(3, b'0ok')
+        session = self.client._session()
+        async with session.post(f'{self.url}/pipeline/stream', data=body,
+                                headers={'Content-Type': STREAM_CONTENT_TYPE}) as response:
+            replies = []
+            while (message := await read_message(response.content, 2**20)) is not None:
+                request_id, status, payload = unpack_message(message)
+                replies.append((request_id, status))
+        self.assertEqual(replies, [(INVALID_REQUEST_ID, 400), (3, 200)])
+
+    async def test_infer_many_keeps_order(self):
+        results = await self.client.infer_many([b'3ab', b'0cd', b'1ef'])
+        self.assertEqual(results, [b'ba3', b'dc0', b'fe1'])
+
+    async def test_infer_sends_params(self):
+        await self.client.infer_many([b'ab'], params={'adapter': 'watercolor'})
+        self.assertEqual(self.engine.query['params'], '{"adapter": "watercolor"}')
+
+    async def test_arrays_travel_as_raw_frames(self):
+        pixels = np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+        result = await self.client.infer(pixels, image_format='raw')
+        np.testing.assert_array_equal(result.data, 255 - pixels)
+        self.assertEqual(self.engine.accept, FRAME_CONTENT_TYPE)
+
+    async def test_sync_client_shares_pooled_connections(self):
+        with PipelineClient(self.url, pool_size=2) as client:
+            results = await asyncio.to_thread(client.infer_many, [b'2ab', b'0cd', b'1ef', b'gh'])
+            self.assertEqual(results, [b'ba2', b'dc0', b'fe1', b'hg'])
+            self.assertEqual(client.session.get_adapter(self.url)._pool_maxsize, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+# tests/test_sessions.py
+
+import asyncio
+import time
+import unittest
+from unittest import mock
+from src.core import sessions
+from src.core.engine import Engine
+from src.core.latency import LatencyBudget
+from src.core.pipeline import Pipeline
+from src.core.sessions import Session, SessionManager, SessionRegistry
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestSessions")
+
+
+def session(session_id):
+    return Session(session_id, input_buffer=None, output_buffer=None)
+
+
+class TestSessionRegistry(unittest.TestCase):
+    def test_sessions_are_spread_and_sticky(self):
+        registry = SessionRegistry()
+        registry.heartbeat('replica-a')
+        registry.heartbeat('replica-b')
+        for session_id in ('s1', 's2', 's3', 's4'):
+            registry.add(session(session_id))
+        owned_by_a = {s.session_id for s in registry.heartbeat('replica-a')}
+        owned_by_b = {s.session_id for s in registry.heartbeat('replica-b')}
+        self.assertEqual(len(owned_by_a), 2)
+        self.assertEqual(owned_by_a | owned_by_b, {'s1', 's2', 's3', 's4'})
+        # Assignments do not move while both replicas are alive
+        self.assertEqual({s.session_id for s in registry.heartbeat('replica-a')}, owned_by_a)
+
+    def test_sessions_wait_for_a_replica(self):
+        registry = SessionRegistry()
+        registry.add(session('s1'))
+        self.assertIsNone(registry.sessions['s1'].replica)
+        self.assertEqual([s.session_id for s in registry.heartbeat('replica-a')], ['s1'])
+
+    def test_sessions_move_off_dead_replicas(self):
+        registry = SessionRegistry(replica_timeout=5.0)
+        registry.heartbeat('replica-a')
+        registry.add(session('s1'))
+        registry.replicas['replica-a'] = time.time() - 60
+        self.assertEqual([s.session_id for s in registry.heartbeat('replica-b')], ['s1'])
+        self.assertNotIn('replica-a', registry.replicas)
+
+    def test_idle_replicas_help_backlogged_sessions(self):
+        registry = SessionRegistry()
+        registry.heartbeat('replica-a')
+        registry.add(session('s1'))
+        registry.heartbeat('replica-a', {'queue_depth': {'s1': 20}, 'p95_ms': 120.0})
+        registry.heartbeat('replica-b')
+        self.assertEqual([s.session_id for s in registry.backlogged('replica-b', steal_depth=8)], ['s1'])
+        self.assertEqual(registry.backlogged('replica-a', steal_depth=8), [])
+        self.assertEqual(registry.load()['queue_depth'], 20)
+        self.assertEqual(registry.load()['p95_ms'], 120.0)
+
+    def test_only_replicas_on_the_current_pipeline_get_new_sessions(self):
+        registry = SessionRegistry()
+        registry.pipeline_version = 2
+        registry.heartbeat('replica-a', {'pipeline_version': 2})
+        registry.add(session('s1'))
+        # A replica that just scaled out has not loaded the pipeline yet
+        registry.heartbeat('replica-b', {'pipeline_version': 0})
+        registry.add(session('s2'))
+        self.assertEqual({s.replica for s in registry.sessions.values()}, {'replica-a'})
+        registry.heartbeat('replica-a', {'queue_depth': {'s1': 20}, 'pipeline_version': 2})
+        self.assertEqual(registry.backlogged('replica-b', steal_depth=8), [])
+
+        registry.heartbeat('replica-b', {'pipeline_version': 2})
+        registry.add(session('s3'))
+        self.assertEqual(registry.sessions['s3'].replica, 'replica-b')
+        self.assertEqual([s.session_id for s in registry.backlogged('replica-b', steal_depth=8)], ['s1'])
+
+        # Owners keep their sessions while catching up with a newer pipeline
+        registry.pipeline_version = 3
+        self.assertEqual({s.session_id for s in registry.heartbeat('replica-a', {'pipeline_version': 2})},
+                         {'s1', 's2'})
+
+
+class TestEngineAssignment(unittest.IsolatedAsyncioTestCase):
+    def engine(self):
+        # Only the state apply_assignment touches; frame loops idle until stopped
+        engine = object.__new__(Engine.func_or_class)
+        engine.pipeline = Pipeline()
+        engine.latency_budget = LatencyBudget()
+        engine.streams = {}
+
+        async def process_frames(stream):
+            while not stream.stopped:
+                await asyncio.sleep(0.01)
+        engine.process_frames = process_frames
+        return engine
+
+    @staticmethod
+    def assignment(owned=(), backlogged=()):
+        return {'owned': [session(s).info() for s in owned], 'backlogged': [session(s).info() for s in backlogged]}
+
+    async def test_owned_and_helping_transitions(self):
+        engine = self.engine()
+        engine.apply_assignment(self.assignment(owned=['a'], backlogged=['b']))
+        self.assertEqual({s: stream.helping for s, stream in engine.streams.items()}, {'a': False, 'b': True})
+        helper = engine.streams['b']
+
+        # A session this replica was helping with becomes its own; the running stream is kept
+        engine.apply_assignment(self.assignment(owned=['a', 'b']))
+        self.assertIs(engine.streams['b'], helper)
+        self.assertFalse(helper.helping)
+
+        # Sessions moved elsewhere stop gracefully
+        stream_a = engine.streams['a']
+        engine.apply_assignment(self.assignment(owned=['b']))
+        self.assertEqual(list(engine.streams), ['b'])
+        self.assertTrue(stream_a.stopped)
+
+        # A session reassigned to a backlogged replica is handed over and then helped with afresh
+        engine.apply_assignment(self.assignment(backlogged=['b']))
+        self.assertTrue(helper.stopped)
+        self.assertIsNot(engine.streams['b'], helper)
+        self.assertTrue(engine.streams['b'].helping)
+        engine.apply_assignment(self.assignment())
+        self.assertEqual(engine.streams, {})
+
+    async def test_helpers_stop_when_backlog_clears(self):
+        engine = self.engine()
+        engine.apply_assignment(self.assignment(backlogged=['c']))
+        helper = engine.streams['c']
+        engine.apply_assignment(self.assignment(backlogged=['c']))
+        self.assertIs(engine.streams['c'], helper)
+        engine.apply_assignment(self.assignment())
+        self.assertTrue(helper.stopped)
+        await asyncio.sleep(0.02)
+        self.assertTrue(helper.task.done())
+
+
+class TestEnginePipelineSync(unittest.IsolatedAsyncioTestCase):
+    def engine(self, manager):
+        engine = object.__new__(Engine.func_or_class)
+        engine.pipeline = Pipeline()
+        engine.latency_budget = LatencyBudget()
+        engine.streams = {}
+        engine.started = time.time()
+        engine.pipeline_version = 0
+        engine.failed_pipeline_version = None
+        engine.session_manager = manager
+        return engine
+
+    async def test_replicas_follow_the_shared_pipeline(self):
+        manager = SessionManager.__ray_metadata__.modified_class()
+        for name in ('set_pipeline', 'get_pipeline'):
+            setattr(manager, name, mock.Mock(remote=getattr(manager, name)))
+        config = "steps:\n  - name: resize\n    type: function\n    function: resize_image\n"
+        first, second = self.engine(manager), self.engine(manager)
+
+        # set_pipeline reaches one replica; the other picks the config up from the manager
+        self.assertTrue(await first.load_pipeline_from_string(config))
+        first.pipeline_version = await manager.set_pipeline.remote(config)
+        await second.sync_pipeline()
+        self.assertEqual(second.pipeline_version, 1)
+        self.assertEqual([step.name for step in second.pipeline.steps], ['resize'])
+
+        # A config that fails to build is not retried and leaves the previous pipeline in place
+        await manager.set_pipeline.remote("steps:\n  - name: broken\n    type: unknown\n")
+        await second.sync_pipeline()
+        self.assertEqual((second.pipeline_version, second.failed_pipeline_version), (1, 2))
+        self.assertEqual([step.name for step in second.pipeline.steps], ['resize'])
+
+    async def test_initial_config_does_not_replace_a_set_pipeline(self):
+        manager = SessionManager.__ray_metadata__.modified_class()
+        self.assertEqual(await manager.set_pipeline("a", replace=False), 1)
+        self.assertEqual(await manager.set_pipeline("b", replace=False), 1)
+        self.assertEqual(await manager.set_pipeline("c"), 2)
+        self.assertEqual(await manager.get_pipeline(), (2, "c"))
+
+
+class FakeMethod:
+    def __init__(self, result=None):
+        self.result = result
+
+    async def remote(self, *args, **kwargs):
+        await asyncio.sleep(0.01)
+        return self.result
+
+
+class FakeBuffer:
+    def __init__(self, **options):
+        self.options = options
+        self.set_pipeline_available = FakeMethod()
+
+
+class TestSessionManager(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.created = []
+
+        def remote(**options):
+            self.created.append(FakeBuffer(**options))
+            return self.created[-1]
+        patcher = mock.patch.object(sessions, 'FrameBuffer', mock.Mock(remote=remote))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = SessionManager.__ray_metadata__.modified_class()
+        self.manager._start_reaper = lambda: None
+
+    async def test_concurrent_opens_share_one_session(self):
+        first, second = await asyncio.gather(self.manager.open_session('s'), self.manager.open_session('s'))
+        self.assertEqual(len(self.created), 2)
+        self.assertIs(first['input_buffer'], second['input_buffer'])
+        self.assertIs(first['output_buffer'], second['output_buffer'])
+        self.assertEqual(list(self.manager.registry.sessions), ['s'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# tests/test_startup.py
+
+import asyncio
+import json
+import subprocess
+import sys
+import unittest
+from unittest import mock
+from src.core import startup
+from src.core.pipeline import Pipeline
+from src.core.steps import step_worker
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestStartup")
+
+
+class TestLoadModule(unittest.TestCase):
+    def test_first_import_is_recorded_once(self):
+        sys.modules.pop('wave', None)
+        startup.import_times.pop('wave', None)
+        module = startup.load_module('wave')
+        self.assertIs(startup.load_module('wave'), module)
+        self.assertIn('wave', startup.report()['imports'])
+
+    def test_model_modules_do_not_import_torch(self):
+        code = ("import sys, src.core.steps.model_step, src.plugins.custom_models, src.plugins.custom_functions; "
+                "print(sorted({'torch', 'diffusers', 'av', 'PIL'} & set(sys.modules)))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_function_only_engine_starts_fast(self):
+        # ray and Serve are loaded in every replica before the Engine is imported
+        code = ("import ray, ray.serve, asyncio, json, sys, time; start = time.perf_counter(); "
+                "import src.core.engine; from src.core.pipeline import Pipeline; pipeline = Pipeline(); "
+                "asyncio.run(pipeline.configure_from_dict({'worker_pool': {'size': 2}, 'steps': ["
+                "{'name': 'resize', 'type': 'function', 'function': 'resize_image'}, "
+                "{'name': 'enhance', 'type': 'function', 'function': 'enhance_image'}]})); "
+                "print(json.dumps({'seconds': time.perf_counter() - start, 'steps': len(pipeline.steps), "
+                "'ray': ray.is_initialized(), 'heavy': sorted({'torch', 'diffusers', 'av'} & set(sys.modules))}))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual((report['steps'], report['heavy']), (2, []))
+        # No StepWorker was started, so Ray was never even connected
+        self.assertFalse(report['ray'])
+        self.assertLess(report['seconds'], 1.0)
+
+    def test_parse_importtime(self):
+        text = ("import time: self [us] | cumulative | imported package\n"
+                "import time:       120 |        120 |   numpy.core\n"
+                "import time:        30 |        150 | numpy\n")
+        self.assertEqual(startup.parse_importtime(text), {'numpy.core': (120, 120), 'numpy': (30, 150)})
+
+
+class FakeWorker:
+    def __init__(self):
+        self.preloaded = None
+        self.preload = mock.Mock(remote=self._preload)
+
+    def _preload(self, modules):
+        self.preloaded = modules
+
+
+class TestWorkerPool(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(step_worker, 'StepWorker')
+        self.step_worker = patcher.start()
+        self.step_worker.remote.side_effect = FakeWorker
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(step_worker.ray, 'kill')
+        self.kill = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pooled_workers_are_preloaded_and_replaced(self):
+        pool = step_worker.WorkerPool()
+        pool.configure({'size': 2, 'preload': ['src.core.utils']})
+        self.assertEqual(len(pool.idle), 2)
+        self.assertEqual(pool.idle[0].preloaded, ['src.core.utils'])
+        worker = pool.acquire({'name': 'resize', 'type': 'function', 'placement': 'actor'})
+        self.assertIsInstance(worker, FakeWorker)
+        self.assertEqual(pool.stats(), {'size': 2, 'idle': 2, 'hits': 1, 'misses': 0})
+
+    def test_workers_with_resources_bypass_the_pool(self):
+        pool = step_worker.WorkerPool()
+        pool.configure({'size': 1})
+        pool.acquire({'name': 'resize', 'type': 'function', 'resources': {'num_cpus': 2}})
+        self.step_worker.options.assert_called_once_with(num_cpus=2)
+        self.assertEqual(pool.stats()['misses'], 1)
+
+    def test_function_only_pipelines_keep_no_pool(self):
+        pipeline = Pipeline()
+        asyncio.run(pipeline.configure_from_dict({'worker_pool': {'size': 2}, 'steps': [
+            {'name': 'resize', 'type': 'function', 'function': 'resize_image'}]}))
+        self.assertEqual(pipeline.worker_pool.stats()['size'], 0)
+        self.step_worker.remote.assert_not_called()
+
+    def test_shrinking_kills_idle_workers(self):
+        pool = step_worker.WorkerPool()
+        pool.configure({'size': 3})
+        pool.configure(None)
+        self.assertEqual(len(pool.idle), 0)
+        self.assertEqual(self.kill.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
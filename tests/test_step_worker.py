@@ -0,0 +1,107 @@
+# tests/test_step_worker.py
+
+import unittest
+from unittest import mock
+import numpy as np
+from src.core.frame import Frame
+from src.core.steps import step_worker
+from src.core.steps.base_step import StepFactory
+from src.core.steps.step_worker import RemoteStep, StepWorker, step_key, worker_options
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestStepWorker")
+
+RESIZE = {'name': 'resize', 'type': 'function', 'function': 'resize_image', 'params': {'size': [4, 2]}}
+
+
+def worker():
+    # The actor's class without its constructor, which needs a running Ray actor
+    instance = object.__new__(StepWorker.__ray_metadata__.modified_class)
+    instance.steps = {}
+    return instance
+
+
+class FakeMethod:
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def remote(self, *args):
+        return self.fn(*args)
+
+
+class TestStepWorker(unittest.TestCase):
+    def test_load_process_unload(self):
+        instance = worker()
+        key = step_key(RESIZE)
+        self.assertEqual(instance.load_step(RESIZE, key), {'collects': False, 'deterministic': True})
+        self.assertEqual(instance.step_names(), [key])
+        frame = Frame(np.zeros((8, 8, 3), dtype=np.uint8))
+        self.assertEqual(instance.process(key, frame).shape, (2, 4, 3))
+        self.assertEqual([result.shape for result in instance.process_batch(key, [frame, frame])], [(2, 4, 3)] * 2)
+        instance.unload_step(key)
+        self.assertEqual(instance.step_names(), [])
+        # Unloading twice is harmless
+        instance.unload_step(key)
+
+    def test_model_cache_limit_falls_back_to_the_default(self):
+        from src.core import model_cache
+        cache = model_cache.ModelCache()
+        with mock.patch.multiple(model_cache, model_cache=cache, default_max_bytes=50):
+            worker().configure_model_cache(100)
+            self.assertEqual(cache.max_bytes, 100)
+            worker().configure_model_cache(None)
+            self.assertEqual(cache.max_bytes, 50)
+
+    def test_invalid_step_is_not_loaded(self):
+        instance = worker()
+        self.assertIsNone(instance.load_step({'name': 'bad', 'type': 'unknown'}, 'bad@0'))
+        self.assertEqual(instance.steps, {})
+
+
+class TestRemoteStep(unittest.IsolatedAsyncioTestCase):
+    async def test_calls_are_forwarded_with_the_step_key(self):
+        calls = []
+        fake_worker = mock.Mock(
+            process=FakeMethod(lambda key, data: calls.append(key) or data * 2),
+            process_batch=FakeMethod(lambda key, items: calls.append(key) or [item * 2 for item in items]),
+        )
+        step = RemoteStep('model', {}, fake_worker, {'type': 'model'}, 'model@abc')
+        self.assertTrue(step.is_async)
+        self.assertEqual(await step.process(2), 4)
+        self.assertEqual(await step.process_batch([1, 3]), [2, 6])
+        self.assertEqual(calls, ['model@abc', 'model@abc'])
+
+
+class TestWorkerConfig(unittest.TestCase):
+    def test_step_key_follows_the_config(self):
+        key = step_key(RESIZE)
+        self.assertTrue(key.startswith('resize@'))
+        self.assertEqual(step_key(dict(reversed(list(RESIZE.items())))), key)
+        self.assertNotEqual(step_key(dict(RESIZE, params={'size': [8, 8]})), key)
+
+    def test_worker_options(self):
+        config = {'name': 'm', 'type': 'model', 'resources': {'num_cpus': 2, 'num_gpus': 0.5, 'gpus': 1}}
+        with self.assertLogs('StepWorker', level='WARNING'):
+            self.assertEqual(worker_options(config), {'num_cpus': 2, 'num_gpus': 0.5})
+
+    def test_model_steps_reserve_a_gpu_when_the_cluster_has_one(self):
+        model = {'name': 'm', 'type': 'model'}
+        with mock.patch.object(step_worker.ray, 'cluster_resources', return_value={'CPU': 8, 'GPU': 2}):
+            self.assertEqual(worker_options(model), {'num_gpus': 1})
+            self.assertEqual(worker_options(dict(model, resources={'num_gpus': 0})), {'num_gpus': 0})
+            self.assertEqual(worker_options(RESIZE), {})
+        with mock.patch.object(step_worker.ray, 'cluster_resources', return_value={'CPU': 8}):
+            self.assertEqual(worker_options(model), {})
+
+
+class TestPlugins(unittest.TestCase):
+    def test_custom_models_register_themselves(self):
+        StepFactory.load_plugins()
+        from src.plugins.custom_models import CustomLiveDiffModelStep, CustomLoRAModelStep
+        self.assertIs(StepFactory.custom_models['custom_livediff_model'], CustomLiveDiffModelStep)
+        self.assertIs(StepFactory.custom_models['custom_lora_model'], CustomLoRAModelStep)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# tests/test_transport.py
+
+import unittest
+from fractions import Fraction
+import numpy as np
+import ray
+from src.core.frame import Frame
+from src.core.transport import FrameHandle, put_frame, resolve_frame
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestTransport")
+
+
+class TestTransport(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        ray.init(num_cpus=1, include_dashboard=False, log_to_driver=False, ignore_reinit_error=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        ray.shutdown()
+
+    async def test_frame_round_trip(self):
+        frame = Frame(np.arange(12, dtype=np.uint8).reshape(2, 2, 3), pts=3003, time_base=Fraction(1, 90000),
+                      sequence=7, ingest_time=1.5)
+        handle = put_frame(frame)
+        self.assertEqual((handle.shape, handle.colorspace, handle.sequence, handle.ingest_time),
+                         ((2, 2, 3), 'bgr24', 7, 1.5))
+        resolved = await resolve_frame(handle)
+        np.testing.assert_array_equal(resolved.data, frame.data)
+        self.assertEqual((resolved.pts, resolved.time_base), (3003, Fraction(1, 90000)))
+
+    async def test_bytes_round_trip(self):
+        handle = put_frame(b'mp4 fragment')
+        self.assertIsInstance(handle, FrameHandle)
+        self.assertIsNone(handle.shape)
+        self.assertIsNone(handle.sequence)
+        self.assertEqual(await resolve_frame(handle), b'mp4 fragment')
+
+    async def test_non_handles_pass_through(self):
+        self.assertEqual(await resolve_frame(b'raw'), b'raw')
+
+
+if __name__ == '__main__':
+    unittest.main()
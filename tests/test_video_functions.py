@@ -0,0 +1,104 @@
+# tests/test_video_functions.py
+
+import asyncio
+import importlib.util
+import io
+import os
+import unittest
+import numpy as np
+from src.core.executor import run_steps
+from src.core.frame import Frame
+from src.core.mapping import is_fan_out, iterate
+from src.core.steps.base_step import StepFactory
+from src.plugins.custom_functions import video_frame_assembly, video_frame_extraction
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestVideoFunctions")
+
+SAMPLE_VIDEO = os.path.join(os.path.dirname(__file__), 'sample_video.mp4')
+
+
+def sample_bytes():
+    with open(SAMPLE_VIDEO, 'rb') as f:
+        return f.read()
+
+
+@unittest.skipUnless(importlib.util.find_spec('av'), "av is not installed")
+class TestVideoFrameExtraction(unittest.TestCase):
+    def test_frames_are_decimated_in_order(self):
+        frames = list(video_frame_extraction(sample_bytes(), frame_rate=5, end_time=2.0))
+        self.assertGreater(len(frames), 5)
+        self.assertEqual([frame.sequence for frame in frames], list(range(len(frames))))
+        times = [float(frame.pts * frame.time_base) for frame in frames]
+        self.assertEqual(times, sorted(times))
+        self.assertLessEqual(times[-1], 2.0)
+        self.assertEqual(frames[0].data.ndim, 3)
+
+    def test_start_time_skips_earlier_frames(self):
+        frames = list(video_frame_extraction(sample_bytes(), frame_rate=5, start_time=1.0, end_time=2.0))
+        self.assertGreaterEqual(float(frames[0].pts * frames[0].time_base), 1.0 - 1e-6)
+
+    def test_corrupt_upload_raises(self):
+        data = sample_bytes()
+        with self.assertRaises(Exception):
+            list(video_frame_extraction(b'not a video' + data[:1000]))
+        with self.assertRaises(Exception):
+            # Truncated upload
+            list(video_frame_extraction(data[:len(data) // 3]))
+
+
+@unittest.skipUnless(importlib.util.find_spec('av'), "av is not installed")
+class TestVideoFrameAssembly(unittest.TestCase):
+    @staticmethod
+    def frames(count):
+        return [Frame(np.full((64, 64, 3), i * 8, dtype=np.uint8)) for i in range(count)]
+
+    def decoded_times(self, data):
+        import av
+        with av.open(io.BytesIO(data)) as container:
+            return [float(frame.pts * frame.time_base) for frame in container.decode(container.streams.video[0])]
+
+    def test_round_trip(self):
+        data = b''.join(video_frame_assembly(self.frames(10), frame_rate=30))
+        self.assertEqual(len(self.decoded_times(data)), 10)
+
+    def test_fractional_frame_rate_does_not_drift(self):
+        data = b''.join(video_frame_assembly(self.frames(30), frame_rate=29.97))
+        times = self.decoded_times(data)
+        self.assertEqual(len(times), 30)
+        self.assertAlmostEqual(times[-1] - times[0], 29 / 29.97, places=3)
+
+    def test_encoder_failure_raises(self):
+        with self.assertRaises(Exception):
+            list(video_frame_assembly(self.frames(3), codec='no_such_codec'))
+
+
+@unittest.skipUnless(importlib.util.find_spec('av'), "av is not installed")
+class TestVideoPipeline(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.steps = [StepFactory.create_step(config) for config in (
+            {'name': 'extract', 'type': 'function', 'function': 'video_frame_extraction', 'params': {'frame_rate': 5}},
+            {'name': 'enhance', 'type': 'function', 'function': 'enhance_image', 'params': {'factor': 1.1}},
+            {'name': 'assemble', 'type': 'function', 'function': 'video_frame_assembly', 'params': {'frame_rate': 5}},
+        )]
+
+    async def run_pipeline(self, data):
+        # Like Engine.run_inference: lazy output is consumed before the request is answered
+        result = await run_steps(self.steps, data)
+        if is_fan_out(result):
+            result = [item async for item in iterate(result)]
+        return result
+
+    async def test_video_round_trip(self):
+        chunks = await asyncio.wait_for(self.run_pipeline(sample_bytes()), 60)
+        self.assertGreater(len(b''.join(chunks)), 0)
+
+    async def test_truncated_upload_fails_the_run(self):
+        data = sample_bytes()
+        with self.assertRaises(Exception):
+            await asyncio.wait_for(self.run_pipeline(data[:len(data) // 3]), 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# tests/test_warmup.py
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from src.core.steps.base_step import BaseStep, StepFactory
+from src.core import warmup
+from src.core.warmup import configure_compile_cache, run_warmup
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestWarmup")
+
+
+class RecordingStep(BaseStep):
+    def __init__(self):
+        super().__init__('recording', {})
+        self.model_name = 'org/model v1'
+        self.calls = []
+
+    def process(self, data):
+        self.calls.append(('process', data.shape))
+        return data
+
+    def process_batch(self, items):
+        self.calls.append(('batch', len(items), items[0].shape))
+        return items
+
+
+class TestWarmup(unittest.TestCase):
+    def test_runs_dummy_frames_at_resolution(self):
+        step = RecordingStep()
+        times = run_warmup(step, {'iterations': 3, 'resolution': [64, 32]})
+        self.assertEqual(len(times), 3)
+        self.assertEqual(step.calls, [('process', (32, 64, 3))] * 3)
+
+    def test_batches(self):
+        step = RecordingStep()
+        step.warm_up({'iterations': 1, 'resolution': [8, 8], 'batch_size': 4})
+        self.assertEqual(step.calls, [('batch', 4, (8, 8, 3))])
+
+    def test_warms_every_batch_size_up_to_the_maximum(self):
+        step = RecordingStep()
+        times = step.warm_up({'iterations': 1, 'resolution': [8, 8]}, max_batch_size=3)
+        self.assertEqual(len(times), 3)
+        self.assertEqual(step.calls, [('process', (8, 8, 3)), ('batch', 2, (8, 8, 3)), ('batch', 3, (8, 8, 3))])
+
+    def test_compile_cache_is_set_once_per_process(self):
+        with tempfile.TemporaryDirectory() as root, mock.patch.dict(os.environ):
+            os.environ.pop('TORCHINDUCTOR_CACHE_DIR', None)
+            self.assertEqual(configure_compile_cache(root), root)
+            # Settings already in place are kept
+            self.assertEqual(configure_compile_cache(os.path.join(root, 'other')), root)
+            self.assertEqual(os.environ['TORCHINDUCTOR_CACHE_DIR'], root)
+
+    def test_compile_cache_is_optional(self):
+        with mock.patch.object(warmup, 'compile_cache_root', None), mock.patch.dict(os.environ):
+            os.environ.pop('TORCHINDUCTOR_CACHE_DIR', None)
+            self.assertIsNone(configure_compile_cache())
+            self.assertNotIn('TORCHINDUCTOR_CACHE_DIR', os.environ)
+
+    def test_factory_warms_up_configured_steps(self):
+        StepFactory.register_custom_model('recording_model', type('Recording', (RecordingStep,), {
+            'from_config': staticmethod(lambda config: RecordingStep()),
+        }))
+        try:
+            step = StepFactory.create_step({'name': 'recording', 'type': 'model', 'model_name': 'recording_model',
+                                            'warmup': {'iterations': 2, 'resolution': [8, 8]},
+                                            'batching': {'max_batch_size': 2}})
+            self.assertEqual([call[0] for call in step.calls], ['process', 'process', 'batch', 'batch'])
+        finally:
+            StepFactory.custom_models.pop('recording_model')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# tests/test_wire.py
+
+import importlib.util
+import struct
+import unittest
+from fractions import Fraction
+import numpy as np
+from src.core.engine import encode_result, negotiate_format
+from src.core.frame import Frame
+from sdk.wire import FRAME_CONTENT_TYPE, FRAME_HEADER, MAX_FRAME_BYTES, decode_frame, encode_frame, is_frame_message
+from src.core.wire import parse_media_type
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("TestWire")
+
+
+class FakeRequest:
+    def __init__(self, query=None, headers=None):
+        self.query = query or {}
+        self.headers = headers or {}
+
+
+def _with_header(message, **fields):
+    """Rewrites header fields of an encoded frame."""
+    names = ('magic', 'version', 'compression', 'ndim', 'dtype', 'colorspace', 'pts', 'tb_num', 'tb_den',
+             'sequence')
+    header = dict(zip(names, FRAME_HEADER.unpack_from(message)))
+    header.update(fields)
+    return FRAME_HEADER.pack(*(header[name] for name in names)) + message[FRAME_HEADER.size:]
+
+
+class TestFrameFormat(unittest.TestCase):
+    def test_round_trip_keeps_metadata(self):
+        pixels = np.random.randint(0, 255, (4, 6, 3), dtype=np.uint8)
+        message = encode_frame(pixels, 'rgb24', pts=3003, time_base=Fraction(1, 90000), sequence=42)
+        self.assertTrue(is_frame_message(message))
+        wire = decode_frame(message)
+        np.testing.assert_array_equal(wire.data, pixels)
+        self.assertEqual((wire.colorspace, wire.pts, wire.time_base, wire.sequence),
+                         ('rgb24', 3003, Fraction(1, 90000), 42))
+
+    def test_decoded_pixels_are_a_view(self):
+        message = encode_frame(np.ones((2, 2), dtype=np.float32))
+        wire = decode_frame(message)
+        self.assertEqual(wire.data.dtype, np.float32)
+        self.assertIsNone(wire.pts)
+        self.assertIsNone(wire.sequence)
+        self.assertFalse(wire.data.flags.owndata)
+        self.assertFalse(wire.data.flags.writeable)
+
+    def test_truncated_and_foreign_messages_are_rejected(self):
+        message = encode_frame(np.zeros((4, 4, 3), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            decode_frame(message[:-1])
+        with self.assertRaises(ValueError):
+            decode_frame(b'\xff\xd8\xff\xe0 not a raw frame at all, just jpeg-ish bytes')
+
+    def test_malformed_headers_raise_value_error(self):
+        message = encode_frame(np.zeros((4, 4, 3), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            # Shape cut short
+            decode_frame(message[:FRAME_HEADER.size + 4])
+        with self.assertRaises(ValueError):
+            decode_frame(_with_header(message, dtype=b'zz'))
+        with self.assertRaises(ValueError):
+            decode_frame(_with_header(message, dtype=b'|O'))
+
+    def test_oversized_shapes_are_rejected(self):
+        message = _with_header(encode_frame(np.zeros((2, 2), dtype=np.uint8)), ndim=2)
+        huge = message[:FRAME_HEADER.size] + struct.pack('!2I', 2**16, 2**16)
+        self.assertGreater(2**32, MAX_FRAME_BYTES)
+        with self.assertRaises(ValueError):
+            decode_frame(huge)
+
+    @unittest.skipUnless(importlib.util.find_spec('lz4'), "lz4 is not installed")
+    def test_lz4_output_is_bounded(self):
+        import lz4.frame
+        message = encode_frame(np.zeros((4, 4), dtype=np.uint8), compression='lz4')
+        header = message[:FRAME_HEADER.size + 8]
+        for store_size in (True, False):
+            bomb = header + lz4.frame.compress(bytes(2**20), store_size=store_size)
+            with self.assertRaises(ValueError):
+                decode_frame(bomb)
+
+    @unittest.skipUnless(importlib.util.find_spec('zstandard'), "zstandard is not installed")
+    def test_zstd_round_trip_and_bound(self):
+        import zstandard
+        pixels = np.zeros((64, 64, 3), dtype=np.uint8)
+        np.testing.assert_array_equal(decode_frame(encode_frame(pixels, compression='zstd')).data, pixels)
+        message = encode_frame(np.zeros((4, 4), dtype=np.uint8), compression='zstd')
+        for write_size in (True, False):
+            compressor = zstandard.ZstdCompressor(write_content_size=write_size)
+            bomb = message[:FRAME_HEADER.size + 8] + compressor.compress(bytes(2**20))
+            with self.assertRaises(ValueError):
+                decode_frame(bomb)
+
+    @unittest.skipUnless(importlib.util.find_spec('lz4'), "lz4 is not installed")
+    def test_lz4_compression(self):
+        pixels = np.zeros((64, 64, 3), dtype=np.uint8)
+        message = encode_frame(pixels, compression='lz4')
+        self.assertLess(len(message), pixels.nbytes)
+        np.testing.assert_array_equal(decode_frame(message).data, pixels)
+
+    def test_unknown_compression_is_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_frame(np.zeros((2, 2), dtype=np.uint8), compression='gzip')
+
+    def test_frame_helpers(self):
+        frame = Frame(np.zeros((2, 3, 3), dtype=np.uint8), pts=7, sequence=1)
+        decoded = Frame.from_wire(frame.to_wire(), stream_id='s')
+        self.assertEqual((decoded.shape, decoded.pts, decoded.sequence, decoded.stream_id), ((2, 3, 3), 7, 1, 's'))
+
+
+class TestNegotiation(unittest.TestCase):
+    def test_raw_result_encoding(self):
+        frame = Frame(np.zeros((2, 2, 3), dtype=np.uint8), sequence=9)
+        body, content_type = encode_result(frame, 'raw')
+        self.assertEqual(content_type, FRAME_CONTENT_TYPE)
+        self.assertEqual(decode_frame(body).sequence, 9)
+
+    def test_accept_header_selects_raw(self):
+        request = FakeRequest(headers={'Accept': f'{FRAME_CONTENT_TYPE}; compression=lz4'})
+        self.assertEqual(negotiate_format(request), ('raw', 'lz4'))
+
+    def test_query_wins_over_accept(self):
+        request = FakeRequest(query={'format': 'PNG'}, headers={'Accept': FRAME_CONTENT_TYPE})
+        self.assertEqual(negotiate_format(request), ('png', None))
+        self.assertEqual(negotiate_format(FakeRequest()), ('jpg', None))
+
+    def test_parse_media_type(self):
+        self.assertEqual(parse_media_type('Image/JPEG'), ('image/jpeg', {}))
+        self.assertEqual(parse_media_type(None), ('', {}))
+
+
+if __name__ == '__main__':
+    unittest.main()